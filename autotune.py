@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file autotune.py
+# @brief contains AutoTuner class - adapts number of workers and batch size between batches (wiki_extract.py --autotune)
+#
+# @section rules rules
+# after each batch the tuner gets the batch statistics (BatchStats) and decides in this order:
+# - memory pressure (available memory under MEMORY_RESERVE_KB): one worker less and half batch
+# - workers saturated (utilization over HIGH_UTILIZATION) with a free CPU and memory for another worker: one worker more
+# - workers starving (utilization under LOW_UTILIZATION, e.g. a long tail of slow pages): one worker less
+# - batch size follows the per-page latency, so a batch takes about TARGET_BATCH_SECONDS
+#   (long enough to amortize the pool start and the tail of the batch, short enough to react and to bound memory of the buffer)
+#
+# all values are kept within the given limits, every change is recorded with its reason
+
+import os
+from collections import namedtuple
+
+HIGH_UTILIZATION = 0.85
+LOW_UTILIZATION = 0.5
+TARGET_BATCH_SECONDS = 15
+BATCH_SIZE_TOLERANCE = 0.25
+MEMORY_RESERVE_KB = 2 * 1024 * 1024
+
+MIN_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 50000
+
+##
+# @brief statistics of a processed batch
+# - pages - number of pages of the batch
+# - wall - wall time of the processing of the batch (seconds)
+# - busy - sum of processing times of pages in workers (seconds)
+# - worker_rss_kb - maximal RSS of a worker (kB, 0 if unknown)
+# - available_kb - available memory of the system (kB)
+BatchStats = namedtuple("BatchStats", ["pages", "wall", "busy", "worker_rss_kb", "available_kb"])
+
+##
+# @brief returns available memory of the system (kB)
+def available_memory_kb():
+	with open("/proc/meminfo", "r") as file:
+		for line in file:
+			if line.startswith("MemAvailable:"):
+				return int(line.split()[1])
+	return 0
+
+##
+# @class AutoTuner
+# @brief adapts number of workers and batch size within limits
+class AutoTuner:
+	##
+	# @param workers - initial number of workers
+	# @param batch_size - initial batch size
+	# @param max_workers - maximal number of workers
+	def __init__(self, workers, batch_size, max_workers, min_workers=1, min_batch_size=MIN_BATCH_SIZE, max_batch_size=MAX_BATCH_SIZE):
+		self.min_workers = min_workers
+		self.max_workers = max(min_workers, min(max_workers, os.cpu_count() or max_workers))
+		self.min_batch_size = min_batch_size
+		self.max_batch_size = max_batch_size
+		self.workers = self._clamp(workers, self.min_workers, self.max_workers)
+		self.batch_size = self._clamp(batch_size, self.min_batch_size, self.max_batch_size)
+		# array of [batch number, workers, batch size, reason]
+		self.history = []
+		self.batches = 0
+
+	@staticmethod
+	def _clamp(value, minimum, maximum):
+		return max(minimum, min(maximum, value))
+
+	##
+	# @brief returns utilization of workers in the batch (0 - 1)
+	def utilization(self, stats):
+		if stats.wall <= 0:
+			return 0.0
+		return min(1.0, stats.busy / (stats.wall * self.workers))
+
+	##
+	# @brief updates the number of workers and the batch size by statistics of a processed batch
+	# @return array of reasons of changes (empty if nothing changed)
+	def update(self, stats):
+		self.batches += 1
+		if stats.pages == 0:
+			return []
+
+		utilization = self.utilization(stats)
+		latency = stats.busy / stats.pages
+		workers = self.workers
+		batch_size = self.batch_size
+		reasons = []
+
+		low_memory = stats.available_kb and stats.available_kb < MEMORY_RESERVE_KB
+		if low_memory:
+			workers -= 1
+			batch_size //= 2
+		elif utilization > HIGH_UTILIZATION:
+			if stats.available_kb == 0 or stats.available_kb - stats.worker_rss_kb > MEMORY_RESERVE_KB:
+				workers += 1
+		elif utilization < LOW_UTILIZATION:
+			workers -= 1
+		workers = self._clamp(workers, self.min_workers, self.max_workers)
+
+		if not low_memory and latency > 0:
+			target = int(TARGET_BATCH_SECONDS * workers / latency)
+			# hysteresis - small changes of latency do not change the batch size
+			if abs(target - batch_size) > batch_size * BATCH_SIZE_TOLERANCE:
+				batch_size = target
+		batch_size = self._clamp(batch_size, self.min_batch_size, self.max_batch_size)
+
+		if low_memory:
+			reasons.append(f"low memory ({stats.available_kb // 1024} MB available)")
+		elif workers != self.workers:
+			reasons.append(f"utilization {utilization:.2f}")
+		if batch_size != self.batch_size and not low_memory:
+			reasons.append(f"latency {latency * 1000:.2f} ms/page")
+
+		if workers == self.workers and batch_size == self.batch_size:
+			return []
+		self.workers = workers
+		self.batch_size = batch_size
+		self.history.append([self.batches, workers, batch_size, ", ".join(reasons)])
+		return reasons
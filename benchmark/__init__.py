@@ -0,0 +1,3 @@
+##
+# @file benchmark/__init__.py
+# @brief benchmark of the extraction on synthetic dumps (see synthetic_dump.py and run.py)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file entity_bench.py
+# @brief microbenchmarks of entity classes - construction and assign_values(lang) replayed on recorded pages of each type
+#
+# - record: extracts pages of a dump (real or synthetic), identifies their types and stores
+#   outputs of extract_entity_data() of a sample of pages of each type into a fixture file
+# - run: replays construction and assign_values(lang) of the fixtures of each type (without parsing of the pages)
+#   and reports time (us/entity) and memory allocated by an entity (tracemalloc, in a separate pass)
+#
+# langmap and keywords are loaded from json/ at the time of the replay, so changes of patterns and lang_modules are measured
+#
+# @section fixture_file fixture file
+# JSON lines, the first line is a header {"lang", "dump"}, other lines are pages
+# {"type", "title", "link", "extraction", "redirects", "sentence"}
+#
+# usage:
+# - python3 -m benchmark.entity_bench record -p DUMP -o FIXTURES [--per-type N] [-r REDIRECTS] [-s FIRST_SENTENCES]
+# - python3 -m benchmark.entity_bench run FIXTURES [--repeat N] [--baseline FILE [--save-baseline]]
+
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import tracemalloc
+from collections import Counter
+from statistics import median
+from time import perf_counter_ns
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import dump_reader
+from wiki_extract import ENTITY_CLASSES, WikiExtract
+
+# default number of recorded pages of each type
+PER_TYPE = 200
+
+# default number of repetitions of the replay (the median is reported)
+REPEAT = 5
+
+# default regression threshold (relative growth of us/entity)
+THRESHOLD = 0.2
+
+##
+# @brief records fixtures of a dump
+# @param pages_fpath - path to the pages dump
+# @param fixtures_fpath - path to the fixture file
+# @param lang - language of the dump
+# @param per_type - number of pages of each type
+# @param sample_rate - probability that an entity page is considered (spreads the sample over the dump)
+# @param redirects_fpath - redirects file (None = no redirects)
+# @param first_sentences_fpath - first sentences file (None = no first sentences)
+# @return Counter type -> number of recorded pages
+def record(pages_fpath, fixtures_fpath, lang="en", per_type=PER_TYPE, sample_rate=1.0, seed=0, redirects_fpath=None, first_sentences_fpath=None):
+	args = ["-l", lang, "-p", os.path.abspath(pages_fpath)]
+	if redirects_fpath is not None:
+		args += ["-r", os.path.abspath(redirects_fpath)]
+	if first_sentences_fpath is not None:
+		args += ["-s", os.path.abspath(first_sentences_fpath)]
+	extractor = WikiExtract()
+	extractor.parse_args(args)
+	lang = extractor.console_args.lang
+
+	redirects = extractor.load_redirects(redirects_fpath) if redirects_fpath is not None else dict()
+	first_sentences = extractor.load_first_sentences(first_sentences_fpath) if first_sentences_fpath is not None else dict()
+	patterns, keywords = extractor.load_patterns(os.path.join(REPO_DIR, "json", f"patterns_{lang}.json"))
+
+	generator = random.Random(seed)
+	counts = Counter()
+	with open(fixtures_fpath, "w", encoding="utf-8") as file:
+		file.write(json.dumps({"lang": lang, "dump": os.path.abspath(pages_fpath)}, ensure_ascii=False) + "\n")
+		for _, page in dump_reader.iter_pages(extractor.pages_dump_fpath):
+			page_data = extractor.get_page_data(page, keywords, redirects, first_sentences)
+			if page_data is None or generator.random() >= sample_rate:
+				continue
+
+			title, content, page_redirects, sentence = page_data
+			extraction = extractor.extract_entity_data(content, keywords)
+			identification = extractor.identify_entity(title, extraction, patterns).most_common()
+			if not identification[0][1] or identification[0][0] not in ENTITY_CLASSES:
+				continue
+			key = identification[0][0]
+			if counts[key] >= per_type:
+				continue
+
+			file.write(json.dumps({
+				"type": key,
+				"title": title,
+				"link": extractor.get_link(title),
+				"extraction": extraction,
+				"redirects": page_redirects,
+				"sentence": sentence
+			}, ensure_ascii=False) + "\n")
+			counts[key] += 1
+			if len(counts) == len(ENTITY_CLASSES) and min(counts.values()) >= per_type:
+				break
+	return counts
+
+##
+# @brief reads a fixture file
+# @return tuple (language, dictionary type -> array of fixtures)
+def read_fixtures(fixtures_fpath):
+	fixtures = dict()
+	with open(fixtures_fpath, "r", encoding="utf-8") as file:
+		header = json.loads(file.readline())
+		for line in file:
+			fixture = json.loads(line)
+			fixtures.setdefault(fixture["type"], []).append(fixture)
+	return header["lang"], fixtures
+
+##
+# @brief replays construction and assign_values of fixtures of each type
+# @param fixtures_fpath - path to the fixture file
+# @param repeat - number of repetitions (the median time is reported)
+# @return dictionary type -> {"entities", "us_per_entity", "alloc_peak_kb", "retained_kb"} (memory per entity)
+def replay(fixtures_fpath, repeat=REPEAT):
+	lang, fixtures = read_fixtures(fixtures_fpath)
+	extractor = WikiExtract()
+	langmap = extractor.load_langmap(os.path.join(REPO_DIR, "json", f"langmap_{lang}.json"))
+	_, keywords = extractor.load_patterns(os.path.join(REPO_DIR, "json", f"patterns_{lang}.json"))
+
+	results = dict()
+	for key, items in sorted(fixtures.items()):
+		entity_class = ENTITY_CLASSES[key]
+
+		times = []
+		for _ in range(repeat):
+			# entities may modify the extracted data, each entity gets its own copy
+			extractions = [copy.deepcopy(item["extraction"]) for item in items]
+			total_ns = 0
+			for item, extraction in zip(items, extractions):
+				start = perf_counter_ns()
+				entity = entity_class(item["title"], key, item["link"], extraction, langmap, item["redirects"], item["sentence"], keywords)
+				entity.assign_values(lang)
+				total_ns += perf_counter_ns() - start
+			times.append(total_ns / len(items))
+
+		# allocations are measured in a separate pass, tracemalloc slows down the measured code
+		extractions = [copy.deepcopy(item["extraction"]) for item in items]
+		peak = 0
+		retained = 0
+		tracemalloc.start()
+		for item, extraction in zip(items, extractions):
+			before = tracemalloc.get_traced_memory()[0]
+			tracemalloc.reset_peak()
+			entity = entity_class(item["title"], key, item["link"], extraction, langmap, item["redirects"], item["sentence"], keywords)
+			entity.assign_values(lang)
+			current, current_peak = tracemalloc.get_traced_memory()
+			peak += current_peak - before
+			retained += current - before
+			del entity
+		tracemalloc.stop()
+
+		results[key] = {
+			"entities": len(items),
+			"us_per_entity": median(times) / 1000,
+			"alloc_peak_kb": peak / len(items) / 1024,
+			"retained_kb": retained / len(items) / 1024
+		}
+	return results
+
+##
+# @brief compares results with a baseline
+# @return array of descriptions of regressions (empty if there is none)
+def compare(results, baseline, threshold=THRESHOLD):
+	regressions = []
+	for key, base in baseline.items():
+		if key in results and results[key]["us_per_entity"] > base["us_per_entity"] * (1 + threshold):
+			regressions.append(f"{key} {results[key]['us_per_entity']:.1f} us/entity (baseline {base['us_per_entity']:.1f} us/entity)")
+	return regressions
+
+##
+# @brief returns lines of the report of results
+def report_lines(results):
+	lines = ["{:<16}{:>10}{:>16}{:>18}{:>16}".format("type", "entities", "us/entity", "alloc peak [kB]", "retained [kB]")]
+	for key, item in results.items():
+		lines.append("{:<16}{:>10}{:>16.1f}{:>18.1f}{:>16.1f}".format(key, item["entities"], item["us_per_entity"], item["alloc_peak_kb"], item["retained_kb"]))
+	return lines
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Microbenchmarks of construction and assign_values of entity classes.")
+	subparsers = parser.add_subparsers(dest="command", required=True)
+
+	record_parser = subparsers.add_parser("record", help="Record fixtures of a dump.")
+	record_parser.add_argument("-p", "--pages", required=True, help="Path to the pages dump.")
+	record_parser.add_argument("-o", "--output", required=True, help="Path to the fixture file.")
+	record_parser.add_argument("-l", "--lang", default="en", help="Language of the dump (default: %(default)s).")
+	record_parser.add_argument("-r", "--redirects", help="Path to the redirects file.")
+	record_parser.add_argument("-s", "--first_sentences", help="Path to the first sentences file.")
+	record_parser.add_argument("--per-type", type=int, default=PER_TYPE, help="Number of pages of each type (default: %(default)s).")
+	record_parser.add_argument("--sample-rate", type=float, default=1.0, help="Probability that an entity page is considered (default: %(default)s).")
+	record_parser.add_argument("--seed", type=int, default=0, help="Seed of the sampling (default: %(default)s).")
+
+	run_parser = subparsers.add_parser("run", help="Replay fixtures.")
+	run_parser.add_argument("fixtures", help="Path to the fixture file.")
+	run_parser.add_argument("--repeat", type=int, default=REPEAT, help="Number of repetitions (default: %(default)s).")
+	run_parser.add_argument("--baseline", help="JSON file with baseline results.")
+	run_parser.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline instead of comparing them.")
+	run_parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Allowed relative growth of us/entity (default: %(default)s).")
+	args = parser.parse_args()
+
+	if args.command == "record":
+		counts = record(args.pages, args.output, args.lang, args.per_type, args.sample_rate, args.seed, args.redirects, args.first_sentences)
+		for key in ENTITY_CLASSES:
+			print(f"{key}\t{counts[key]}")
+		print(f"written {args.output}")
+		sys.exit(0)
+
+	results = replay(args.fixtures, args.repeat)
+	print("\n".join(report_lines(results)))
+
+	if args.baseline and args.save_baseline:
+		with open(args.baseline, "w", encoding="utf-8") as file:
+			json.dump(results, file, indent=2)
+		print(f"\nbaseline written to {args.baseline}")
+	elif args.baseline:
+		with open(args.baseline, "r", encoding="utf-8") as file:
+			regressions = compare(results, json.load(file), args.threshold)
+		print("")
+		if len(regressions):
+			print("REGRESSION")
+			for regression in regressions:
+				print(f"  {regression}")
+			sys.exit(1)
+		print("OK (no regression against the baseline)")
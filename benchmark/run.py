@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file run.py
+# @brief runs wiki_extract.py end to end on a synthetic dump and compares the results with a stored baseline
+#
+# a benchmark run is a regular run of the extraction: "kb", "HEAD-KB" and "VERSION" are written into the work directory,
+# log and telemetry into outputs/ (like start.sh does), so do not run it while outputs/ of a real run are needed
+#
+# @section results results
+# JSON object:
+# - "params" - parameters of the run (number of pages, mix, seed, number of workers)
+# - "wall" - wall time of the run (seconds), "pages_per_s" - pages of the dump per second of the wall time
+# - "peak_rss_kb" - peak RSS of the largest process of the run (main process or a worker)
+# - "stages" - stage -> {"count", "seconds", "per_s"} (stage times from the telemetry, worker stages are summed over workers)
+#
+# @section baseline baseline
+# --save-baseline stores the results (baseline is specific to a machine), --baseline compares the results with them:
+# a run is a regression (exit code 1) when pages per second dropped, peak RSS grew or time of a stage per item grew
+# more than the threshold
+#
+# usage: python3 -m benchmark.run [--pages N] [--mix ...] [-m N] [--baseline FILE [--save-baseline]]
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from time import monotonic
+
+from benchmark import synthetic_dump
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TELEMETRY_FPATH = os.path.join(REPO_DIR, "outputs", "kb.telemetry.json")
+
+# default regression thresholds (relative change)
+THROUGHPUT_THRESHOLD = 0.1
+MEMORY_THRESHOLD = 0.2
+STAGE_THRESHOLD = 0.2
+
+# stages shorter than this (seconds) in the baseline are too noisy to be compared
+MIN_STAGE_SECONDS = 0.5
+
+##
+# @brief runs the extraction on a dump
+# @param dump - SyntheticDump
+# @param workdir - work directory of the run
+# @param workers - number of workers
+# @param extra_args - other arguments of wiki_extract.py
+# @return dictionary with results (without "params")
+def run_extraction(dump, workdir, workers, extra_args=()):
+	os.makedirs(os.path.join(REPO_DIR, "outputs"), exist_ok=True)
+	cmd = [
+		sys.executable, os.path.join(REPO_DIR, "wiki_extract.py"),
+		"--lang", "en",
+		"-m", str(workers),
+		"-p", dump.pages_fpath,
+		"-r", dump.redirects_fpath,
+		"-s", dump.first_sentences_fpath,
+	] + list(extra_args)
+
+	start = monotonic()
+	with open(os.path.join(REPO_DIR, "outputs", "kb.out"), "w") as log:
+		subprocess.run(cmd, cwd=workdir, stderr=log, stdout=subprocess.DEVNULL, check=True)
+	wall = monotonic() - start
+
+	telemetry = json.load(open(TELEMETRY_FPATH, "r", encoding="utf-8"))
+	pages = sum(dump.counts.values())
+	return {
+		"wall": wall,
+		"pages_per_s": pages / wall,
+		# maximum over all waited descendants (workers are waited by the main process of the extraction)
+		"peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+		"entities": telemetry["counters"].get("entities", 0),
+		"stages": {
+			stage: {"count": count, "seconds": seconds, "per_s": count / seconds if seconds else 0.0}
+			for stage, (count, seconds) in telemetry["stages"].items()
+		}
+	}
+
+##
+# @brief compares results with a baseline
+# @return array of descriptions of regressions (empty if there is none)
+def compare(results, baseline, throughput_threshold=THROUGHPUT_THRESHOLD, memory_threshold=MEMORY_THRESHOLD, stage_threshold=STAGE_THRESHOLD):
+	regressions = []
+	if results["pages_per_s"] < baseline["pages_per_s"] * (1 - throughput_threshold):
+		regressions.append(f"throughput {results['pages_per_s']:.1f} pages/s (baseline {baseline['pages_per_s']:.1f})")
+	if results["peak_rss_kb"] > baseline["peak_rss_kb"] * (1 + memory_threshold):
+		regressions.append(f"peak RSS {results['peak_rss_kb'] // 1024} MB (baseline {baseline['peak_rss_kb'] // 1024} MB)")
+	for stage, base in baseline["stages"].items():
+		current = results["stages"].get(stage)
+		if current is None or base["seconds"] < MIN_STAGE_SECONDS or not current["per_s"]:
+			continue
+		if current["per_s"] < base["per_s"] / (1 + stage_threshold):
+			regressions.append(f"stage {stage} {current['per_s']:.1f}/s (baseline {base['per_s']:.1f}/s)")
+	return regressions
+
+##
+# @brief returns lines of the report of results
+def report_lines(results):
+	lines = [
+		f"pages/s:  {results['pages_per_s']:.1f} ({results['params']['pages']} pages in {results['wall']:.1f} s, {results['entities']} entities)",
+		f"peak RSS: {results['peak_rss_kb'] // 1024} MB",
+		"",
+		"{:<32}{:>12}{:>14}{:>14}".format("stage", "count", "time [s]", "per s"),
+	]
+	for stage, item in sorted(results["stages"].items(), key=lambda x: x[1]["seconds"], reverse=True):
+		lines.append("{:<32}{:>12}{:>14.3f}{:>14.1f}".format(stage, item["count"], item["seconds"], item["per_s"]))
+	return lines
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Benchmark of the extraction on a synthetic dump.")
+	parser.add_argument("--pages", type=int, default=20000, help="Number of pages of the dump (default: %(default)s).")
+	parser.add_argument("--mix", type=synthetic_dump.parse_mix, default=synthetic_dump.DEFAULT_MIX, help="Relative weights of kinds of pages (see synthetic_dump.py).")
+	parser.add_argument("--paragraphs", type=int, default=synthetic_dump.DEFAULT_PARAGRAPHS, help="Average number of paragraphs of an article (default: %(default)s).")
+	parser.add_argument("--seed", type=int, default=0, help="Seed of the generator (default: %(default)s).")
+	parser.add_argument("-m", type=int, default=os.cpu_count(), help="Number of workers (default: %(default)s).")
+	parser.add_argument("--workdir", help="Work directory for the dump and the outputs of the extraction (default: temporary directory).")
+	parser.add_argument("--baseline", help="JSON file with baseline results.")
+	parser.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline instead of comparing them.")
+	parser.add_argument("--throughput-threshold", type=float, default=THROUGHPUT_THRESHOLD, help="Allowed relative drop of pages per second (default: %(default)s).")
+	parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD, help="Allowed relative growth of peak RSS (default: %(default)s).")
+	parser.add_argument("--stage-threshold", type=float, default=STAGE_THRESHOLD, help="Allowed relative growth of time of a stage per item (default: %(default)s).")
+	parser.add_argument("-o", "--output", help="Write the results into a JSON file.")
+	args, extra_args = parser.parse_known_args()
+
+	params = {"pages": args.pages, "mix": args.mix, "paragraphs": args.paragraphs, "seed": args.seed, "workers": args.m, "args": extra_args}
+	with tempfile.TemporaryDirectory(prefix="kb-benchmark-") as tmpdir:
+		workdir = args.workdir or tmpdir
+		dump = synthetic_dump.generate(os.path.join(workdir, "dump"), args.pages, args.mix, args.paragraphs, args.seed)
+		results = run_extraction(dump, workdir, args.m, extra_args)
+	results["params"] = params
+
+	print("\n".join(report_lines(results)))
+	if args.output:
+		with open(args.output, "w", encoding="utf-8") as file:
+			json.dump(results, file, indent=2)
+
+	if args.baseline and args.save_baseline:
+		with open(args.baseline, "w", encoding="utf-8") as file:
+			json.dump(results, file, indent=2)
+		print(f"\nbaseline written to {args.baseline}")
+	elif args.baseline:
+		with open(args.baseline, "r", encoding="utf-8") as file:
+			baseline = json.load(file)
+		print("")
+		if baseline["params"] != params:
+			print(f"warning: parameters differ from the baseline ({baseline['params']})")
+		regressions = compare(results, baseline, args.throughput_threshold, args.memory_threshold, args.stage_threshold)
+		if len(regressions):
+			print("REGRESSION")
+			for regression in regressions:
+				print(f"  {regression}")
+			sys.exit(1)
+		print("OK (no regression against the baseline)")
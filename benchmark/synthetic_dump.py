@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file synthetic_dump.py
+# @brief generates synthetic MediaWiki XML dumps for benchmarks (offline, deterministic for a seed)
+#
+# pages imitate English Wikipedia articles: infoboxes, paragraphs with links and refs (cite templates),
+# coord templates, categories, disambiguation pages and redirects
+#
+# @section files files
+# - pages dump (<mediawiki> XML, the same structure as enwiki-*-pages-articles.xml)
+# - redirects ("redirect title \t link of the target page", see WikiExtract.load_redirects)
+# - first sentences ("link \t first sentence", see WikiExtract.load_first_sentences)
+#
+# usage: python3 -m benchmark.synthetic_dump -o DIR [--pages N] [--mix person=25,redirect=17,...] [--seed N]
+
+import argparse
+import hashlib
+import os
+import random
+from collections import Counter, namedtuple
+from xml.sax.saxutils import escape, quoteattr
+
+##
+# @brief default mix of page kinds (relative weights, roughly as in English Wikipedia)
+DEFAULT_MIX = {
+	"person": 25,
+	"settlement": 12,
+	"organisation": 6,
+	"event": 3,
+	"geo": 4,
+	"watercourse": 2,
+	"waterarea": 1,
+	"country": 1,
+	"plain": 26,
+	"disambiguation": 3,
+	"redirect": 17,
+}
+
+# default number of paragraphs of an article (the real number is random around it)
+DEFAULT_PARAGRAPHS = 4
+
+PAGES_FNAME = "enwiki-synthetic-pages-articles.xml"
+REDIRECTS_FNAME = "redirects.tsv"
+FIRST_SENTENCES_FNAME = "first_sentences.tsv"
+
+##
+# @brief paths to the generated files and numbers of generated pages of each kind
+SyntheticDump = namedtuple("SyntheticDump", ["pages_fpath", "redirects_fpath", "first_sentences_fpath", "counts"])
+
+SYLLABLES = ["an", "ber", "cha", "dor", "el", "fin", "gra", "hol", "is", "jan", "kel", "lor", "mar", "nov", "os", "pra", "ros", "sel", "tan", "ul", "ven", "wil", "zen"]
+WORDS = (
+	"the of and in to was is for on as with by at from his her that it an which were are also first after had "
+	"new city time year people during world known government war state family region history national school "
+	"century early became local river population area part built later several major public second main member"
+).split()
+JOBS = ["writer", "painter", "politician", "actor", "composer", "footballer", "engineer", "physicist", "singer", "architect"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+CONTINENTS = ["Europe", "Asia", "Africa", "South America", "North America", "Oceania"]
+
+##
+# @class PageGenerator
+# @brief generates pages of the individual kinds
+class PageGenerator:
+	def __init__(self, seed=0, paragraphs=DEFAULT_PARAGRAPHS):
+		self.random = random.Random(seed)
+		self.paragraphs = paragraphs
+		self.titles = set()
+		# titles of generated articles (targets of redirects and links)
+		self.articles = []
+		self.countries = [self.name() for _ in range(20)]
+		self.towns = [self.name() for _ in range(100)]
+		self.refs = 0
+
+	def name(self):
+		return "".join(self.random.choice(SYLLABLES) for _ in range(self.random.randint(2, 3))).capitalize()
+
+	##
+	# @brief returns a unique title (a number is appended if needed)
+	def unique(self, title):
+		candidate = title
+		i = 1
+		while candidate in self.titles:
+			i += 1
+			candidate = f"{title} ({i})"
+		self.titles.add(candidate)
+		return candidate
+
+	def link(self):
+		target = self.random.choice(self.articles) if len(self.articles) and self.random.random() < 0.5 else self.random.choice(self.towns)
+		return f"[[{target}]]" if self.random.random() < 0.7 else f"[[{target}|{self.random.choice(WORDS)}]]"
+
+	def ref(self):
+		self.refs += 1
+		return f"<ref name=\"r{self.refs}\">{{{{cite web |url=https://example.org/{self.refs} |title={self.name()} {self.random.choice(WORDS)} |access-date={self.random.randint(2000, 2023)}-0{self.random.randint(1, 9)}-1{self.random.randint(0, 9)}}}}}</ref>"
+
+	def date(self, template, year):
+		return f"{{{{{template}|{year}|{self.random.randint(1, 12)}|{self.random.randint(1, 28)}}}}}"
+
+	def coord(self):
+		return f"{{{{coord|{self.random.randint(0, 89)}|{self.random.randint(0, 59)}|{self.random.choice('NS')}|{self.random.randint(0, 179)}|{self.random.randint(0, 59)}|{self.random.choice('EW')}|display=inline,title}}}}"
+
+	def sentence(self):
+		words = [self.random.choice(WORDS) for _ in range(self.random.randint(8, 20))]
+		words[self.random.randrange(len(words))] = self.link()
+		text = " ".join(words).capitalize() + "."
+		if self.random.random() < 0.3:
+			text += self.ref()
+		return text
+
+	def body(self):
+		paragraphs = []
+		for i in range(max(1, self.paragraphs + self.random.randint(-2, 2))):
+			if i and self.random.random() < 0.3:
+				paragraphs.append(f"== {self.random.choice(WORDS).capitalize()} ==")
+			paragraphs.append(" ".join(self.sentence() for _ in range(self.random.randint(2, 6))))
+		return "\n\n".join(paragraphs) + "\n\n== References ==\n{{reflist}}\n"
+
+	@staticmethod
+	def infobox(name, fields):
+		return "{{Infobox " + name + "\n" + "".join(f"| {key} = {value}\n" for key, value in fields) + "}}\n"
+
+	@staticmethod
+	def categories(categories):
+		return "\n" + "\n".join(f"[[Category:{category}]]" for category in categories)
+
+	##
+	# @brief returns (title, text, first sentence) of an article
+	def article(self, kind):
+		country = self.random.choice(self.countries)
+		town = self.random.choice(self.towns)
+		year = self.random.randint(1800, 2000)
+
+		if kind == "person":
+			title = self.unique(f"{self.name()} {self.name()}")
+			job = self.random.choice(JOBS)
+			dead = self.random.random() < 0.5
+			fields = [
+				("name", title),
+				("image", f"{title.replace(' ', '_')}.jpg"),
+				("birth_date", self.date("birth date", year)),
+				("birth_place", f"[[{town}]], [[{country}]]"),
+			]
+			if dead:
+				fields += [("death_date", self.date("death date and age", year + self.random.randint(30, 90))), ("death_place", f"[[{self.random.choice(self.towns)}]]")]
+			fields += [("nationality", country), ("occupation", job)]
+			sentence = f"'''{title}''' (born {self.random.randint(1, 28)} {self.random.choice(MONTHS)} {year}) {'was' if dead else 'is'} a {country} {job}."
+			categories = [f"{year} births", f"{country} {job}s"] + ([f"{year + 50} deaths"] if dead else ["Living people"])
+			return title, self.infobox("person", fields) + sentence + self.ref() + "\n\n" + self.body() + self.categories(categories), sentence
+
+		if kind == "settlement":
+			title = self.unique(self.name())
+			fields = [
+				("name", title),
+				("settlement_type", "Town"),
+				("coordinates", self.coord()),
+				("subdivision_type", "Country"),
+				("subdivision_name", f"[[{country}]]"),
+				("area_total_km2", f"{self.random.randint(1, 500)}.{self.random.randint(0, 9)}"),
+				("population_total", f"{self.random.randint(1000, 900000):,}"),
+			]
+			sentence = f"'''{title}''' is a town in [[{country}]]."
+			return title, self.infobox("settlement", fields) + sentence + "\n\n" + self.body() + self.categories([f"Towns in {country}", f"Populated places in {country}"]), sentence
+
+		if kind == "country":
+			title = self.unique(f"Republic of {self.name()}")
+			fields = [
+				("conventional_long_name", title),
+				("common_name", title.split()[-1]),
+				("capital", f"[[{town}]]"),
+				("coordinates", self.coord()),
+				("area_km2", f"{self.random.randint(1000, 900000):,}"),
+				("population_estimate", f"{self.random.randint(100000, 90000000):,}"),
+			]
+			continent = self.random.choice(CONTINENTS)
+			sentence = f"'''{title}''' is a country in {continent}."
+			return title, self.infobox("country", fields) + sentence + "\n\n" + self.body() + self.categories([f"Countries in {continent}", "Member states of the United Nations"]), sentence
+
+		if kind == "watercourse":
+			title = self.unique(f"{self.name()} River")
+			fields = [
+				("name", title),
+				("source1_location", f"[[{town}]]"),
+				("source1_coordinates", self.coord()),
+				("length", f"{self.random.randint(10, 3000)} km"),
+				("basin_size", f"{self.random.randint(100, 90000)} km2"),
+				("discharge1_avg", f"{self.random.randint(1, 900)} m3/s"),
+			]
+			sentence = f"The '''{title}''' is a river in [[{country}]]."
+			return title, self.infobox("river", fields) + sentence + "\n\n" + self.body() + self.categories([f"Rivers of {country}"]), sentence
+
+		if kind == "waterarea":
+			title = self.unique(f"Lake {self.name()}")
+			fields = [("name", title), ("coords", self.coord()), ("area", f"{self.random.randint(1, 900)} km2"), ("max-depth", f"{self.random.randint(5, 300)} m")]
+			sentence = f"'''{title}''' is a lake in [[{country}]]."
+			return title, self.infobox("lake", fields) + sentence + "\n\n" + self.body() + self.categories([f"Lakes of {country}"]), sentence
+
+		if kind == "geo":
+			title = self.unique(f"Mount {self.name()}")
+			fields = [("name", title), ("elevation_m", self.random.randint(500, 8000)), ("coordinates", self.coord()), ("range", f"{self.name()} Mountains")]
+			sentence = f"'''{title}''' is a mountain in [[{country}]]."
+			return title, self.infobox("mountain", fields) + sentence + "\n\n" + self.body() + self.categories([f"Mountains of {country}"]), sentence
+
+		if kind == "organisation":
+			title = self.unique(f"{self.name()} Corporation")
+			fields = [("name", title), ("founded", str(year)), ("hq_location_city", f"[[{town}]]"), ("num_employees", f"{self.random.randint(10, 90000):,}")]
+			sentence = f"'''{title}''' is a company based in [[{town}]]."
+			return title, self.infobox("company", fields) + sentence + "\n\n" + self.body() + self.categories([f"Companies based in {country}"]), sentence
+
+		if kind == "event":
+			title = self.unique(f"{year} {country} general election")
+			fields = [("election_name", title), ("country", country), ("election_date", self.date("start date", year))]
+			sentence = f"The '''{title}''' was held in [[{country}]]."
+			return title, self.infobox("election", fields) + sentence + "\n\n" + self.body() + self.categories([f"Events in {country}", f"{year} elections"]), sentence
+
+		if kind == "plain":
+			title = self.unique(f"{self.random.choice(WORDS).capitalize()} {self.name().lower()}")
+			sentence = f"'''{title}''' is a concept of {self.random.choice(WORDS)} {self.random.choice(WORDS)}."
+			return title, sentence + "\n\n" + self.body() + self.categories([f"Culture of {country}"]), sentence
+
+		raise ValueError(f"unknown kind of page: {kind}")
+
+	##
+	# @brief returns (title, text, redirect target or None, first sentence or None) of a page of any kind
+	def page(self, kind):
+		if kind == "redirect":
+			target = self.random.choice(self.articles) if len(self.articles) else self.random.choice(self.towns)
+			return self.unique(f"{target} {self.random.choice(WORDS)}"), f"#REDIRECT [[{target}]]", target, None
+
+		if kind == "disambiguation":
+			base = self.random.choice(self.articles).split(" (")[0] if len(self.articles) else self.name()
+			title = self.unique(f"{base} (disambiguation)")
+			items = "\n".join(f"* [[{base} ({self.random.choice(WORDS)})]], a {self.random.choice(JOBS)}" for _ in range(self.random.randint(2, 8)))
+			return title, f"'''{base}''' may refer to:\n\n{items}\n\n{{{{disambiguation}}}}", None, None
+
+		title, text, sentence = self.article(kind)
+		self.articles.append(title)
+		return title, text, None, sentence
+
+##
+# @brief returns a number in base 36 (format of sha1 in dumps)
+def base36(number):
+	digits = ""
+	while number:
+		number, digit = divmod(number, 36)
+		digits = "0123456789abcdefghijklmnopqrstuvwxyz"[digit] + digits
+	return digits or "0"
+
+##
+# @brief returns XML of a page of the dump
+def page_xml(page_id, title, text, redirect=None):
+	sha1 = base36(int(hashlib.sha1(text.encode("utf-8")).hexdigest(), 16))
+	text = escape(text)
+	redirect_xml = ""
+	if redirect is not None:
+		redirect_xml = "    <redirect title=" + quoteattr(redirect) + " />\n"
+	return (
+		"  <page>\n"
+		f"    <title>{escape(title)}</title>\n"
+		"    <ns>0</ns>\n"
+		f"    <id>{page_id}</id>\n"
+		f"{redirect_xml}"
+		"    <revision>\n"
+		f"      <id>{page_id + 100000000}</id>\n"
+		"      <model>wikitext</model>\n"
+		"      <format>text/x-wiki</format>\n"
+		f"      <text bytes=\"{len(text.encode('utf-8'))}\" xml:space=\"preserve\">{text}</text>\n"
+		f"      <sha1>{sha1}</sha1>\n"
+		"    </revision>\n"
+		"  </page>\n"
+	)
+
+##
+# @brief parses a mix ("person=25,redirect=17,...") into a dictionary kind -> weight
+def parse_mix(mix):
+	result = dict()
+	for item in mix.split(","):
+		kind, _, weight = item.partition("=")
+		kind = kind.strip()
+		if kind not in DEFAULT_MIX:
+			raise ValueError(f"unknown kind of page: {kind} (known: {', '.join(DEFAULT_MIX)})")
+		result[kind] = float(weight)
+	return result
+
+##
+# @brief generates a synthetic dump
+# @param directory - output directory
+# @param pages - number of pages
+# @param mix - dictionary kind -> relative weight (see DEFAULT_MIX)
+# @param paragraphs - average number of paragraphs of an article
+# @param seed - seed of the generator (the same seed gives the same dump)
+# @return SyntheticDump
+def generate(directory, pages, mix=DEFAULT_MIX, paragraphs=DEFAULT_PARAGRAPHS, seed=0):
+	os.makedirs(directory, exist_ok=True)
+	generator = PageGenerator(seed, paragraphs)
+	kinds = list(mix.keys())
+	weights = [mix[kind] for kind in kinds]
+	counts = Counter()
+
+	pages_fpath = os.path.join(directory, PAGES_FNAME)
+	redirects_fpath = os.path.join(directory, REDIRECTS_FNAME)
+	first_sentences_fpath = os.path.join(directory, FIRST_SENTENCES_FNAME)
+	with open(pages_fpath, "w", encoding="utf-8") as dump, open(redirects_fpath, "w", encoding="utf-8") as redirects, open(first_sentences_fpath, "w", encoding="utf-8") as first_sentences:
+		dump.write("<mediawiki xmlns=\"http://www.mediawiki.org/xml/export-0.10/\" version=\"0.10\" xml:lang=\"en\">\n")
+		dump.write("  <siteinfo>\n    <sitename>Wikipedia</sitename>\n    <dbname>enwiki</dbname>\n  </siteinfo>\n")
+		for page_id in range(1, pages + 1):
+			kind = generator.random.choices(kinds, weights)[0]
+			title, text, redirect, sentence = generator.page(kind)
+			counts[kind] += 1
+			dump.write(page_xml(page_id, title, text, redirect))
+			if redirect is not None:
+				redirects.write(f"{title}\thttps://en.wikipedia.org/wiki/{redirect.replace(' ', '_')}\n")
+			if sentence is not None:
+				first_sentences.write(f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}\t{sentence}\n")
+		dump.write("</mediawiki>\n")
+
+	return SyntheticDump(pages_fpath, redirects_fpath, first_sentences_fpath, dict(counts))
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Generates a synthetic Wikipedia pages dump with redirects and first sentences.")
+	parser.add_argument("-o", "--outdir", required=True, help="Output directory.")
+	parser.add_argument("--pages", type=int, default=10000, help="Number of pages (default: %(default)s).")
+	parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="Relative weights of kinds of pages, e.g. \"person=25,redirect=17\" (kinds: " + ", ".join(DEFAULT_MIX) + ").")
+	parser.add_argument("--paragraphs", type=int, default=DEFAULT_PARAGRAPHS, help="Average number of paragraphs of an article (default: %(default)s).")
+	parser.add_argument("--seed", type=int, default=0, help="Seed of the generator (default: %(default)s).")
+	args = parser.parse_args()
+
+	dump = generate(args.outdir, args.pages, args.mix, args.paragraphs, args.seed)
+	for kind, count in sorted(dump.counts.items()):
+		print(f"{kind}\t{count}")
+	print(f"written {dump.pages_fpath}")
@@ -16,9 +16,13 @@ import datetime
 from collections import Counter
 import sys
 import os
+import time
 
 SCORE = 10
 
+# minimal interval between updates of the status line (seconds)
+UPDATE_INTERVAL = 0.25
+
 ##
 # @class Debugger
 # @brief used for TUI, debugging and logging
@@ -49,10 +53,19 @@ class Debugger:
 			message = f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {message}"
 		print(f"{message}\033[K")
 
+	# time of the last update of the status line (time.monotonic())
+	_last_update = 0.0
+
 	## 
 	# @brief updates (clears) current line and writes new message 
+	#
+	# rate-limited - the message is dropped if the line was updated less than UPDATE_INTERVAL ago
 	@staticmethod
 	def update(msg):
+		now = time.monotonic()
+		if now - Debugger._last_update < UPDATE_INTERVAL:
+			return
+		Debugger._last_update = now
 		print(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {msg}\033[K", end="\r")
 
 	## 
@@ -139,22 +152,15 @@ class Debugger:
 				cls.log_message("{:<20}{:<15}".format(key, value))
 
 	##
-	# @brief fiters data sent to stderr (stderr is redirected to out/kb.out) and logs important data into a log file (log/kb.log) 
+	# @brief copies data sent to stderr (stderr is redirected to outputs/kb.out) into a log file (outputs/kb.log)
 	def log(self):
 		end_time = datetime.datetime.now()
 		tdelta = end_time - self.start_time
 		self.print(f"completed extraction in {self.pretty_time_delta(tdelta.total_seconds())}", print_time=False)
-		self.log_message(f"time_total,{tdelta};")
-
-		log = []
 
+		# statistics are not logged to stderr (see telemetry.py), all lines are kept
 		with open(os.path.join(os.path.dirname(sys.argv[0]), "outputs/kb.out"), "r") as f:
-			lines = f.readlines()
-			for line in lines:
-				msg = line.split(";")[0]
-				msg = msg.split(",")
-				if msg[0] not in ["id_stats", "time_avg", "time_total"]:
-					log.append(line)
+			log = f.readlines()
 
 		with open(os.path.join(os.path.dirname(sys.argv[0]), "outputs/kb.log"), "w") as f:
 			f.writelines(log)
@@ -176,3 +182,34 @@ class Debugger:
 			return '%dm%ds' % (minutes, seconds)
 		else:
 			return '%ds' % (seconds,)
+
+##
+# @class ProgressReporter
+# @brief rate-limited status line with progress of processing of the pages dump (throughput and ETA)
+class ProgressReporter:
+	##
+	# @param total_bytes - size of the pages dump
+	def __init__(self, total_bytes):
+		self.total_bytes = total_bytes
+		self.start_time = time.monotonic()
+		self.start_offset = None
+
+	##
+	# @brief updates the status line (at most once per UPDATE_INTERVAL)
+	# @param pages - number of read pages (all pages of the dump, including redirects and disambiguations)
+	# @param entity_pages - number of found pages (candidates for entities)
+	# @param offset - current byte offset in the pages dump
+	def update(self, pages, entity_pages, offset):
+		if self.start_offset is None:
+			self.start_offset = offset
+		now = time.monotonic()
+		if now - Debugger._last_update < UPDATE_INTERVAL:
+			return
+
+		elapsed = max(now - self.start_time, 1e-9)
+		bytes_rate = (offset - self.start_offset) / elapsed
+		progress = f"{offset / 2**20:.0f}/{self.total_bytes / 2**20:.0f} MB"
+		if self.total_bytes:
+			progress += f" ({offset / self.total_bytes * 100:.1f}%)"
+		eta = Debugger.pretty_time_delta((self.total_bytes - offset) / bytes_rate) if bytes_rate > 0 else "?"
+		Debugger.update(f"pages: {pages} ({pages / elapsed:.1f} pages/s), entity pages: {entity_pages}, dump: {progress}, {bytes_rate / 2**20:.2f} MB/s, ETA {eta}")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file dump_reader.py
+# @brief reads <page> elements of a wiki pages dump together with their byte offsets
+#
+# pages are found as raw bytes between "<page>" and "</page>" (these strings are escaped inside of page texts),
+# each page is parsed separately, so a page can be read again later just from its offset in the dump
+#
+# @section tags tags
+# parsed pages have no namespace in tags (e.g. "title" instead of "{http://www.mediawiki.org/xml/export-0.10/}title")
+
+import xml.etree.cElementTree as CElTree
+
+PAGE_START = b"<page>"
+PAGE_END = b"</page>"
+DUMP_END = b"</mediawiki>\n"
+
+# size of blocks read from the dump
+BLOCK_SIZE = 1 << 20
+
+##
+# @brief generator of raw pages of a dump
+# @param fpath - path to the pages dump
+# @param start - byte offset where to start reading
+# @return (byte offset of the page, page bytes) tuples
+def iter_raw_pages(fpath, start=0):
+	with open(fpath, "rb") as file:
+		file.seek(start)
+		buffer = b""
+		buffer_offset = start
+		while True:
+			block = file.read(BLOCK_SIZE)
+			if not block:
+				return
+			buffer += block
+
+			position = 0
+			while True:
+				page_start = buffer.find(PAGE_START, position)
+				if page_start < 0:
+					# keep the tail, which can contain a beginning of "<page>"
+					position = max(position, len(buffer) - len(PAGE_START) + 1)
+					break
+				page_end = buffer.find(PAGE_END, page_start)
+				if page_end < 0:
+					position = page_start
+					break
+				page_end += len(PAGE_END)
+				yield buffer_offset + page_start, buffer[page_start:page_end]
+				position = page_end
+
+			buffer = buffer[position:]
+			buffer_offset += position
+
+##
+# @brief generator of parsed pages of a dump
+# @param fpath - path to the pages dump
+# @return (byte offset of the page, <page> element) tuples
+def iter_pages(fpath, start=0):
+	for offset, raw_page in iter_raw_pages(fpath, start):
+		yield offset, CElTree.fromstring(raw_page)
+
+##
+# @brief reads one page of a dump
+# @param fpath - path to the pages dump
+# @param offset - byte offset of the page
+# @return <page> element
+#
+# raises ValueError if there is no page at the offset
+def read_page(fpath, offset):
+	for page_offset, page in iter_pages(fpath, offset):
+		if page_offset == offset:
+			return page
+		break
+	raise ValueError(f"no page at offset {offset} of {fpath}")
+
+##
+# @brief reads the header of a dump (<mediawiki> start tag and <siteinfo>, everything before the first page)
+# @param fpath - path to the pages dump
+# @return header bytes (ends with a new line)
+def read_header(fpath):
+	with open(fpath, "rb") as file:
+		header = b""
+		while PAGE_START not in header:
+			block = file.read(BLOCK_SIZE)
+			if not block:
+				break
+			header += block
+	header = header.split(PAGE_START, 1)[0]
+	return header[:header.rfind(b"\n") + 1] if b"\n" in header else header
+
+##
+# @brief writes a dump of raw pages
+# @param fpath - path to the new dump
+# @param header - header of the dump (see read_header)
+# @param raw_pages - iterable of page bytes ("<page>...</page>")
+# @return number of written pages
+def write_dump(fpath, header, raw_pages):
+	count = 0
+	with open(fpath, "wb") as file:
+		file.write(header)
+		for raw_page in raw_pages:
+			file.write(b"  " + raw_page + b"\n")
+			count += 1
+		file.write(DUMP_END)
+	return count
@@ -36,11 +36,14 @@
 # @date 28.07.2022
 
 from abc import ABCMeta, abstractmethod
-import re, random
-from hashlib import md5, sha224
+import re
+from hashlib import md5
 import mwparserfromhell as parser
 
 from debugger import Debugger as debug
+from entity_id import entity_id
+from kb_schema import KB_SCHEMA
+import pattern_profiler
 
 from lang_modules.en.core_utils import CoreUtils as EnCoreUtils
 from lang_modules.cs.core_utils import CoreUtils as CsCoreUtils
@@ -82,7 +85,8 @@ class EntCore(metaclass=ABCMeta):
 
 		# general information
 
-		self.eid = sha224(str(random.randint(1, 1000000)).encode("utf-8")).hexdigest()[:10]
+		# deterministic ID (language and title of the page), collisions are resolved by the main process (see entity_id.py)
+		self.eid = entity_id(link)
 		self.prefix = prefix
 		self.title = re.sub(r"\s+\(.+?\)\s*$", "", title)
 		self.aliases = DictOfUniqueDict()
@@ -116,10 +120,12 @@ class EntCore(metaclass=ABCMeta):
 
 	##
 	# @brief serializes entity data for output (tsv format)
-	# @param ent_data - child entity data that is merged with general data <tsv string>
+	# @param ent_data - child entity data that is merged with general data <array of strings>
 	# @return tab separated values containing all of entity data <string>
+	#
+	# raises KbRowError if the data does not match the HEAD-KB schema of the entity type
 	def serialize(self, ent_data):
-		data = "\t".join([
+		return KB_SCHEMA.serialize(self.prefix, [
 			self.eid,
 			self.prefix,
 			self.title,
@@ -128,10 +134,8 @@ class EntCore(metaclass=ABCMeta):
 			self.description,
 			self.original_title,
 			self.images,
-			self.link,
-			ent_data
-		]).replace("\n", "")
-		return data
+			self.link
+		] + ent_data)
 
 	##
 	# @brief extracts data from infobox dictionary given an array of keys
@@ -726,9 +730,10 @@ class EntCore(metaclass=ABCMeta):
 		spans = []
 		aliases = []
 
+		finditer = pattern_profiler.get_finditer()
 		patterns = self.keywords["lang_alias_patterns"]
 		for p in patterns:
-			match = re.finditer(p, data, flags=re.I)
+			match = finditer(p, data, flags=re.I)
 			for m in match:
 				lang = m.group(1).strip()
 				if len(lang) > 2:
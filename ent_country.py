@@ -59,7 +59,7 @@ class EntCountry(EntCore):
 			self.area,
 			self.population
 		]
-		return self.serialize("\t".join(data))
+		return self.serialize(data)
 
 	##
     # @brief tries to assign entity information (calls the appropriate functions) and assigns prefix
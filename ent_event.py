@@ -54,7 +54,7 @@ class EntEvent(EntCore):
 			self.locations,
 			self.type
 		]
-		return self.serialize("\t".join(data))
+		return self.serialize(data)
 
 	##
     # @brief tries to assign entity information (calls the appropriate functions)
@@ -83,7 +83,7 @@ class EntGeo(EntCore):
 		if self.prefix == "geo:waterfall":
 			data += [self.total_height]
 
-		return self.serialize("\t".join(data))
+		return self.serialize(data)
 
 	##
     # @brief tries to assign entity information (calls the appropriate functions) and assigns prefix
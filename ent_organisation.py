@@ -55,7 +55,7 @@ class EntOrganisation(EntCore):
 			self.location,
 			self.type
 		]
-		return self.serialize("\t".join(data))
+		return self.serialize(data)
 
 	##
     # @brief tries to assign entity information (calls the appropriate functions)
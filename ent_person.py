@@ -29,6 +29,7 @@ import re
 from debugger import Debugger as debug
 
 from ent_core import EntCore
+import pattern_profiler
 
 from lang_modules.en.person_utils import PersonUtils as EnUtils
 from lang_modules.cs.person_utils import PersonUtils as CsUtils
@@ -92,7 +93,7 @@ class EntPerson(EntCore):
 				self.ulan_id,
 				self.urls
 			]
-		return self.serialize("\t".join(data))
+		return self.serialize(data)
 	
 	##
 	# @brief tries to assign entity information (calls the appropriate functions)
@@ -252,10 +253,11 @@ class EntPerson(EntCore):
 
 		# look for keywords in categories
 		if not self.gender and self.prefix != "person:fictional":
+			search = pattern_profiler.get_search()
 			for c in self.categories:
-				if re.search("|".join(self.keywords["female"]), c.lower()):
+				if search("|".join(self.keywords["female"]), c.lower()):
 					self.gender = "F"
-				if re.search("|".join(self.keywords["male"]), c.lower()):
+				if search("|".join(self.keywords["male"]), c.lower()):
 					self.gender = "M"
 	
 	##
@@ -51,7 +51,7 @@ class EntSettlement(EntCore):
 			self.area,
 			self.population
 		]
-		return self.serialize("\t".join(data))
+		return self.serialize(data)
 
 	##
     # @brief tries to assign entity information (calls the appropriate functions)
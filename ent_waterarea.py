@@ -53,7 +53,7 @@ class EntWaterArea(EntCore):
 			self.longitude,
 			self.area
 		]
-		return self.serialize("\t".join(data))
+		return self.serialize(data)
 
 	##
     # @brief tries to assign entity information (calls the appropriate functions)
@@ -58,7 +58,7 @@ class EntWaterCourse(EntCore):
 			self.streamflow,
 			self.source_loc
 		]
-		return self.serialize("\t".join(data))
+		return self.serialize(data)
 
 	##
     # @brief tries to assign entity information (calls the appropriate functions)
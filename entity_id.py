@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file entity_id.py
+# @brief deterministic IDs of entities (ID column of the KB) and detection of their collisions
+#
+# an ID is derived from the wikipedia link of the entity (language and title of its page), so the same page gets
+# the same ID in every run, in every shard of a run and in every release (a renamed page gets a new ID)
+#
+# IDs have ID_LENGTH hex digits (64 bits, collisions are not expected even for tens of millions of entities),
+# a collision is still detected by EntityIds of the main process - the later row gets an ID derived from its link
+# and a salt (the first unused one), rows are written in the order of the dump, so the resolution is deterministic too
+
+from hashlib import sha224
+
+from kb_schema import LINK_COLUMN
+
+# number of hex digits of an ID
+ID_LENGTH = 16
+
+##
+# @brief returns the ID of an entity
+# @param link - wikipedia link of the entity (https://<lang>.wikipedia.org/wiki/<title>)
+# @param salt - number of the resolved collision (0 = no collision)
+def entity_id(link, salt=0):
+	key = link if not salt else f"{link}#{salt}"
+	return sha224(key.encode("utf-8")).hexdigest()[:ID_LENGTH]
+
+##
+# @class EntityIds
+# @brief IDs of written rows of the KB (64-bit integers), resolves collisions of IDs of new rows
+class EntityIds:
+	def __init__(self):
+		self.ids = set()
+		self.collisions = 0
+
+	##
+	# @brief registers IDs of rows of an existing KB file (rows appended to it must not reuse them)
+	def read(self, kb_fpath):
+		with open(kb_fpath, "r", encoding="utf-8") as file:
+			for line in file:
+				eid = line.partition("\t")[0]
+				if eid:
+					self.ids.add(int(eid, 16))
+
+	##
+	# @brief registers the ID of a row
+	# @param row - serialized KB row
+	# @return the row with a unique ID
+	def assign(self, row):
+		eid, _, rest = row.partition("\t")
+		key = int(eid, 16)
+		if key not in self.ids:
+			self.ids.add(key)
+			return row
+
+		self.collisions += 1
+		link = rest.split("\t", LINK_COLUMN)[LINK_COLUMN - 1]
+		salt = 0
+		while key in self.ids:
+			salt += 1
+			eid = entity_id(link, salt)
+			key = int(eid, 16)
+		self.ids.add(key)
+		return f"{eid}\t{rest}"
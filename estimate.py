@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file estimate.py
+# @brief estimates wall time and peak memory of a full extraction (wiki_extract.py) for numbers of workers
+#
+# the real pipeline is run on a uniform random sample of pages of the dump (page index, see page_index.py)
+# and the measured costs are extrapolated to all pages of the dump:
+# - main process: reading and filtering of pages (random reads of the sample - slower than the sequential scan of a run)
+# - workers: processing of entity pages (time of the "page" stage in a pool worker)
+# - redirects and first sentences tables: time and memory of loading of their first lines, extrapolated by the file sizes
+# - memory: main process (modules, tables, buffer of a batch) + workers (unique memory of a worker after the sample,
+#   including pages of tables copied from the main process by the garbage collector)
+#
+# the main process reads a batch and then waits for workers to process it, so the wall time is
+# tables + main + workers / min(workers, CPUs)
+#
+# usage: python3 estimate.py [wiki_extract.py arguments (-l, -d, -I, -p, -r, -s)] [--sample N] [--workers 1,2,4] [--print-workers]
+
+import argparse
+import os
+import random
+import tracemalloc
+from time import perf_counter
+
+import mem_profiler
+from autotune import available_memory_kb
+from debugger import Debugger as debug
+from page_pool import PagePool
+from wiki_extract import WikiExtract, flush_telemetry, init_worker, process_page
+
+# default number of sampled pages
+SAMPLE = 1000
+
+# default number of loaded lines of the redirects and first sentences tables
+TABLE_LINES = 200000
+
+# number of pages of a batch of the main process (LOOP_CYCLE of WikiExtract.parse_xml_dump)
+BATCH_SIZE = 4000
+
+# part of available memory which may be used by the run
+MEMORY_USAGE = 0.9
+
+##
+# @brief returns the number of bytes of the first lines of a file
+def prefix_bytes(fpath, lines):
+	size = 0
+	with open(fpath, "rb") as file:
+		for i, line in enumerate(file):
+			if i == lines:
+				break
+			size += len(line)
+	return size
+
+##
+# @brief loads the first lines of a table, measures its time and memory and extrapolates them to the whole file
+# @param load - loader of the table (WikiExtract.load_redirects or load_first_sentences)
+# @return tuple (table with the first lines, estimated seconds, estimated kB)
+def measure_table(load, fpath, lines):
+	if not os.path.isfile(fpath):
+		return dict(), 0.0, 0
+	loaded_bytes = prefix_bytes(fpath, lines)
+	ratio = os.path.getsize(fpath) / loaded_bytes if loaded_bytes else 0
+
+	tracemalloc.start()
+	start = perf_counter()
+	table = load(fpath, max_lines=lines)
+	seconds = perf_counter() - start
+	traced = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	return table, seconds * ratio, int(traced / 1024 * ratio)
+
+##
+# @class Estimator
+# @brief measures costs of the pipeline on a sample of pages of the dump
+class Estimator:
+	def __init__(self, extractor):
+		self.extractor = extractor
+		self.pages = 0
+		self.sample_pages = 0
+		self.entity_pages = 0
+		self.main_seconds = 0.0
+		self.worker_seconds = 0.0
+		self.page_bytes = 0
+		self.tables_seconds = 0.0
+		self.tables_kb = 0
+		self.main_kb = 0
+		self.worker_kb = 0
+		self.worker_growth_kb = 0
+		self.worker_copy_ratio = 0.0
+
+	##
+	# @brief returns a pool with one worker for the sample
+	def new_pool(self, langmap, patterns, keywords):
+		return PagePool(1, initializer=init_worker, initargs=(self.extractor, langmap, patterns, keywords))
+
+	##
+	# @param sample - number of sampled pages
+	# @param seed - seed of the sample
+	# @param table_lines - number of loaded lines of the tables
+	def measure(self, sample, seed, table_lines):
+		extractor = self.extractor
+		lang = extractor.console_args.lang
+		langmap = extractor.load_langmap(extractor.get_path(f"json/langmap_{lang}.json"))
+		patterns, keywords = extractor.load_patterns(extractor.get_path(f"json/patterns_{lang}.json"))
+		self.main_kb = mem_profiler.current_rss_kb()
+
+		index = extractor.load_page_index()
+		self.pages = len(index)
+		positions = sorted(random.Random(seed).sample(range(len(index)), min(sample, len(index))))
+		self.sample_pages = len(positions)
+
+		# main process - reading and filtering of the sampled pages (without tables, their lookups are not measured)
+		ent_data = []
+		start = perf_counter()
+		for offset, page in index.iter_pages(extractor.pages_dump_fpath, positions):
+			page_data = extractor.get_page_data(page, keywords, dict(), dict())
+			if page_data is not None:
+				ent_data.append((offset, page_data))
+				self.page_bytes += len(page_data[1].encode("utf-8"))
+		self.main_seconds = perf_counter() - start
+		self.entity_pages = len(ent_data)
+
+		# worker forked before the tables are loaded - processing of the sample and growth of its memory
+		with self.new_pool(langmap, patterns, keywords) as pool:
+			_, fresh_kb = pool.map(mem_profiler.process_memory_kb, [None], on_timeout=None)[0]
+			results = pool.map(process_page, ent_data, on_timeout=None)
+			snapshots = [snapshot for _, snapshot in results if snapshot is not None] + pool.broadcast(flush_telemetry)
+			_, processed_kb = pool.map(mem_profiler.process_memory_kb, [None], on_timeout=None)[0]
+		self.worker_seconds = sum(snapshot["stages"]["page"][1] for snapshot in snapshots if "page" in snapshot["stages"]) / 1e9
+		self.worker_kb = fresh_kb
+		self.worker_growth_kb = max(0, processed_kb - fresh_kb)
+
+		# tables - first lines are loaded and extrapolated
+		redirects, redirects_seconds, redirects_kb = measure_table(extractor.load_redirects, extractor.redirects_dump_fpath, table_lines)
+		first_sentences, sentences_seconds, sentences_kb = measure_table(extractor.load_first_sentences, extractor.fs_dump_path, table_lines)
+		self.tables_seconds = redirects_seconds + sentences_seconds
+		self.tables_kb = redirects_kb + sentences_kb
+
+		# worker forked after the tables are loaded - pages of the tables copied by the worker
+		loaded_kb = mem_profiler.current_rss_kb() - self.main_kb
+		if loaded_kb > 0:
+			with self.new_pool(langmap, patterns, keywords) as pool:
+				_, copied_kb = pool.map(mem_profiler.process_memory_kb, [None], on_timeout=None)[0]
+			self.worker_copy_ratio = min(1.0, max(0, copied_kb - fresh_kb) / loaded_kb)
+		del redirects, first_sentences
+
+	##
+	# @brief returns estimated (wall time in seconds, peak memory in kB) of a run with a number of workers
+	def estimate(self, workers):
+		scale = self.pages / self.sample_pages if self.sample_pages else 0
+		main_seconds = self.main_seconds * scale
+		worker_seconds = self.worker_seconds * scale
+		wall = self.tables_seconds + main_seconds + worker_seconds / min(workers, os.cpu_count() or workers)
+
+		batch_kb = 2 * BATCH_SIZE * self.page_bytes / self.entity_pages / 1024 if self.entity_pages else 0
+		main_kb = self.main_kb + self.tables_kb + batch_kb
+		worker_kb = self.worker_kb + self.worker_growth_kb + self.worker_copy_ratio * self.tables_kb
+		return wall, int(main_kb + workers * worker_kb)
+
+##
+# @brief returns default numbers of workers (powers of two up to the number of CPUs and the number of CPUs)
+def default_workers():
+	cpus = os.cpu_count() or 1
+	workers = {cpus}
+	n = 1
+	while n < cpus:
+		workers.add(n)
+		n *= 2
+	return sorted(workers)
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Estimates wall time and peak memory of the extraction from a sample of pages.")
+	parser.add_argument("--sample", type=int, default=SAMPLE, help="Number of sampled pages (default: %(default)s).")
+	parser.add_argument("--seed", type=int, default=0, help="Seed of the sample (default: %(default)s).")
+	parser.add_argument("--workers", type=lambda x: [int(n) for n in x.split(",")], default=default_workers(), help="Comma separated numbers of workers (default: powers of two up to the number of CPUs).")
+	parser.add_argument("--table-lines", type=int, default=TABLE_LINES, help="Number of loaded lines of the redirects and first sentences tables (default: %(default)s).")
+	parser.add_argument("--print-workers", action="store_true", help="Print only the recommended number of workers.")
+	args, extraction_args = parser.parse_known_args()
+
+	extractor = WikiExtract()
+	extractor.parse_args(extraction_args)
+	estimator = Estimator(extractor)
+	estimator.measure(args.sample, args.seed, args.table_lines)
+
+	available_kb = available_memory_kb()
+	cpus = os.cpu_count() or 1
+	estimates = [(workers, *estimator.estimate(workers)) for workers in args.workers]
+	fitting = [workers for workers, _, peak_kb in estimates if workers <= cpus and peak_kb <= available_kb * MEMORY_USAGE]
+	recommended = max(fitting) if len(fitting) else 1
+
+	if args.print_workers:
+		print(recommended)
+	else:
+		print(f"dump: {estimator.pages} pages, sample: {estimator.sample_pages} pages ({estimator.entity_pages} entity pages)")
+		print(f"tables: {estimator.tables_kb // 1024} MB, {debug.pretty_time_delta(estimator.tables_seconds)} to load")
+		print(f"worker: {estimator.worker_kb // 1024} MB + {estimator.worker_growth_kb // 1024} MB after the sample, copies {estimator.worker_copy_ratio * 100:.0f}% of tables")
+		print(f"available memory: {available_kb // 1024} MB, CPUs: {cpus}")
+		print("")
+		print("{:<10}{:>16}{:>16}".format("workers", "wall time", "peak [MB]"))
+		for workers, wall, peak_kb in estimates:
+			mark = " *" if workers == recommended else ""
+			print("{:<10}{:>16}{:>16}{}".format(workers, debug.pretty_time_delta(wall), peak_kb // 1024, mark))
+		print("")
+		print(f"recommended number of workers: {recommended}")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file incremental.py
+# @brief incremental build of the KB - changes of pages against the previous release and merge of the previous KB with reprocessed pages
+#
+# inputs of an incremental build (wiki_extract.py --incremental PREVIOUS_KB --previous-index PREVIOUS_INDEX):
+# - the previous KB - "kb" of the extraction or KBstatsMetrics.all of the metrics (rows with filled metrics columns),
+#   also a "kb" of an older release without metrics columns and with rows of unclassified pages (dropped, see UNCLASSIFIED_PREFIXES)
+# - the page index of the previous dump (see page_index.py, the previous dump itself is not needed)
+#
+# pages of the current dump are matched with pages of the previous dump by page ids:
+# - added - page id is not in the previous dump
+# - changed - sha1 of the revision or the title differs
+# - removed - page id is not in the current dump
+# - redirected - page is not changed, but its redirects (REDIRECTS column of the previous KB) differ from the current redirects file
+#
+# added, changed and redirected pages are processed again, rows of changed, redirected and removed pages are dropped
+# from the previous KB, then the previous KB and the reprocessed rows are merged by positions of their pages
+# in the current dump (both are streams in the order of their dumps, only sets of titles are kept in memory)
+#
+# rows are matched with pages by the WIKIPEDIA LINK column, IDs of all rows are derived again from their links
+# (see entity_id.py, IDs of a KB with IDs of older releases are replaced) and their collisions are resolved
+# in the order of the merged KB, so the merged KB equals the KB of a full build,
+# metrics columns of kept rows are cleared (metrics are computed again for the whole KB by metrics/),
+# a row of the previous KB whose width does not match the schema (with or without metrics columns) raises KbRowError
+#
+# unchanged pages are not processed again, so a change of patterns, langmap or entity classes needs a full build
+
+import heapq
+import os
+
+from entity_id import EntityIds, entity_id
+from kb_schema import ID_COLUMN, KB_SCHEMA, LINK_COLUMN, METRICS_COLUMNS, REDIRECTS_COLUMN, TYPE_COLUMN, UNCLASSIFIED_PREFIXES, KbRowError
+
+##
+# @class PageChanges
+# @brief changes of pages of the current dump against the previous dump
+class PageChanges:
+	def __init__(self):
+		# positions of pages of the current dump which are processed again
+		self.positions = set()
+		# titles of pages of the previous KB whose rows are dropped
+		self.stale = set()
+		self.added = 0
+		self.changed = 0
+		self.removed = 0
+		self.redirected = 0
+
+	def counters(self):
+		return {"added": self.added, "changed": self.changed, "removed": self.removed, "redirected": self.redirected}
+
+##
+# @brief returns the title of a page of a wikipedia link (inverse of WikiExtract.get_link)
+def link_title(link):
+	return link.partition("/wiki/")[2].replace("_", " ")
+
+##
+# @brief finds added, changed and removed pages
+# @param previous - PageIndex of the previous dump
+# @param current - PageIndex of the current dump
+# @return PageChanges
+def diff_indexes(previous, current):
+	changes = PageChanges()
+	for position in range(len(current)):
+		previous_position = previous.find_page_id(current.page_ids[position])
+		if previous_position is None:
+			changes.added += 1
+			changes.positions.add(position)
+			continue
+		title = current.title(position)
+		previous_title = previous.title(previous_position)
+		if previous.record(previous_position).sha1 != current.record(position).sha1 or previous_title != title:
+			changes.changed += 1
+			changes.positions.add(position)
+			changes.stale.add(previous_title)
+
+	for position in range(len(previous)):
+		if current.find_page_id(previous.page_ids[position]) is None:
+			changes.removed += 1
+			changes.stale.add(previous.title(position))
+	return changes
+
+##
+# @brief checks the width of a row of a KB file and strips its metrics columns
+# @param columns - array of columns of the row
+# @return array of core and entity specific columns
+#
+# raises KbRowError if the row matches the schema neither with nor without the metrics columns
+def entity_columns(columns):
+	prefix = columns[TYPE_COLUMN] if len(columns) > TYPE_COLUMN else ""
+	width = KB_SCHEMA.widths.get(prefix)
+	if width is None:
+		raise KbRowError(prefix, f"unknown entity type of row \"{columns[0]}\"")
+	if len(columns) == width + len(METRICS_COLUMNS):
+		return columns[:width]
+	if len(columns) == width:
+		return columns
+	raise KbRowError(prefix, f"{len(columns)} columns of row \"{columns[ID_COLUMN]}\", expected {width} or {width + len(METRICS_COLUMNS)}")
+
+##
+# @brief generator of rows of a KB file (rows of unclassified pages are skipped)
+# @return (title of the page, array of core and entity specific columns) tuples
+def read_rows(kb_fpath):
+	with open(kb_fpath, "r", encoding="utf-8") as file:
+		for line in file:
+			line = line.rstrip("\n")
+			if not line:
+				continue
+			columns = line.split("\t")
+			if len(columns) > TYPE_COLUMN and columns[TYPE_COLUMN] in UNCLASSIFIED_PREFIXES:
+				continue
+			columns = entity_columns(columns)
+			yield link_title(columns[LINK_COLUMN]), columns
+
+##
+# @brief finds unchanged pages of the previous KB whose redirects differ from the current redirects
+# @param kb_fpath - path to the previous KB
+# @param current - PageIndex of the current dump
+# @param changes - PageChanges (updated)
+# @param redirects - current redirects (link -> array of titles, see WikiExtract.load_redirects)
+def diff_redirects(kb_fpath, current, changes, redirects):
+	for title, columns in read_rows(kb_fpath):
+		if title in changes.stale:
+			continue
+		position = current.find_title(title)
+		if position is None:
+			changes.stale.add(title)
+			continue
+		previous_redirects = set(columns[REDIRECTS_COLUMN].split("|")) - {""}
+		if previous_redirects != set(redirects.get(columns[LINK_COLUMN], [])):
+			changes.redirected += 1
+			changes.positions.add(position)
+			changes.stale.add(title)
+
+##
+# @brief generator of rows of a KB file keyed by positions of their pages in the current dump
+# @param stale - titles of dropped rows (None = no row is dropped)
+# @return (position, row) tuples, row with the ID derived from its link and with empty metrics columns
+def keyed_rows(kb_fpath, current, stale=None):
+	for title, columns in read_rows(kb_fpath):
+		if stale is not None and title in stale:
+			continue
+		position = current.find_title(title)
+		if position is None:
+			continue
+		columns[ID_COLUMN] = entity_id(columns[LINK_COLUMN])
+		yield position, "\t".join(columns) + KB_SCHEMA.metrics_suffix + "\n"
+
+##
+# @brief merges the previous KB (without stale rows) with reprocessed rows into a new KB
+# @param previous_fpath - path to the previous KB
+# @param delta_fpath - path to rows of reprocessed pages
+# @param output_fpath - path to the new KB (may be the same file as the previous KB)
+# @param current - PageIndex of the current dump
+# @param stale - titles of dropped rows of the previous KB
+# @param entity_ids - EntityIds of the new KB (None = new EntityIds)
+# @return tuple (number of kept rows, number of reprocessed rows)
+def merge_kb(previous_fpath, delta_fpath, output_fpath, current, stale, entity_ids=None):
+	if entity_ids is None:
+		entity_ids = EntityIds()
+	counts = [0, 0]
+
+	def counted(rows, i):
+		for row in rows:
+			counts[i] += 1
+			yield row
+
+	tmp_fpath = output_fpath + ".tmp"
+	try:
+		with open(tmp_fpath, "w", encoding="utf-8") as file:
+			for _, row in heapq.merge(counted(keyed_rows(previous_fpath, current, stale), 0), counted(keyed_rows(delta_fpath, current), 1), key=lambda item: item[0]):
+				file.write(entity_ids.assign(row))
+	except KbRowError:
+		os.remove(tmp_fpath)
+		raise
+	os.replace(tmp_fpath, output_fpath)
+	return tuple(counts)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file kb_diff.py
+# @brief streaming diff of two KB releases - added, removed and changed entities with deltas of their columns
+#
+# inputs are KBs in the wikipedia format (kb, KBstatsMetrics.all) with their HEAD-KB files or KBs in the generic format
+# (KB.tsv of kbwiki2gkb.py, the head is read from the KB file itself)
+#
+# rows of both KBs are sorted by the key of entities by an external sort (sorted runs of at most --buffer-size MB of rows
+# are written into temporary files and merged), then the sorted KBs are merged, so memory is bounded by the buffer size
+# regardless of the size of the KBs
+#
+# columns are named by the head of each KB (releases may differ in columns of a type), the key is a column of the heads:
+# WIKIPEDIA LINK (or WIKIPEDIA URL of the generic format) by default - links are stable across releases,
+# ID is stable only between releases with deterministic IDs (see entity_id.py)
+#
+# @section output output
+# JSON lines (one entity per line):
+# - {"change": "added", "key", "type", "columns": {column: value}} (non-empty values of the new row)
+# - {"change": "removed", "key", "type", "columns": {column: value}} (non-empty values of the old row)
+# - {"change": "changed", "key", "type", "columns": {column: delta}}, delta is [old value, new value]
+#   or {"added": [...], "removed": [...]} for multi-value columns (order of values is ignored)
+#
+# summary (numbers of entities and of changes of each column) is printed to stderr
+#
+# usage: python3 kb_diff.py OLD_KB NEW_KB [--old-head HEAD-KB] [--new-head HEAD-KB] [-o DIFF] [--key COLUMN] [--ignore COLUMN,...] [--buffer-size MB]
+
+import argparse
+import heapq
+import json
+import re
+import sys
+import tempfile
+from collections import Counter
+
+# default key columns (wikipedia format, generic format)
+KEY_COLUMNS = ["WIKIPEDIA LINK", "WIKIPEDIA URL"]
+
+# types of columns shared by all entities of the generic format
+GENERIC_TYPE = "__generic__"
+STATS_TYPE = "__stats__"
+
+# default size of a sorted run (MB of rows)
+BUFFER_SIZE = 256
+
+_TYPE_RE = re.compile(r"^<([^>]+)>")
+_FLAGS_RE = re.compile(r"^\{([^}\[]*)(?:\[[^\]]*\])?\}")
+
+##
+# @class KbHead
+# @brief columns of entity types of a KB (HEAD-KB)
+#
+# a row of the generic format consists of columns of __generic__, of each type of its composite type (e.g. "person+artist")
+# and of __stats__
+class KbHead:
+	def __init__(self, lines):
+		# type -> array of names of columns
+		self.columns = dict()
+		# type -> set of names of multi-value columns
+		self.multi = dict()
+		for line in lines:
+			line = line.rstrip("\n")
+			match = _TYPE_RE.match(line)
+			if match is None:
+				continue
+			prefix = match.group(1).lower()
+			names = []
+			multi = set()
+			for column in line[match.end():].split("\t"):
+				flags = _FLAGS_RE.match(column)
+				name = column[flags.end():] if flags else column
+				if flags and "m" in flags.group(1):
+					multi.add(name)
+				names.append(name)
+			self.columns[prefix] = names
+			self.multi[prefix] = multi
+
+		self.generic = GENERIC_TYPE in self.columns
+		# TYPE column is at the same position for all types
+		first = next(iter(self.columns.values()))
+		self.type_column = first.index("TYPE")
+		self._default = first
+		self._composed = dict()
+
+	def _compose(self, prefix):
+		prefix = prefix.lower()
+		if prefix not in self._composed:
+			if self.generic:
+				types = [GENERIC_TYPE] + prefix.split("+") + [STATS_TYPE]
+				names = [name for key in types for name in self.columns.get(key, [])]
+				multi = set().union(*[self.multi.get(key, set()) for key in types])
+			else:
+				names = self.columns.get(prefix, self._default)
+				multi = self.multi.get(prefix, set())
+			self._composed[prefix] = (names, multi)
+		return self._composed[prefix]
+
+	##
+	# @brief returns names of columns of a type (columns of the first type if the type is not in the head)
+	def names(self, prefix):
+		return self._compose(prefix)[0]
+
+	##
+	# @brief returns True if a column of a type is a multi-value column
+	def is_multi(self, prefix, name):
+		return name in self._compose(prefix)[1]
+
+	##
+	# @brief returns the first of the columns present in the head
+	def find_column(self, candidates):
+		for name in candidates:
+			if name in self._default:
+				return name
+		raise ValueError(f"none of the columns {', '.join(candidates)} is in the head")
+
+##
+# @brief reads the head of a KB
+# @param kb_fpath - path to the KB
+# @param head_fpath - path to HEAD-KB (None = generic format, the head is in the KB file)
+# @return tuple (KbHead, byte offset of the first row of the KB)
+def read_head(kb_fpath, head_fpath=None):
+	if head_fpath is not None:
+		with open(head_fpath, "r", encoding="utf-8") as file:
+			return KbHead(file), 0
+
+	# generic format: VERSION=..., head, empty line, rows
+	lines = []
+	with open(kb_fpath, "rb") as file:
+		if not file.readline().startswith(b"VERSION="):
+			raise ValueError(f"{kb_fpath} has no head, HEAD-KB is needed")
+		for line in file:
+			if not line.strip():
+				if len(lines):
+					break
+				continue
+			lines.append(line.decode("utf-8"))
+		return KbHead(lines), file.tell()
+
+##
+# @class KbRows
+# @brief rows of a KB keyed by the key column
+class KbRows:
+	def __init__(self, kb_fpath, head, start, key):
+		self.kb_fpath = kb_fpath
+		self.head = head
+		self.start = start
+		self.key = key
+		# type -> position of the key column
+		self.key_columns = dict()
+
+	##
+	# @brief returns the key of a row
+	def row_key(self, line):
+		columns = line.split("\t", self.head.type_column + 1)
+		prefix = columns[self.head.type_column] if len(columns) > self.head.type_column else ""
+		position = self.key_columns.get(prefix)
+		if position is None:
+			position = self.key_columns[prefix] = self.head.names(prefix).index(self.key)
+		return line.split("\t", position + 1)[position].rstrip("\n")
+
+	##
+	# @brief generator of rows of the KB
+	def lines(self):
+		with open(self.kb_fpath, "r", encoding="utf-8") as file:
+			file.seek(self.start)
+			for line in file:
+				if line.strip():
+					yield line if line.endswith("\n") else line + "\n"
+
+	##
+	# @brief generator of rows sorted by their keys (external sort)
+	# @param tmpdir - directory of sorted runs
+	# @param buffer_size - maximal size of a sorted run (bytes)
+	# @return (key, row) tuples
+	def sorted_rows(self, tmpdir, buffer_size):
+		runs = []
+		buffer = []
+		size = 0
+		for line in self.lines():
+			buffer.append((self.row_key(line), line))
+			size += len(line)
+			if size >= buffer_size:
+				runs.append(self.write_run(tmpdir, buffer))
+				buffer = []
+				size = 0
+		buffer.sort()
+		if not runs:
+			yield from buffer
+			return
+		if buffer:
+			runs.append(self.write_run(tmpdir, buffer))
+		yield from heapq.merge(*[self.read_run(fpath) for fpath in runs])
+
+	def write_run(self, tmpdir, buffer):
+		buffer.sort()
+		file = tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=tmpdir, suffix=".run", delete=False)
+		with file:
+			file.writelines(line for _, line in buffer)
+		return file.name
+
+	def read_run(self, fpath):
+		with open(fpath, "r", encoding="utf-8") as file:
+			for line in file:
+				yield self.row_key(line), line
+
+	##
+	# @brief returns (type, dictionary column -> value) of a row
+	def values(self, line):
+		columns = line.rstrip("\n").split("\t")
+		prefix = columns[self.head.type_column]
+		return prefix, dict(zip(self.head.names(prefix), columns))
+
+##
+# @brief returns deltas of columns of an entity (empty if the entity did not change)
+# @param ignore - names of ignored columns
+def column_deltas(old_rows, old_line, new_rows, new_line, ignore=()):
+	old_type, old = old_rows.values(old_line)
+	new_type, new = new_rows.values(new_line)
+	deltas = dict()
+	for name in list(new) + [name for name in old if name not in new]:
+		if name in ignore:
+			continue
+		old_value = old.get(name, "")
+		new_value = new.get(name, "")
+		if old_value == new_value:
+			continue
+		if old_rows.head.is_multi(old_type, name) or new_rows.head.is_multi(new_type, name):
+			old_values = set(old_value.split("|")) - {""}
+			new_values = set(new_value.split("|")) - {""}
+			if old_values != new_values:
+				deltas[name] = {"added": sorted(new_values - old_values), "removed": sorted(old_values - new_values)}
+		else:
+			deltas[name] = [old_value, new_value]
+	return deltas
+
+##
+# @class KbDiff
+# @brief diff of two KBs
+class KbDiff:
+	def __init__(self, old_rows, new_rows, ignore=()):
+		self.old_rows = old_rows
+		self.new_rows = new_rows
+		self.ignore = set(ignore)
+		self.counts = Counter()
+		self.column_counts = Counter()
+
+	def entity(self, change, key, rows, line, columns=None):
+		prefix, values = rows.values(line)
+		if columns is None:
+			columns = {name: value for name, value in values.items() if value and name not in self.ignore}
+		self.counts[change] += 1
+		return {"change": change, "key": key, "type": prefix, "columns": columns}
+
+	##
+	# @brief generator of changes of entities (dictionaries, see @ref output), in the order of keys
+	# @param tmpdir - directory of sorted runs
+	# @param buffer_size - maximal size of a sorted run (bytes)
+	def changes(self, tmpdir, buffer_size):
+		old = self.old_rows.sorted_rows(tmpdir, buffer_size)
+		new = self.new_rows.sorted_rows(tmpdir, buffer_size)
+		old_item = next(old, None)
+		new_item = next(new, None)
+		while old_item is not None or new_item is not None:
+			if new_item is None or (old_item is not None and old_item[0] < new_item[0]):
+				yield self.entity("removed", old_item[0], self.old_rows, old_item[1])
+				old_item = next(old, None)
+			elif old_item is None or new_item[0] < old_item[0]:
+				yield self.entity("added", new_item[0], self.new_rows, new_item[1])
+				new_item = next(new, None)
+			elif old_item[1] == new_item[1]:
+				self.counts["unchanged"] += 1
+				old_item = next(old, None)
+				new_item = next(new, None)
+			else:
+				deltas = column_deltas(self.old_rows, old_item[1], self.new_rows, new_item[1], self.ignore)
+				if len(deltas):
+					self.column_counts.update(deltas.keys())
+					yield self.entity("changed", new_item[0], self.new_rows, new_item[1], deltas)
+				else:
+					self.counts["unchanged"] += 1
+				old_item = next(old, None)
+				new_item = next(new, None)
+
+	##
+	# @brief returns lines of the summary of the diff
+	def summary_lines(self):
+		lines = [", ".join(f"{self.counts[change]} {change}" for change in ["added", "removed", "changed", "unchanged"])]
+		for name, count in self.column_counts.most_common():
+			lines.append("{:<32}{:>12}".format(name, count))
+		return lines
+
+##
+# @brief opens rows of a KB
+# @param key - key column (None = default key column)
+def open_kb(kb_fpath, head_fpath=None, key=None):
+	head, start = read_head(kb_fpath, head_fpath)
+	return KbRows(kb_fpath, head, start, key or head.find_column(KEY_COLUMNS))
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Streaming diff of two KB releases (added, removed and changed entities with deltas of columns).")
+	parser.add_argument("old", help="Path to the old KB.")
+	parser.add_argument("new", help="Path to the new KB.")
+	parser.add_argument("--old-head", help="HEAD-KB of the old KB (not needed for KBs in the generic format).")
+	parser.add_argument("--new-head", help="HEAD-KB of the new KB (not needed for KBs in the generic format).")
+	parser.add_argument("-o", "--output", help="Output file (default: standard output).")
+	parser.add_argument("--key", help=f"Key column of entities (default: {' or '.join(KEY_COLUMNS)}).")
+	parser.add_argument("--ignore", type=lambda x: x.split(","), default=[], help="Comma separated ignored columns (e.g. \"WIKI HITS,SCORE WIKI\").")
+	parser.add_argument("--buffer-size", type=int, default=BUFFER_SIZE, help="Maximal size of a sorted run in MB (default: %(default)s).")
+	parser.add_argument("--tmpdir", help="Directory of sorted runs (default: system temporary directory).")
+	args = parser.parse_args()
+
+	old_rows = open_kb(args.old, args.old_head, args.key)
+	new_rows = open_kb(args.new, args.new_head, args.key or old_rows.key)
+	diff = KbDiff(old_rows, new_rows, args.ignore)
+
+	with tempfile.TemporaryDirectory(prefix="kb-diff-", dir=args.tmpdir) as tmpdir:
+		output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+		try:
+			for change in diff.changes(tmpdir, max(1, args.buffer_size) * 1024 * 1024):
+				output.write(json.dumps(change, ensure_ascii=False) + "\n")
+		finally:
+			if output is not sys.stdout:
+				output.close()
+
+	for line in diff.summary_lines():
+		print(line, file=sys.stderr)
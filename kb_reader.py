@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file kb_reader.py
+# @brief contains KbReader class - memory-mapped KB file with a persistent index of offsets of its rows
+#
+# the KB file (kb, KBstats.all, KBstatsMetrics.all) is mapped into memory, rows are not read or split until they are used:
+# - random access by the number of a row (reader[i], rows are numbered from 0, every line of the file is a row)
+# - iteration over all rows or over rows of given entity types (types are stored in the index, other rows are not touched)
+# - KbRow splits its columns on the first access to all of them, a single column is split off without splitting the rest
+#
+# the index is built by one scan of the KB and stored next to it (or into the current directory if the directory
+# of the KB is not writable), it is reused while the KB is not changed (like the page index, see page_index.py),
+# a KB read only once (e.g. by stats.py) keeps the index in memory only (save_index=False)
+#
+# @section file_format index file
+# native byte order, 64-bit items:
+# - MAGIC, size of the KB, modification time of the KB (ns), number of rows N, number of entity types T
+# - offsets of rows (N + 1 items, the last one is the end of the last row)
+# - entity types of rows (N items, numbers of types)
+# - names of the types (utf-8, separated by new lines)
+#
+# usage: python3 kb_reader.py KB [--rebuild] [--row N ...] [--type TYPE ...]
+
+import argparse
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+
+MAGIC = b"KBROWIX1"
+INDEX_SUFFIX = ".rowindex"
+
+# column with the entity type (the same for the wikipedia and the generic format)
+TYPE_COLUMN = 1
+
+_HEADER = struct.Struct("QQQQ")
+
+##
+# @brief returns a signature of the KB (size, modification time) that invalidates its index
+def kb_signature(kb_fpath):
+	stat = os.stat(kb_fpath)
+	return stat.st_size, stat.st_mtime_ns
+
+##
+# @class KbRow
+# @brief row of the KB, columns are split when they are used
+class KbRow:
+	__slots__ = ("line", "_columns")
+
+	def __init__(self, line):
+		self.line = line
+		self._columns = None
+
+	##
+	# @brief returns all columns of the row (array of strings)
+	@property
+	def columns(self):
+		if self._columns is None:
+			self._columns = self.line.split("\t")
+		return self._columns
+
+	##
+	# @brief returns a column of the row ("" if the row has less columns)
+	def column(self, position):
+		if self._columns is not None:
+			return self._columns[position] if position < len(self._columns) else ""
+		columns = self.line.split("\t", position + 1)
+		return columns[position] if position < len(columns) else ""
+
+	@property
+	def type(self):
+		return self.column(TYPE_COLUMN)
+
+	def __getitem__(self, position):
+		if isinstance(position, int) and position >= 0:
+			return self.column(position) if self._columns is None else self._columns[position]
+		return self.columns[position]
+
+	def __len__(self):
+		return len(self.columns)
+
+	def __iter__(self):
+		return iter(self.columns)
+
+	def __repr__(self):
+		return f"KbRow({self.line!r})"
+
+##
+# @class KbReader
+# @brief memory-mapped KB file with the index of offsets of its rows
+class KbReader:
+	##
+	# @param kb_fpath - path to the KB
+	# @param rebuild - build the index even if a valid one exists
+	# @param save_index - store a built index (False for a KB which is read once, the index is kept in memory only)
+	def __init__(self, kb_fpath, rebuild=False, save_index=True):
+		self.kb_fpath = kb_fpath
+		self.index_built = False
+		self._index_mapping = None
+
+		self._file = open(kb_fpath, "rb")
+		self._mapping = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(kb_fpath) else b""
+
+		loaded = None if rebuild else self.load_index()
+		if loaded is None:
+			offsets, type_ids, type_names = self.build_index()
+			if save_index:
+				self.save_index(offsets, type_ids, type_names)
+			self.index_built = True
+		else:
+			offsets, type_ids, type_names = loaded
+		self.offsets = offsets
+		self.type_ids = type_ids
+		self.type_names = type_names
+
+	def __len__(self):
+		return len(self.offsets) - 1
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def close(self):
+		if self._index_mapping is not None:
+			self.offsets.release()
+			self.type_ids.release()
+			self._index_mapping.close()
+			self._index_mapping = None
+		if isinstance(self._mapping, mmap.mmap):
+			self._mapping.close()
+		self._file.close()
+
+	##
+	# @brief returns possible paths to the index (next to the KB, in the current directory)
+	def index_fpaths(self):
+		return [self.kb_fpath + INDEX_SUFFIX, os.path.basename(self.kb_fpath) + INDEX_SUFFIX]
+
+	##
+	# @brief builds the index by a scan of the mapped KB
+	# @return tuple (offsets, numbers of types, names of types)
+	def build_index(self):
+		offsets = array("Q")
+		type_ids = array("Q")
+		type_names = []
+		types = dict()
+		mapping = self._mapping
+		offset = 0
+		size = len(mapping)
+		while offset < size:
+			end = mapping.find(b"\n", offset)
+			end = size if end < 0 else end + 1
+			# entity type - the column after the TYPE_COLUMN-th tab
+			start = offset
+			for _ in range(TYPE_COLUMN):
+				start = mapping.find(b"\t", start, end) + 1
+				if not start:
+					break
+			if start:
+				stop = mapping.find(b"\t", start, end)
+				name = mapping[start:stop if stop >= 0 else end].rstrip(b"\r\n").decode("utf-8")
+			else:
+				name = ""
+			if name not in types:
+				types[name] = len(type_names)
+				type_names.append(name)
+			offsets.append(offset)
+			type_ids.append(types[name])
+			offset = end
+		offsets.append(size)
+		return offsets, type_ids, type_names
+
+	##
+	# @brief writes the index
+	def save_index(self, offsets, type_ids, type_names):
+		size, mtime_ns = kb_signature(self.kb_fpath)
+		for fpath in self.index_fpaths():
+			tmp_fpath = fpath + ".tmp"
+			try:
+				with open(tmp_fpath, "wb") as file:
+					file.write(MAGIC)
+					file.write(_HEADER.pack(size, mtime_ns, len(type_ids), len(type_names)))
+					file.write(offsets)
+					file.write(type_ids)
+					file.write("\n".join(type_names).encode("utf-8"))
+				os.replace(tmp_fpath, fpath)
+				return
+			except OSError:
+				continue
+
+	##
+	# @brief maps the index file into memory
+	# @return tuple (offsets, numbers of types, names of types) or None if there is no valid index
+	def load_index(self):
+		for fpath in self.index_fpaths():
+			try:
+				with open(fpath, "rb") as file:
+					mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+			except (OSError, ValueError):
+				continue
+
+			header_size = len(MAGIC) + _HEADER.size
+			if len(mapping) < header_size or mapping[:len(MAGIC)] != MAGIC:
+				mapping.close()
+				continue
+			size, mtime_ns, count, type_count = _HEADER.unpack(mapping[len(MAGIC):header_size])
+			if (size, mtime_ns) != kb_signature(self.kb_fpath):
+				mapping.close()
+				continue
+
+			view = memoryview(mapping)
+			offsets_end = header_size + (count + 1) * 8
+			types_end = offsets_end + count * 8
+			offsets = view[header_size:offsets_end].cast("Q")
+			type_ids = view[offsets_end:types_end].cast("Q")
+			type_names = bytes(view[types_end:]).decode("utf-8").split("\n") if type_count else []
+			self._index_mapping = mapping
+			return offsets, type_ids, type_names
+		return None
+
+	##
+	# @brief returns the raw line of a row (without the new line)
+	def line(self, row):
+		data = self._mapping[self.offsets[row]:self.offsets[row + 1]]
+		return data.decode("utf-8").rstrip("\n")
+
+	def __getitem__(self, row):
+		if row < 0:
+			row += len(self)
+		if not 0 <= row < len(self):
+			raise IndexError(row)
+		return KbRow(self.line(row))
+
+	def __iter__(self):
+		for line in self.lines():
+			yield KbRow(line)
+
+	##
+	# @brief generator of raw lines of all rows in the order of the KB (without new lines)
+	def lines(self):
+		mapping = self._mapping
+		offsets = self.offsets
+		start = offsets[0] if len(offsets) else 0
+		for row in range(1, len(offsets)):
+			end = offsets[row]
+			yield mapping[start:end].decode("utf-8").rstrip("\n")
+			start = end
+
+	##
+	# @brief returns numbers of rows of entity types (dictionary type -> number of rows)
+	def type_counts(self):
+		counts = [0] * len(self.type_names)
+		for type_id in self.type_ids:
+			counts[type_id] += 1
+		return dict(zip(self.type_names, counts))
+
+	##
+	# @brief generator of rows of given entity types
+	# @param types - iterable of entity types (None = all rows)
+	# @return (number of the row, KbRow) tuples
+	def rows(self, types=None):
+		if types is None:
+			for row, line in enumerate(self.lines()):
+				yield row, KbRow(line)
+			return
+		wanted = set(self.type_names.index(name) for name in types if name in self.type_names)
+		for row, type_id in enumerate(self.type_ids):
+			if type_id in wanted:
+				yield row, KbRow(self.line(row))
+
+	##
+	# @brief splits rows into chunks of approximately the given size (for processing of chunks in parallel)
+	# @return array of (start, end) byte offsets of chunks aligned to whole rows
+	def chunks(self, chunk_size):
+		chunks = []
+		start = 0
+		size = self.offsets[len(self)]
+		while start < size:
+			row = bisect_left(self.offsets, min(start + chunk_size, size))
+			end = self.offsets[row]
+			chunks.append((start, end))
+			start = end
+		return chunks
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Builds the row index of a KB and reads rows of the KB by it.")
+	parser.add_argument("kb", help="Path to the KB.")
+	parser.add_argument("--rebuild", action="store_true", help="Build the index even if a valid one exists.")
+	parser.add_argument("--row", nargs="+", type=int, default=[], help="Print rows with the given numbers (from 0).")
+	parser.add_argument("--type", nargs="+", default=[], help="Print rows of the given entity types.")
+	args = parser.parse_args()
+
+	with KbReader(args.kb, args.rebuild) as reader:
+		print(f"{'built' if reader.index_built else 'loaded'} row index of {len(reader)} rows")
+		for name, count in sorted(reader.type_counts().items()):
+			print(f"{name}\t{count}")
+		for row in args.row:
+			print(reader.line(row))
+		if len(args.type):
+			for _, row in reader.rows(args.type):
+				print(row.line)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file kb_schema.py
+# @brief contains KbSchema class - columns of each entity type of the KB (HEAD-KB)
+#
+# the schema drives both the HEAD-KB file generation and the serialization of entity rows
+#
+# @section serialization serialization
+# - entity row consists of the core columns, entity specific columns and empty metrics columns (filled by metrics scripts)
+# - number of values of a row is validated when the row is serialized
+# - rows with wrong number of values or with a tab inside a value are rejected with the KbRowError exception
+
+##
+# @brief columns shared by all entity types
+CORE_COLUMNS = [
+	"ID",
+	"TYPE",
+	"NAME",
+	"{m}ALIASES",
+	"{m}REDIRECTS",
+	"DESCRIPTION",
+	"ORIGINAL_WIKINAME",
+	"{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE",
+	"{ui}WIKIPEDIA LINK"
+]
+
+# positions of core columns in rows
+ID_COLUMN = CORE_COLUMNS.index("ID")
+TYPE_COLUMN = CORE_COLUMNS.index("TYPE")
+REDIRECTS_COLUMN = CORE_COLUMNS.index("{m}REDIRECTS")
+LINK_COLUMN = CORE_COLUMNS.index("{ui}WIKIPEDIA LINK")
+
+##
+# @brief columns with wiki statistics and metrics (filled by metrics scripts)
+METRICS_COLUMNS = [
+	"WIKI BACKLINKS",
+	"WIKI HITS",
+	"WIKI PRIMARY SENSE",
+	"SCORE WIKI",
+	"SCORE METRICS",
+	"CONFIDENCE"
+]
+
+PERSON_COLUMNS = [
+	"GENDER",
+	"{e}DATE OF BIRTH",
+	"PLACE OF BIRTH",
+	"{e}DATE OF DEATH",
+	"PLACE OF DEATH",
+	"{m}JOBS",
+	"{m}NATIONALITY"
+]
+
+ARTIST_COLUMNS = PERSON_COLUMNS + [
+	"{m}ART_FORMS",
+	"{m}INFLUENCERS",
+	"{m}INFLUENCEES",
+	"ULAN_ID",
+	"{m}OTHER_URLS"
+]
+
+COUNTRY_COLUMNS = ["LATITUDE", "LONGITUDE", "AREA", "POPULATION"]
+
+##
+# @brief entity specific columns of each entity type (in order of HEAD-KB)
+ENTITY_COLUMNS = {
+	"person":           PERSON_COLUMNS,
+	"person:artist":    ARTIST_COLUMNS,
+	"person:fictional": PERSON_COLUMNS,
+	"person:group":     PERSON_COLUMNS,
+	"country":          COUNTRY_COLUMNS,
+	"country:former":   COUNTRY_COLUMNS,
+	"settlement":       ["COUNTRY", "LATITUDE", "LONGITUDE", "AREA", "POPULATION"],
+	"watercourse":      ["{m}CONTINENT", "LATITUDE", "LONGITUDE", "LENGTH", "AREA", "STREAMFLOW", "SOURCE_LOC"],
+	"waterarea":        ["{m}CONTINENT", "LATITUDE", "LONGITUDE", "AREA"],
+	"geo:relief":       ["{m}CONTINENT", "LATITUDE", "LONGITUDE"],
+	"geo:waterfall":    ["{m}CONTINENT", "LATITUDE", "LONGITUDE", "TOTAL HEIGHT"],
+	"geo:island":       ["{m}CONTINENT", "LATITUDE", "LONGITUDE", "AREA", "POPULATION"],
+	"geo:peninsula":    ["LATITUDE", "LONGITUDE"],
+	"geo:continent":    ["LATITUDE", "LONGITUDE", "AREA", "POPULATION"],
+	"organisation":     ["FOUNDED", "CANCELLED", "ORGANISATION_TYPE", "LOCATION"],
+	"event":            ["START", "END", "LOCATION", "EVENT_TYPE"]
+}
+
+##
+# @brief entity types assigned to pages that could not be classified more precisely (e.g. by geo_utils.assign_prefix),
+# such pages are not entities of the KB - they are skipped, not rejected
+UNCLASSIFIED_PREFIXES = ("geo:unknown", "people:unknown")
+
+##
+# @class KbRowError
+# @brief raised when an entity row does not match the schema
+class KbRowError(ValueError):
+	def __init__(self, prefix, reason):
+		super(KbRowError, self).__init__(f"{prefix}: {reason}")
+		self.prefix = prefix
+		self.reason = reason
+
+##
+# @class KbSchema
+# @brief columns of each entity type, HEAD-KB generation and row serialization
+class KbSchema:
+	##
+	# @brief initializes the schema
+	# @param entity_columns - entity specific columns of each entity type <dictionary>
+	def __init__(self, entity_columns=ENTITY_COLUMNS):
+		self.entity_columns = entity_columns
+		# number of values serialized by entities (core and entity specific columns)
+		self.widths = {
+			prefix: len(CORE_COLUMNS) + len(columns) for prefix, columns in entity_columns.items()
+		}
+		self.metrics_suffix = "\t" * len(METRICS_COLUMNS)
+
+	##
+	# @brief returns all columns of an entity type (as in HEAD-KB)
+	def columns(self, prefix):
+		return CORE_COLUMNS + self.entity_columns[prefix] + METRICS_COLUMNS
+
+	##
+	# @brief returns lines of the HEAD-KB file
+	def head_lines(self):
+		return [f"<{prefix}>" + "\t".join(self.columns(prefix)) + "\n" for prefix in self.entity_columns]
+
+	##
+	# @brief creates the HEAD-KB file
+	def write_head(self, fpath="HEAD-KB"):
+		with open(fpath, "w", encoding="utf-8") as file:
+			file.writelines(self.head_lines())
+
+	##
+	# @brief serializes entity values into a KB row with empty metrics columns
+	# @param prefix - entity type <string>
+	# @param values - values of core and entity specific columns <array of strings>
+	# @return tab separated values of the row <string>
+	#
+	# raises KbRowError if the row does not match the schema
+	def serialize(self, prefix, values):
+		width = self.widths.get(prefix)
+		if width is None:
+			raise KbRowError(prefix, "unknown entity type")
+		if len(values) != width:
+			raise KbRowError(prefix, f"{len(values)} values, expected {width}")
+		row = "\t".join(values)
+		if row.count("\t") != width - 1:
+			raise KbRowError(prefix, "tab inside a value")
+		return row.replace("\n", "") + self.metrics_suffix
+
+KB_SCHEMA = KbSchema()
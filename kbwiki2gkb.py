@@ -9,9 +9,11 @@
 """
 
 import argparse
+import operator
 import os
 import re
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from multiprocessing import Pool
 
 INFILE_KB_HEAD = "HEAD-KB"  # name of KB HEAD file in Wikipedia KB format
 INFILE_KB_DATA = "KBstatsMetrics.all"  # name of KB data file in Wikipedia KB format
@@ -20,6 +22,8 @@ INFILE_KB_HEAD_TYPE = "TYPE"  # name of column with TYPE in Wikipedia KB format
 OUTFILE_KB_HEAD = "HEAD-KB.tsv"  # name of KB HEAD file in Generic KB format
 OUTFILE_KB_DATA = "KB.tsv"  # name of KB data file in Generic KB format
 
+CHUNK_SIZE = 8 * 1024 * 1024  # approximate size of chunk of KB data converted at once (in bytes)
+
 
 # Basic type names of Generic KB format
 COLTYPE_GENERIC = "__generic__"
@@ -313,8 +317,8 @@ def transform_head(fout_head):
         fout_head.write("\t".join(out_columns) + "\n")
 
 
-# Transform KB data in WikipediaKB format to GenericKB format
-def transform_data(in_head, in_kb, fout_kb):
+# Load KB HEAD in WikipediaKB format - returns columns with their positional index for each entity type and index of column with TYPE
+def load_head(in_head):
     in_columns = dict()
     col_type = None
     # list of columns with their positional index for each entity type of WikipediaKB format
@@ -332,105 +336,222 @@ def transform_data(in_head, in_kb, fout_kb):
                 }
                 if not col_type:
                     col_type = in_columns[ent_type][INFILE_KB_HEAD_TYPE]
-    # print(in_columns)
-    with open(in_kb, "r", encoding="utf8") as fin_kb:
-        for line in fin_kb:
-            line = line.strip("\n")
+    return in_columns, col_type
+
+
+# Compile conversion of one entity type of WikipediaKB format to GenericKB format
+# - returns format string of output line, where constant columns are filled in advance and copied columns are positional fields,
+#   and positional indexes of copied columns of WikipediaKB format
+def compile_conversion(in_type, in_columns):
+    out_basetype = MAP_ENTITIES_BASETYPES[in_type]
+    out_types = MAP_BASETYPES_COMPOSITE_TYPES[out_basetype]
+    out_alltypes = [COLTYPE_GENERIC] + out_types + [COLTYPE_STATS]
+    in_type_columns = in_columns.get(in_type, {})
+
+    out_fields = []
+    copied_columns = []
+    for out_type in out_alltypes:
+        for out_column in MAP_TYPES_COLUMNS[out_type]:
+            in_column = None
+            constant = ""
+            # Type is consisting of multiple types (except generic types prefixed and suffixed by underscore) in GenericKB format
+            if out_column == __GENERIC_TYPE:
+                constant = "+".join(out_types)
+            # Fictional flag of GenericKB format is based on "person:fictional" entity type of WikipediaKB format
+            elif out_column == __GENERIC_FICTIONAL:
+                if in_type == "person:fictional":
+                    constant = "1"
+                # If entity type is person (except group), it is likely to be a non-fictional entity
+                elif in_type.startswith("person") and in_type != "person:group":
+                    constant = "0"
+                # ...otherwise we do not know
+            # Special processing for column ROLES of GenericKB format
+            elif out_column == __GENERIC_ROLES:
+                if out_basetype in MAP_COLROLE_OLDCOL:
+                    in_column = in_type_columns[MAP_COLROLE_OLDCOL[out_basetype]]
+            # Special processing for column GEOTYPES of GenericKB format
+            elif out_column == GEO_TYPES:
+                constant = in_type.split(":")[-1]
+            # For column code of GenericKB format find data in KB of WikipediaKB format (with help of WikipediaKB HEAD definition and its entity types)
+            elif (
+                out_column in MAP_NEWCOLS_OLDCOLS
+                and MAP_NEWCOLS_OLDCOLS[out_column] in in_type_columns
+            ):
+                in_column = in_type_columns[MAP_NEWCOLS_OLDCOLS[out_column]]
+
+            if in_column is None:
+                out_fields.append(constant.replace("{", "{{").replace("}", "}}"))
+            else:
+                out_fields.append("{%d}" % len(copied_columns))
+                copied_columns.append(in_column)
+
+    return "\t".join(out_fields) + "\n", tuple(copied_columns)
+
+
+# Conversion plan of one entity type of WikipediaKB format to GenericKB format
+class ConversionPlan:
+    def __init__(self, in_type, in_columns):
+        self.in_type = in_type
+        self.out_format, self.copied_columns = compile_conversion(in_type, in_columns)
+        if len(self.copied_columns) > 1:
+            self._get_copied = operator.itemgetter(*self.copied_columns)
+        else:
+            self._get_copied = lambda in_data: tuple(
+                in_data[i] for i in self.copied_columns
+            )
+
+    def convert(self, in_data):
+        return self.out_format.format(*self._get_copied(in_data))
+
+
+# Compiled conversion plans of KB data - plan for each entity type of WikipediaKB format present in the KB HEAD
+class Converter:
+    def __init__(self, in_columns, col_type):
+        self.col_type = col_type
+        self.plans = {
+            in_type: ConversionPlan(in_type, in_columns)
+            for in_type in in_columns
+            if in_type in MAP_ENTITIES_BASETYPES
+        }
+
+    # Convert lines of KB data in WikipediaKB format to GenericKB format
+    def convert_lines(self, lines):
+        col_type = self.col_type
+        plans = self.plans
+        out_lines = []
+        for line in lines:
+            if not line:
+                continue
             # line of data from KB in WikipediaKB format
             in_data = line.split("\t")
             # entity type of this line
             in_type = in_data[col_type].lower()
-            out_basetype = MAP_ENTITIES_BASETYPES[in_type]
-            out_types = MAP_BASETYPES_COMPOSITE_TYPES[out_basetype]
-            out_alltypes = [COLTYPE_GENERIC] + out_types + [COLTYPE_STATS]
-            out_data = []
-            for out_type in out_alltypes:
-                for out_column, trash in MAP_TYPES_COLUMNS[out_type].items():
-                    # Type is consisting of multiple types (except generic types prefixed and suffixed by underscore) in GenericKB format
-                    if out_column == __GENERIC_TYPE:
-                        out_data.append("+".join(out_types))
-                    # Fictional flag of GenericKB format is based on "person:fictional" entity type of WikipediaKB format
-                    elif out_column == __GENERIC_FICTIONAL:
-                        if in_type == "person:fictional":
-                            out_data.append("1")
-                        # If entity type is person (except group), it is likely to be a non-fictional entity
-                        elif in_type.startswith("person") and in_type != "person:group":
-                            out_data.append("0")
-                        # ...otherwise we do not know
-                        else:
-                            out_data.append("")
-                    # Special processing for column ROLES of GenericKB format
-                    elif out_column == __GENERIC_ROLES:
-                        if out_basetype in MAP_COLROLE_OLDCOL:
-                            out_data.append(
-                                in_data[
-                                    in_columns[in_type][
-                                        MAP_COLROLE_OLDCOL[out_basetype]
-                                    ]
-                                ]
-                            )
-                        else:
-                            out_data.append("")
-                    # Special processing for column GEOTYPES of GenericKB format
-                    elif out_column == GEO_TYPES:
-                        out_data.append(in_type.split(":")[-1])
-                    # For column code of GenericKB format find data in KB of WikipediaKB format (with help of WikipediaKB HEAD definition and its entity types)
-                    else:
-                        if (
-                            out_column in MAP_NEWCOLS_OLDCOLS
-                            and in_type in in_columns
-                            and MAP_NEWCOLS_OLDCOLS[out_column] in in_columns[in_type]
-                        ):
-                            out_data.append(
-                                in_data[
-                                    in_columns[in_type][MAP_NEWCOLS_OLDCOLS[out_column]]
-                                ]
-                            )
-                        else:
-                            out_data.append("")
-            if in_type in in_columns:
-                fout_kb.write("\t".join(out_data) + "\n")
-
-
-parser = argparse.ArgumentParser(
-    description="Convert KB in wikipedia format to generic KB format."
-)
-parser.add_argument(
-    "--indir",
-    default=".",
-    help="Input files (wikipedia format) directory path (default: %(default)s).",
-)
-parser.add_argument(
-    "--outdir",
-    default=".",
-    help="Output files (generic format) directory path (default: %(default)s).",
-)
-parser.add_argument(
-    "--inhead",
-    default=INFILE_KB_HEAD,
-    help="Input KB head (wikipedia format) file name (default: %(default)s).",
-)
-parser.add_argument(
-    "--inkb",
-    default=INFILE_KB_DATA,
-    help="Input KB data (wikipedia format) file name (default: %(default)s).",
-)
-parser.add_argument(
-    "--outkb",
-    default=OUTFILE_KB_DATA,
-    help="Output KB (generic format) file name\n(default: %(default)s).",
-)
-args = parser.parse_args()
-
-outkb = os.path.join(args.outdir, args.outkb)
-with open(outkb, "w") as fout_kb:
-    with open(os.path.join(args.indir, "VERSION"), "r") as fin_version:
-        fout_kb.write("VERSION=" + fin_version.read())
-    fout_kb.write("\n")
-    transform_head(fout_kb)
-    fout_kb.write("\n")
-    transform_data(
-        os.path.join(args.indir, args.inhead),
-        os.path.join(args.indir, args.inkb),
-        fout_kb,
+            if in_type not in plans:
+                # entity type without conversion to GenericKB format is an error, type not present in WikipediaKB HEAD is skipped
+                if in_type not in MAP_ENTITIES_BASETYPES:
+                    raise KeyError(in_type)
+                continue
+            out_lines.append(plans[in_type].convert(in_data))
+        return "".join(out_lines)
+
+
+# Converter of process pool workers
+_worker_converter = None
+
+
+def init_worker(in_columns, col_type):
+    global _worker_converter
+    _worker_converter = Converter(in_columns, col_type)
+
+
+# Convert lines of KB data between given byte offsets (chunk of input file) in a process pool worker
+def convert_chunk(in_kb, start, end):
+    with open(in_kb, "rb") as fin_kb:
+        fin_kb.seek(start)
+        data = fin_kb.read(end - start).decode("utf8")
+    return _worker_converter.convert_lines(data.split("\n"))
+
+
+# Split KB data file into chunks of approximately given size aligned to whole lines - returns list of byte offsets (start, end)
+def split_chunks(in_kb, chunk_size):
+    chunks = []
+    size = os.path.getsize(in_kb)
+    with open(in_kb, "rb") as fin_kb:
+        start = 0
+        while start < size:
+            end = start + chunk_size
+            if end >= size:
+                end = size
+            else:
+                fin_kb.seek(end)
+                fin_kb.readline()
+                end = fin_kb.tell()
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+# Transform KB data in WikipediaKB format to GenericKB format
+# - chunks of input are converted in a process pool and written to the output in the input order
+def transform_data(in_head, in_kb, fout_kb, processes=1, chunk_size=CHUNK_SIZE):
+    in_columns, col_type = load_head(in_head)
+    chunks = split_chunks(in_kb, chunk_size)
+
+    if processes <= 1:
+        init_worker(in_columns, col_type)
+        for start, end in chunks:
+            fout_kb.write(convert_chunk(in_kb, start, end))
+        return
+
+    with Pool(processes, initializer=init_worker, initargs=(in_columns, col_type)) as pool:
+        # bounded number of chunks in progress - converted chunks are written as soon as all previous chunks are written
+        pending = deque()
+        for start, end in chunks:
+            if len(pending) >= 2 * processes:
+                fout_kb.write(pending.popleft().get())
+            pending.append(pool.apply_async(convert_chunk, (in_kb, start, end)))
+        while pending:
+            fout_kb.write(pending.popleft().get())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert KB in wikipedia format to generic KB format."
+    )
+    parser.add_argument(
+        "--indir",
+        default=".",
+        help="Input files (wikipedia format) directory path (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--outdir",
+        default=".",
+        help="Output files (generic format) directory path (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--inhead",
+        default=INFILE_KB_HEAD,
+        help="Input KB head (wikipedia format) file name (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--inkb",
+        default=INFILE_KB_DATA,
+        help="Input KB data (wikipedia format) file name (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--outkb",
+        default=OUTFILE_KB_DATA,
+        help="Output KB (generic format) file name\n(default: %(default)s).",
+    )
+    parser.add_argument(
+        "-m",
+        default=1,
+        type=int,
+        help="Number of processes converting chunks of KB data (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        default=CHUNK_SIZE,
+        type=int,
+        help="Size of chunk of KB data converted at once in bytes (default: %(default)s).",
     )
+    args = parser.parse_args()
+
+    outkb = os.path.join(args.outdir, args.outkb)
+    with open(outkb, "w") as fout_kb:
+        with open(os.path.join(args.indir, "VERSION"), "r") as fin_version:
+            fout_kb.write("VERSION=" + fin_version.read())
+        fout_kb.write("\n")
+        transform_head(fout_kb)
+        fout_kb.write("\n")
+        transform_data(
+            os.path.join(args.indir, args.inhead),
+            os.path.join(args.indir, args.inkb),
+            fout_kb,
+            processes=args.m,
+            chunk_size=args.chunk_size,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file mem_profiler.py
+# @brief memory instrumentation of the extraction (wiki_extract.py --mem-profile)
+#
+# - main process: tracemalloc snapshots of top allocators (source lines) every N pages
+#   (e.g. redirects and first sentences dictionaries vs buffer of pages of the batch)
+# - workers: peak RSS shipped in the telemetry snapshot of each page
+#
+# results are stored in the telemetry of the run (see telemetry.py)
+#
+# tracemalloc keeps its traces in the memory of the main process, so RSS of the main process (and RSS of workers forked
+# from it) is higher than in a run without --mem-profile - compare traced sizes rather than RSS between snapshots
+
+import gc
+import os
+import resource
+import tracemalloc
+
+# default number of pages between snapshots of the main process
+MEM_PROFILE_PAGES = 20000
+
+# number of top allocators recorded in a snapshot
+TOP_ALLOCATORS = 10
+
+##
+# @brief returns peak RSS of the current process (kB)
+def peak_rss_kb():
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+##
+# @brief returns current RSS of the current process (kB)
+def current_rss_kb():
+	with open("/proc/self/statm", "r") as file:
+		return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+##
+# @brief returns unique memory of the current process (private pages, kB)
+#
+# unlike RSS it does not count pages shared with the main process (tables inherited by forked workers until they are copied)
+def unique_rss_kb():
+	try:
+		unique = 0
+		with open("/proc/self/smaps_rollup", "r") as file:
+			for line in file:
+				if line.startswith(("Private_Clean:", "Private_Dirty:")):
+					unique += int(line.split()[1])
+		return unique
+	except OSError:
+		return current_rss_kb()
+
+##
+# @brief returns (current RSS, unique memory) of the current process after a full garbage collection (kB)
+# @param _ - ignored (the function is called as a page function of a pool)
+#
+# the collection visits all tracked objects, so a forked worker copies the pages with objects inherited from the main process
+def process_memory_kb(_=None):
+	gc.collect()
+	return current_rss_kb(), unique_rss_kb()
+
+##
+# @class MemProfiler
+# @brief tracemalloc snapshots of the main process
+class MemProfiler:
+	##
+	# @param pages - number of pages between snapshots
+	def __init__(self, pages=MEM_PROFILE_PAGES):
+		self.pages = pages
+		# array of {"label", "pages", "rss_kb", "traced_kb", "traced_peak_kb", "top": [[location, kB, count], ...]}
+		self.snapshots = []
+
+	def start(self):
+		tracemalloc.start()
+
+	def stop(self):
+		tracemalloc.stop()
+
+	##
+	# @brief takes a snapshot if the number of pages is a multiple of the interval
+	def check(self, pages):
+		if pages % self.pages == 0:
+			self.snapshot(pages)
+
+	##
+	# @brief records top allocators of the main process
+	# @param pages - number of pages found so far
+	# @param label - description of the snapshot
+	def snapshot(self, pages, label=""):
+		traced, traced_peak = tracemalloc.get_traced_memory()
+		statistics = tracemalloc.take_snapshot().filter_traces([
+			tracemalloc.Filter(False, tracemalloc.__file__),
+			tracemalloc.Filter(False, __file__),
+			tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+		]).statistics("lineno")
+		self.snapshots.append({
+			"label": label,
+			"pages": pages,
+			"rss_kb": current_rss_kb(),
+			"traced_kb": traced // 1024,
+			"traced_peak_kb": traced_peak // 1024,
+			"top": [
+				[f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}", stat.size // 1024, stat.count]
+				for stat in statistics[:TOP_ALLOCATORS]
+			]
+		})
+
+	##
+	# @brief returns lines of the report of the snapshots
+	def report_lines(self):
+		lines = []
+		for snapshot in self.snapshots:
+			label = f" ({snapshot['label']})" if snapshot["label"] else ""
+			lines.append(f"pages {snapshot['pages']}{label}: RSS {snapshot['rss_kb'] // 1024} MB, traced {snapshot['traced_kb'] // 1024} MB (peak {snapshot['traced_peak_kb'] // 1024} MB)")
+			for location, size_kb, count in snapshot["top"]:
+				lines.append("  {:<40}{:>12} kB{:>12} blocks".format(location, size_kb, count))
+		return lines
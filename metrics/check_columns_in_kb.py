@@ -43,11 +43,11 @@ line_num = 0
 for line in sys.stdin:
     line_num += 1
     columns = line.rstrip("\n").split("\t")
-    ent_head = kb_struct.get_ent_head(columns)
-    if len(columns) != len(ent_head):
+    width = kb_struct.get_plan(columns).width
+    if len(columns) != width:
         sys.stderr.write(
             "Bad line %s in KB: has %s columns, but its entity in HEAD-KB has %s columns.\n"
-            % (line_num, len(columns), len(ent_head))
+            % (line_num, len(columns), width)
         )
         kb_is_ok = False
     if arguments.cat:
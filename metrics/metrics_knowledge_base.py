@@ -28,6 +28,10 @@ import re
 import sys
 import numpy
 
+# kb_reader.py is shared with the extractor in the parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kb_reader import KbReader
+
 # for debugging purposes only
 import debug
 
@@ -116,6 +120,148 @@ def getDictHeadKB(path_to_headkb=PATH_HEAD_KB):
     return headKB, ent_type_col
 
 
+KB_STATS_COLUMNS = ("WIKI BACKLINKS", "WIKI HITS", "WIKI PRIMARY SENSE")
+KB_SCORE_COLUMNS = ("SCORE WIKI", "SCORE METRICS", "CONFIDENCE")
+KB_METRICS_COLUMNS = KB_STATS_COLUMNS + KB_SCORE_COLUMNS
+
+
+class ColumnPlan:
+    """
+    * Plán přístupu ke sloupcům entit jednoho typu (a podtypu) – indexy sloupců jsou z HEAD-KB zjištěny jen jednou.
+    * Indexy se shodují s KnowledgeBase.get_col_for (při duplicitním názvu sloupce platí jeho první výskyt).
+    * Metody pracují přímo se seznamem sloupců řádku KB, tedy bez opakovaného zjišťování typu entity.
+    """
+
+    __slots__ = (
+        "ent_type",
+        "ent_subtype",
+        "head",
+        "width",
+        "index",
+        "metrics_cols",
+        "stats_cols",
+        "score_cols",
+        "has_metrics",
+    )
+
+    def __init__(self, ent_type, ent_subtype, head):
+        self.ent_type = ent_type
+        self.ent_subtype = ent_subtype
+        self.head = tuple(head)
+        self.width = len(self.head)
+
+        self.index = {}
+        for col, col_name in enumerate(self.head):
+            self.index.setdefault(col_name, col)
+
+        # metriky musí být v HEAD-KB uvedeny jako souvislý blok sloupců
+        self.has_metrics = (
+            "\t".join(self.head).find("\t".join(KB_METRICS_COLUMNS)) >= 0
+        )
+        self.metrics_cols = tuple(
+            self.index[col_name]
+            for col_name in KB_METRICS_COLUMNS
+            if col_name in self.index
+        )
+        self.stats_cols = self._cols_if_present(KB_STATS_COLUMNS)
+        self.score_cols = self._cols_if_present(KB_SCORE_COLUMNS)
+
+    def _cols_if_present(self, col_names):
+        if all(col_name in self.index for col_name in col_names):
+            return self.cols(*col_names)
+        return None
+
+    def __repr__(self):
+        return "ColumnPlan(ent_type=%r, ent_subtype=%r, width=%r)" % (
+            self.ent_type,
+            self.ent_subtype,
+            self.width,
+        )
+
+    def col(self, col_name):
+        """Returns an index of a column with given name."""
+
+        try:
+            return self.index[col_name]
+        except KeyError:
+            raise RuntimeError(
+                "Bad column name '%s' for type '%s'." % (col_name, self.ent_type)
+            )
+
+    def cols(self, *col_names):
+        """Returns a tuple of indexes of columns with given names."""
+
+        return tuple(self.col(col_name) for col_name in col_names)
+
+    def get(self, columns, col_name):
+        """Returns a value of a column with given name from columns of a line."""
+
+        return columns[self.col(col_name)]
+
+    def values(self, columns, col_names):
+        """Returns a tuple of values of columns with given names from columns of a line."""
+
+        return tuple(columns[self.col(col_name)] for col_name in col_names)
+
+    def nonempty_columns(self, columns):
+        """Returns a number of non-empty columns of a line except the metrics columns."""
+
+        result = 0
+        for value in columns:
+            if value:
+                result += 1
+        for col in self.metrics_cols:
+            if col < len(columns) and columns[col]:
+                result -= 1
+        return result
+
+
+class KbLines:
+    """
+    * Řádky KB namapované do paměti (KbReader) – řádek je rozdělen na sloupce až při přístupu k němu a rozdělený se nedrží v paměti.
+    * Vypočtené hodnoty (SCORE WIKI, SCORE METRICS, CONFIDENCE) jsou uloženy zvlášť a dosazeny do sloupců při přístupu k řádku.
+    * Indexy řádků jsou od nuly jako u seznamu.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        # row:(cols, values) of computed columns
+        self.values = {}
+
+    def __len__(self):
+        return len(self.reader)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        return self._columns(row, self.reader[row].line)
+
+    def __iter__(self):
+        for row, line in enumerate(self.reader.lines()):
+            yield self._columns(row, line)
+
+    def _columns(self, row, line):
+        columns = line.split("\t")
+        values = self.values.get(row)
+        if values is not None:
+            for col, value in zip(*values):
+                columns[col] = value
+        return columns
+
+    def set_values(self, row, cols, values):
+        """Sets values of columns of a row (they replace the loaded values)."""
+
+        self.values[row] = (cols, values)
+
+    def write(self, file):
+        """Writes all lines to the file, lines without computed values are written as they were loaded."""
+
+        for row, line in enumerate(self.reader.lines()):
+            if row in self.values:
+                line = "\t".join(self._columns(row, line))
+            file.write(line + "\n")
+
+
 class KnowledgeBase:
     """
     * Pracuje s daty (sloupci) obsaženými na řádku v KB nebo v daném seznamu.
@@ -130,6 +276,12 @@ class KnowledgeBase:
         self.path_to_headkb = path_to_headkb
         self.headKB, self.ent_type_col = getDictHeadKB(self.path_to_headkb)
 
+        # column plans compiled from HEAD-KB (TYPE:ColumnPlan for types without subtypes, (TYPE, SUBTYPE):ColumnPlan)
+        self._type_plans = {}
+        self._plans = {}
+        for ent_type in self.headKB:
+            self.get_type_plan(ent_type)
+
         self._kb_loaded = False
         self.lines = []
 
@@ -411,34 +563,48 @@ class KnowledgeBase:
             self.load_kb()
 
     def load_kb(self):
-        # loading knowledge base
-        self.lines = []
-        with open(self.path_to_kb) as kb_file:
-            for line in kb_file:
-                self.lines.append(line.rstrip("\n").split("\t"))
+        # loading knowledge base (mapped into memory, lines are split on access, the row index is not stored)
+        self.lines = KbLines(KbReader(self.path_to_kb, save_index=False))
         self._kb_loaded = True
 
-    def get_ent_head(self, line):
-        ent_type = self.get_ent_type(line)
-        ent_subtype = self.get_ent_subtype(line)
+    def get_type_plan(self, ent_type, ent_subtype=""):
+        """Returns a ColumnPlan for given type and subtype (compiled on the first call)."""
 
-        if ent_subtype:
-            ent_subtypes = [""] + ent_subtype.split(KB_MULTIVALUE_DELIM)
-        else:
-            ent_subtypes = [""]
-
-        head = []
-        for subtype in ent_subtypes:
-            head.extend(
-                [
-                    item[0]
-                    for item in sorted(
-                        self.headKB[ent_type][subtype].items(), key=lambda i: i[-1]
-                    )
-                ]
-            )
+        key = (ent_type, ent_subtype)
+        plan = self._plans.get(key)
+        if plan is None:
+            if ent_subtype:
+                ent_subtypes = [""] + ent_subtype.split(KB_MULTIVALUE_DELIM)
+            else:
+                ent_subtypes = [""]
+
+            head = []
+            for subtype in ent_subtypes:
+                head.extend(
+                    [
+                        item[0]
+                        for item in sorted(
+                            self.headKB[ent_type][subtype].items(), key=lambda i: i[-1]
+                        )
+                    ]
+                )
+
+            plan = ColumnPlan(ent_type, ent_subtype, head)
+            self._plans[key] = plan
+            if "SUBTYPE" not in self.headKB[ent_type][""]:
+                self._type_plans[ent_type] = plan
+        return plan
+
+    def get_plan(self, line):
+        """Returns a ColumnPlan of an entity at the line of the knowledge base."""
 
-        return head
+        plan = self._type_plans.get(self.get_ent_type(line))
+        if plan is None:
+            plan = self.get_type_plan(self.get_ent_type(line), self.get_ent_subtype(line))
+        return plan
+
+    def get_ent_head(self, line):
+        return list(self.get_plan(line).head)
 
     def get_ent_type(self, line):
         """Returns a type of an entity at the line of the knowledge base."""
@@ -477,25 +643,8 @@ class KnowledgeBase:
     def get_col_for(self, line, col_name):
         """Line numbering from one."""
 
-        # getting the entity type
-        ent_type = self.get_ent_type(line)
-        ent_subtype = self.get_ent_subtype(line)
-
-        if ent_subtype:
-            ent_subtypes = [""] + ent_subtype.split(KB_MULTIVALUE_DELIM)
-        else:
-            ent_subtypes = [""]
-
-        col = 0
-        colCnt = 0
-        for subtype in ent_subtypes:
-            if col_name in self.headKB[ent_type][subtype]:
-                col = self.headKB[ent_type][subtype][col_name]
-                col += colCnt
-                break
-            else:
-                colCnt += len(self.headKB[ent_type][subtype])
-        else:
+        col = self.get_plan(line).index.get(col_name)
+        if col is None:
             raise RuntimeError("Bad column name '%s' for line '%s'." % (col_name, line))
 
         return col
@@ -514,25 +663,7 @@ class KnowledgeBase:
             self.check_or_load_kb()
             columns = self.lines[line - 1]
 
-        metrics_cols = [
-            self.get_col_for(columns, colname)
-            for colname in (
-                "WIKI BACKLINKS",
-                "WIKI HITS",
-                "WIKI PRIMARY SENSE",
-                "SCORE WIKI",
-                "SCORE METRICS",
-                "CONFIDENCE",
-            )
-        ]
-
-        result = 0
-        # KB lines are indexed from one
-        for col in range(len(columns)):
-            if col not in metrics_cols and columns[col]:
-                result += 1
-
-        return result
+        return self.get_plan(columns).nonempty_columns(columns)
 
     def description_length(self, line):
         """Returns a length of a description of a specified line."""
@@ -578,92 +709,168 @@ class KnowledgeBase:
         else:
             return self.get_data_for(line, column_rename[column_name])
 
-    def insert_metrics(self):
-        """Computing SCORE WIKI, SCORE METRICS and CONFIDENCE and adding them to the KB."""
+    def collect_metric_columns(self):
+        """
+        Returns a dictionary TYPE:{COLUMN:numpy.ndarray} with raw metric values of all lines of each entity type.
+
+        Column "rows" contains indexes of lines in self.lines, column "has_wiki" marks lines with wiki statistics
+        (other lines have zeroes in wiki_* columns) and column "score_cols" contains indexes of score columns of lines.
+        """
 
         self.check_or_load_kb()
 
-        # computing statistics
-        for line_num in range(1, len(self.lines) + 1):
-            ent_type = self.get_ent_type(line_num)
+        collected = {}
+        for row, columns in enumerate(self.lines):
+            ent_type = self.get_ent_type(columns)
             if (
                 ent_type == "nationality"
             ):  # FIXME: Z čeho se má pak počítat CONFIDENCE, co?
                 continue
 
-            self.metrics[ent_type]["columns_number"].append(
-                self.nonempty_columns(line_num)
+            if ent_type not in collected:
+                if ent_type not in self.metrics:
+                    raise KeyError(ent_type)
+                collected[ent_type] = {
+                    "rows": [],
+                    "has_wiki": [],
+                    "description_length": [],
+                    "columns_number": [],
+                    "wiki_backlinks": [],
+                    "wiki_hits": [],
+                    "wiki_ps": [],
+                    "score_cols": [],
+                }
+            ent_columns = collected[ent_type]
+
+            plan = self.get_plan(columns)
+            col_backlinks, col_hits, col_ps = plan.stats_cols or plan.cols(
+                *KB_STATS_COLUMNS
             )
-            self.metrics[ent_type]["description_length"].append(
-                self.description_length(line_num)
+
+            ent_columns["rows"].append(row)
+            ent_columns["score_cols"].append(
+                plan.score_cols or plan.cols(*KB_SCORE_COLUMNS)
             )
-            if self.get_wiki_value(line_num, "backlinks"):
-                self.metrics[ent_type]["wiki_backlinks"].append(
-                    int(self.get_wiki_value(line_num, "backlinks"))
-                )
-                self.metrics[ent_type]["wiki_hits"].append(
-                    int(self.get_wiki_value(line_num, "hits"))
-                )
-                self.metrics[ent_type]["wiki_ps"].append(
-                    int(self.get_wiki_value(line_num, "ps"))
+            ent_columns["columns_number"].append(plan.nonempty_columns(columns))
+            ent_columns["description_length"].append(
+                len(columns[plan.col("DESCRIPTION")])
+            )
+            wiki_backlinks = columns[col_backlinks]
+            if wiki_backlinks:
+                ent_columns["has_wiki"].append(True)
+                ent_columns["wiki_backlinks"].append(int(wiki_backlinks))
+                ent_columns["wiki_hits"].append(int(columns[col_hits]))
+                ent_columns["wiki_ps"].append(int(columns[col_ps]))
+            else:
+                ent_columns["has_wiki"].append(False)
+                ent_columns["wiki_backlinks"].append(0)
+                ent_columns["wiki_hits"].append(0)
+                ent_columns["wiki_ps"].append(0)
+
+        for ent_type, ent_columns in collected.items():
+            for col_name, values in ent_columns.items():
+                ent_columns[col_name] = numpy.array(
+                    values, dtype=bool if col_name == "has_wiki" else numpy.int64
                 )
 
-        # sorting statistics
-        for i in self.metrics:
-            for j in self.metrics[i]:
-                self.metrics[i][j].sort()
-
-        # indexing statistics
-        for i in self.metrics:
-            for j in self.metrics[i]:
-                for k in range(0, len(self.metrics[i][j])):
-                    if self.metrics[i][j][k] not in self.metric_index[i][j]:
-                        max_value = float(self.metrics[i][j][-1])
-                        if j in ["wiki_backlinks", "wiki_hits"]:
-                            max_value = 0.25 * max_value
-                        if max_value:
-                            normalized_value = float(self.metrics[i][j][k]) / max_value
-                            self.metric_index[i][j][self.metrics[i][j][k]] = min(
-                                normalized_value, 1.0
-                            )
-                        else:
-                            self.metric_index[i][j][self.metrics[i][j][k]] = 1.0
-
-        # computing SCORE WIKI, SCORE METRICS and CONFIDENCE
-        for line_num in range(1, len(self.lines) + 1):
-
-            columns = self.lines[line_num - 1]
-
-            # getting the entity type
-            ent_type = self.get_ent_type(columns)
-            if (
-                ent_type == "nationality"
-            ):  # FIXME: Opravdu chceme, aby typ "nationality" byl bez merik a CONFIDENCE? Pokud ano, je třeba to nějak zohlednit v NERu a SECu.
+        return collected
+
+    @staticmethod
+    def normalize_metric(values, metric, max_value):
+        """Returns values of the metric divided by (a quarter of, for wiki_backlinks and wiki_hits) its maximum and clipped to 1.0."""
+
+        max_value = float(max_value)
+        if metric in ["wiki_backlinks", "wiki_hits"]:
+            max_value = 0.25 * max_value
+        if max_value:
+            return numpy.minimum(values.astype(numpy.float64) / max_value, 1.0)
+        else:
+            return numpy.ones(len(values))
+
+    def insert_metrics(self):
+        """Computing SCORE WIKI, SCORE METRICS and CONFIDENCE and adding them to the KB."""
+
+        collected = self.collect_metric_columns()
+
+        # sorting and indexing statistics
+        for ent_type, ent_columns in collected.items():
+            has_wiki = ent_columns["has_wiki"]
+            for metric in self.metrics[ent_type]:
+                values = ent_columns[metric]
+                if metric.startswith("wiki"):
+                    values = values[has_wiki]
+                self.metrics[ent_type][metric] = numpy.sort(values)
+                if len(values):
+                    unique_values = numpy.unique(values)
+                    self.metric_index[ent_type][metric] = dict(
+                        zip(
+                            unique_values.tolist(),
+                            self.normalize_metric(
+                                unique_values, metric, unique_values[-1]
+                            ).tolist(),
+                        )
+                    )
+
+        # computing SCORE WIKI, SCORE METRICS and CONFIDENCE for all lines of each entity type at once
+        for ent_type, ent_columns in collected.items():
+            rows = ent_columns["rows"]
+            if not len(rows):
                 continue
+            has_wiki = ent_columns["has_wiki"]
+            normalized = {}
+            for metric in self.metrics[ent_type]:
+                if len(self.metrics[ent_type][metric]):
+                    normalized[metric] = self.normalize_metric(
+                        ent_columns[metric], metric, self.metrics[ent_type][metric][-1]
+                    )
+                else:
+                    normalized[metric] = numpy.zeros(len(rows))
+
             # computing SCORE WIKI
-            score_wiki = 0
-            if self.get_wiki_value(columns, "backlinks"):
-                wiki_backlinks = self.metric_percentile(columns, "wiki_backlinks")
-                wiki_hits = self.metric_percentile(columns, "wiki_hits")
-                wiki_ps = self.metric_percentile(columns, "wiki_ps")
-                score_wiki = 100 * numpy.average(
-                    [wiki_backlinks, wiki_hits, wiki_ps], weights=[5, 5, 1]
+            score_wiki = numpy.zeros(len(rows))
+            if has_wiki.any():
+                score_wiki[has_wiki] = 100 * numpy.average(
+                    numpy.vstack(
+                        [
+                            normalized["wiki_backlinks"][has_wiki],
+                            normalized["wiki_hits"][has_wiki],
+                            normalized["wiki_ps"][has_wiki],
+                        ]
+                    ),
+                    axis=0,
+                    weights=[5, 5, 1],
                 )
-            columns[self.get_col_for(columns, "SCORE WIKI")] = "%.2f" % score_wiki
 
             # computing SCORE METRICS
-            description_length = self.metric_percentile(columns, "description_length")
-            columns_number = self.metric_percentile(columns, "columns_number")
-            score_metrics = 100 * numpy.average([description_length, columns_number])
-            columns[self.get_col_for(columns, "SCORE METRICS")] = "%.2f" % score_metrics
+            score_metrics = 100 * numpy.average(
+                numpy.vstack(
+                    [normalized["description_length"], normalized["columns_number"]]
+                ),
+                axis=0,
+            )
 
             # computing CONFIDENCE
-            columns[self.get_col_for(columns, "CONFIDENCE")] = "%.2f" % numpy.average(
-                [score_wiki, score_metrics], weights=[5, 1]
+            confidence = numpy.average(
+                numpy.vstack([score_wiki, score_metrics]), axis=0, weights=[5, 1]
             )
 
+            for row, cols, wiki, metrics, conf in zip(
+                rows.tolist(),
+                ent_columns["score_cols"].tolist(),
+                numpy.char.mod("%.2f", score_wiki).tolist(),
+                numpy.char.mod("%.2f", score_metrics).tolist(),
+                numpy.char.mod("%.2f", confidence).tolist(),
+            ):
+                self.lines.set_values(row, cols, (wiki, metrics, conf))
+
+    def write(self, file):
+        """Writes the KB (with computed metrics) to the file line by line."""
+
+        if self._kb_loaded:
+            self.lines.write(file)
+
     def _str1(self):
-        return "\n".join(["\t".join(line) for line in self.lines + [""]])
+        return "".join(["\t".join(line) + "\n" for line in self.lines])
 
     def _str2(self):
         result = ""
@@ -19,6 +19,7 @@ limitations under the License.
 
 import metrics_knowledge_base
 import argparse
+import sys
 
 parser = argparse.ArgumentParser()
 parser.add_argument(
@@ -37,4 +38,4 @@ kb = metrics_knowledge_base.KnowledgeBase(
     path_to_headkb=arguments.head_kb, path_to_kb=arguments.knowledge_base
 )
 kb.insert_metrics()
-print(kb)
+kb.write(sys.stdout)
@@ -38,16 +38,9 @@ kb_struct = metrics_knowledge_base.KnowledgeBase(path_to_headkb=arguments.head_k
 for line in sys.stdin:
     columns = line.rstrip("\n").split("\t")
 
-    ent_head = kb_struct.get_ent_head(columns)
-    stats_and_matrics = (
-        "\t".join(ent_head).find(
-            "WIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE"
-        )
-        >= 0
-    )
-    if stats_and_matrics and len(columns) + 6 == len(ent_head):
-        index = kb_struct.get_col_for(columns, "WIKI BACKLINKS")
-        columns.insert(index, "\t" * 5)
+    plan = kb_struct.get_plan(columns)
+    if plan.has_metrics and len(columns) + 6 == plan.width:
+        columns.insert(plan.metrics_cols[0], "\t" * 5)
         sys.stdout.write("\t".join(columns) + "\n")
     else:
         sys.stdout.write(line)
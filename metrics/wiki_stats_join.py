@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright 2015 Brno University of Technology
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+# Description: Joins wiki statistics (wiki_stats) to the knowledge base by Wikipedia page title.
+#
+# wiki_stats is a TSV file with lines "TITLE\tBACKLINKS\tHITS\tPRIMARY SENSE" where TITLE is in URL form
+# (e.g. "Karel_Čapek"). Two strategies of the join are available:
+# * IndexedWikiStats - hashed index (sorted 64-bit hashes of titles with line offsets) stored next to the stats file
+#   and memory-mapped together with the stats file; lines are read and split only when they are looked up,
+# * merge_join - sort-merge join of the KB and the stats file, both sorted by title in byte (LC_ALL=C) order.
+
+import array
+import hashlib
+import mmap
+import os
+import numpy
+
+INDEX_SUFFIX = ".idx.npy"
+INDEX_DTYPE = numpy.dtype([("hash", "<u8"), ("offset", "<u8")])
+
+
+def get_wiki_url_prefix(path_to_version="VERSION"):
+    """Returns a prefix of Wikipedia links for the language of the KB given by VERSION file (e.g. "cs_20220801-1662000000")."""
+
+    with open(path_to_version) as version_file:
+        version = version_file.read().strip()
+    lang = version.split("_")[0]
+    if not lang:
+        raise ValueError("get_wiki_url_prefix: no language in VERSION %r" % version)
+    return "https://%s.wikipedia.org/wiki/" % lang
+
+
+def title_hash(title):
+    """Returns a 64-bit hash of a title (bytes)."""
+
+    return int.from_bytes(hashlib.blake2b(title, digest_size=8).digest(), "little")
+
+
+def split_stats_line(line):
+    """Returns a title (bytes) and the statistics (list of strings) of a line of wiki_stats (bytes)."""
+
+    items = line.rstrip(b"\n").decode("utf-8").split("\t")
+    return items[0].encode("utf-8"), items[1:]
+
+
+class IndexedWikiStats:
+    """
+    * Memory-mapped wiki_stats with a hashed index of titles.
+    * Index is built on the first use (or when the stats file is newer) and stored to PATH_TO_STATS + INDEX_SUFFIX.
+    * Lookup of a title costs a binary search in the index and split of one line of the stats file.
+    """
+
+    def __init__(self, path_to_stats, path_to_index=None):
+        self.path_to_stats = path_to_stats
+        self.path_to_index = (
+            path_to_index if path_to_index else path_to_stats + INDEX_SUFFIX
+        )
+
+        if not self.index_is_valid():
+            self.build_index()
+
+        self._stats_file = open(self.path_to_stats, "rb")
+        if os.path.getsize(self.path_to_stats):
+            self._stats = mmap.mmap(
+                self._stats_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        else:
+            self._stats = b""
+        self._index = numpy.load(self.path_to_index, mmap_mode="r")
+        self._hashes = self._index["hash"]
+        self._offsets = self._index["offset"]
+
+    def __repr__(self):
+        return "IndexedWikiStats(path_to_stats=%r, path_to_index=%r)" % (
+            self.path_to_stats,
+            self.path_to_index,
+        )
+
+    def __len__(self):
+        return len(self._index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self._stats, mmap.mmap):
+            self._stats.close()
+        self._stats_file.close()
+
+    def index_is_valid(self):
+        return os.path.exists(self.path_to_index) and os.path.getmtime(
+            self.path_to_index
+        ) >= os.path.getmtime(self.path_to_stats)
+
+    def build_index(self):
+        """Builds the index in one pass over the stats file (hashes and offsets are kept in compact arrays, not as Python objects)."""
+
+        hashes = array.array("Q")
+        offsets = array.array("Q")
+        offset = 0
+        with open(self.path_to_stats, "rb") as stats_file:
+            for line in stats_file:
+                if line.strip():
+                    hashes.append(title_hash(line.split(b"\t", 1)[0].rstrip(b"\n")))
+                    offsets.append(offset)
+                offset += len(line)
+
+        index = numpy.empty(len(hashes), dtype=INDEX_DTYPE)
+        index["hash"] = numpy.frombuffer(hashes, dtype=numpy.uint64)
+        index["offset"] = numpy.frombuffer(offsets, dtype=numpy.uint64)
+        index = index[numpy.argsort(index["hash"], kind="stable")]
+
+        tmp_path = self.path_to_index + ".tmp"
+        with open(tmp_path, "wb") as index_file:
+            numpy.save(index_file, index)
+        os.replace(tmp_path, self.path_to_index)
+
+    def get(self, title):
+        """Returns statistics (list of strings) of a title (string in URL form) or None."""
+
+        title = title.encode("utf-8")
+        hash_value = numpy.uint64(title_hash(title))
+        position = int(numpy.searchsorted(self._hashes, hash_value))
+        while position < len(self._hashes) and self._hashes[position] == hash_value:
+            offset = int(self._offsets[position])
+            end = self._stats.find(b"\n", offset)
+            stats_title, stats = split_stats_line(
+                self._stats[offset:] if end < 0 else self._stats[offset:end]
+            )
+            if stats_title == title:
+                return stats
+            position += 1
+        return None
+
+
+def merge_join(kb_items, path_to_stats):
+    """
+    Generator of sort-merge join of the KB and wiki_stats yielding (item, statistics or None) for each KB item.
+
+    kb_items is an iterable of (title, item) sorted by title (in URL form) in byte order, items with empty title are
+    passed through; the stats file has to be sorted the same way. ValueError is raised for unsorted input.
+    """
+
+    with open(path_to_stats, "rb") as stats_file:
+        stats_title, stats = None, None
+        last_stats_title = b""
+        last_title = b""
+
+        def next_stats():
+            nonlocal last_stats_title
+            for line in stats_file:
+                if line.strip():
+                    stats_title, stats = split_stats_line(line)
+                    if stats_title < last_stats_title:
+                        raise ValueError(
+                            "merge_join: wiki stats are not sorted (%r after %r)"
+                            % (stats_title, last_stats_title)
+                        )
+                    last_stats_title = stats_title
+                    return stats_title, stats
+            return None, None
+
+        stats_title, stats = next_stats()
+        for title, item in kb_items:
+            if not title:
+                yield item, None
+                continue
+
+            title = title.encode("utf-8")
+            if title < last_title:
+                raise ValueError(
+                    "merge_join: KB is not sorted by title (%r after %r)"
+                    % (title, last_title)
+                )
+            last_title = title
+
+            while stats_title is not None and stats_title < title:
+                stats_title, stats = next_stats()
+
+            if stats_title == title:
+                yield item, stats
+            else:
+                yield item, None
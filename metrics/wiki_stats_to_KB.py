@@ -18,28 +18,73 @@ limitations under the License.
 """
 
 import sys
+import argparse
 import metrics_knowledge_base
+import wiki_stats_join
 
-with open("wiki_stats") as wiki_stats:
-    stats = dict()
-    for line in wiki_stats:
-        items = line.rstrip("\n").split("\t")
-        url = "https://cs.wikipedia.org/wiki/" + items[0]
-        stats[url] = items[1:]
+parser = argparse.ArgumentParser(
+    description="Add wiki statistics to the knowledge base reading from standard input."
+)
+parser.add_argument(
+    "-H",
+    "--head-kb",
+    help="Header for the knowledge base, which specify its types and their atributes (default: %(default)s).",
+    default=metrics_knowledge_base.PATH_HEAD_KB,
+)
+parser.add_argument(
+    "-s",
+    "--wiki-stats",
+    help="File with wiki statistics (default: %(default)s).",
+    default="wiki_stats",
+)
+parser.add_argument(
+    "-V",
+    "--version-file",
+    help="VERSION file of the knowledge base, which determines language of Wikipedia links (default: %(default)s).",
+    default="VERSION",
+)
+parser.add_argument(
+    "--strategy",
+    choices=["index", "merge"],
+    default="index",
+    help="Join by a memory-mapped hashed index of wiki statistics or by a sort-merge join, when both the knowledge base (by WIKIPEDIA LINK) and wiki statistics are sorted by title (default: %(default)s).",
+)
+
+arguments = parser.parse_args()
+
+url_prefix = wiki_stats_join.get_wiki_url_prefix(arguments.version_file)
 
 found = 0
 not_found = 0
 
-kb_struct = metrics_knowledge_base.KnowledgeBase()
+kb_struct = metrics_knowledge_base.KnowledgeBase(path_to_headkb=arguments.head_kb)
+
+
+def kb_items():
+    for line in sys.stdin:
+        columns = line.rstrip("\n").split("\t")
+        plan = kb_struct.get_plan(columns)
+        link = columns[plan.col("WIKIPEDIA LINK")]
+        title = link[len(url_prefix) :] if link.startswith(url_prefix) else ""
+        yield title, (line, columns, plan, link)
+
 
-for line in sys.stdin:
-    columns = line.rstrip("\n").split("\t")
+if arguments.strategy == "merge":
+    joined = wiki_stats_join.merge_join(kb_items(), arguments.wiki_stats)
+else:
+    wiki_stats = wiki_stats_join.IndexedWikiStats(arguments.wiki_stats)
+    joined = (
+        (item, wiki_stats.get(title) if title else None) for title, item in kb_items()
+    )
 
-    link = kb_struct.get_data_for(columns, "WIKIPEDIA LINK")
-    if link and link in stats:
-        columns[kb_struct.get_col_for(columns, "WIKI BACKLINKS")] = stats[link][0]
-        columns[kb_struct.get_col_for(columns, "WIKI HITS")] = stats[link][1]
-        columns[kb_struct.get_col_for(columns, "WIKI PRIMARY SENSE")] = stats[link][2]
+for (line, columns, plan, link), stats in joined:
+    if stats:
+        col_backlinks, col_hits, col_ps = plan.stats_cols or plan.cols(
+            *metrics_knowledge_base.KB_STATS_COLUMNS
+        )
+        columns[col_backlinks] = stats[0]
+        columns[col_hits] = stats[1]
+        columns[col_ps] = stats[2]
         sys.stdout.write("\t".join(columns) + "\n")
         found += 1
     else:
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file page_index.py
+# @brief contains PageIndex class - persistent index of pages of a pages dump (random access into the dump)
+#
+# a record of the index is (page_id, title, ns, offset, length, sha1) of a page, pages are found by their positions
+# (numbers of pages in the order of the dump), titles or page ids (binary search in sorted arrays)
+#
+# the index is built by one scan of raw pages of the dump (only the elements of the index are read from raw bytes,
+# pages are not parsed) and stored next to the dump (or into the current directory if the directory of the dump
+# is not writable), it is reused while the dump is not changed
+#
+# @section file_format index file
+# the file is mapped into memory, arrays are used without copying (native byte order, 64-bit items):
+# - MAGIC, size of the dump, modification time of the dump (ns), number of pages N
+# - offsets, lengths, page ids and namespaces of pages (N items each, in the order of the dump)
+# - sha1 of pages (N x SHA1_SIZE bytes, padded by zero bytes)
+# - offsets of titles in the blob of titles (N + 1 items)
+# - positions of pages sorted by titles, positions of pages sorted by page ids (N items each)
+# - blob of titles (utf-8)
+#
+# usage: python3 page_index.py DUMP [--rebuild] [--title TITLE ...] [--page-id ID ...]
+
+import argparse
+import mmap
+import os
+import re
+import struct
+import xml.etree.cElementTree as CElTree
+from array import array
+from collections import namedtuple
+from xml.sax.saxutils import unescape
+
+import dump_reader
+
+MAGIC = b"KBPGIX02"
+INDEX_SUFFIX = ".pageindex"
+SHA1_SIZE = 32
+
+_HEADER = struct.Struct("QQQ")
+
+_TITLE_RE = re.compile(rb"<title>(.*?)</title>", re.S)
+_NS_RE = re.compile(rb"<ns>(-?\d+)</ns>")
+_ID_RE = re.compile(rb"<id>(\d+)</id>")
+_SHA1_RE = re.compile(rb"<sha1>([0-9a-z]*)</sha1>")
+
+_ENTITIES = {"&quot;": "\"", "&#039;": "'", "&apos;": "'"}
+
+##
+# @brief record of the index
+PageRecord = namedtuple("PageRecord", ["page_id", "title", "ns", "offset", "length", "sha1"])
+
+##
+# @brief returns a signature of the dump (size, modification time) that invalidates its index
+def dump_signature(dump_fpath):
+	stat = os.stat(dump_fpath)
+	return stat.st_size, stat.st_mtime_ns
+
+##
+# @brief reads the elements of the index from a raw page
+# @return tuple (page id, title, ns, sha1)
+def parse_raw_page(raw_page):
+	# <title>, <ns> and <id> of the page precede <revision>, <sha1> of the revision follows its text
+	head = raw_page[:raw_page.find(b"<revision")] if b"<revision" in raw_page else raw_page
+	title = _TITLE_RE.search(head)
+	ns = _NS_RE.search(head)
+	page_id = _ID_RE.search(head)
+	sha1_start = raw_page.rfind(b"<sha1>")
+	sha1 = _SHA1_RE.match(raw_page, sha1_start) if sha1_start >= 0 else None
+	return (
+		int(page_id.group(1)) if page_id else 0,
+		unescape(title.group(1).decode("utf-8"), _ENTITIES) if title else "",
+		int(ns.group(1)) if ns else 0,
+		sha1.group(1) if sha1 else b""
+	)
+
+##
+# @class PageIndex
+# @brief index of pages of a dump (arrays in memory or mapped from the index file)
+class PageIndex:
+	def __init__(self, offsets, lengths, page_ids, namespaces, sha1s, title_offsets, by_title, by_id, titles, mapping=None):
+		self.offsets = offsets
+		self.lengths = lengths
+		self.page_ids = page_ids
+		self.namespaces = namespaces
+		self.sha1s = sha1s
+		self.title_offsets = title_offsets
+		self.by_title = by_title
+		self.by_id = by_id
+		self.titles = titles
+		self._mapping = mapping
+
+	def __len__(self):
+		return len(self.offsets)
+
+	##
+	# @brief builds the index by a scan of the dump
+	@staticmethod
+	def build(dump_fpath):
+		offsets = array("Q")
+		lengths = array("Q")
+		page_ids = array("Q")
+		namespaces = array("q")
+		sha1s = bytearray()
+		titles = []
+		for offset, raw_page in dump_reader.iter_raw_pages(dump_fpath):
+			page_id, title, ns, sha1 = parse_raw_page(raw_page)
+			offsets.append(offset)
+			lengths.append(len(raw_page))
+			page_ids.append(page_id)
+			namespaces.append(ns)
+			sha1s += sha1[:SHA1_SIZE].ljust(SHA1_SIZE, b"\0")
+			titles.append(title.encode("utf-8"))
+
+		title_offsets = array("Q", [0])
+		for title in titles:
+			title_offsets.append(title_offsets[-1] + len(title))
+		by_title = array("Q", sorted(range(len(titles)), key=titles.__getitem__))
+		by_id = array("Q", sorted(range(len(page_ids)), key=page_ids.__getitem__))
+		return PageIndex(offsets, lengths, page_ids, namespaces, bytes(sha1s), title_offsets, by_title, by_id, b"".join(titles))
+
+	##
+	# @brief writes the index
+	def save(self, fpath, dump_fpath):
+		size, mtime_ns = dump_signature(dump_fpath)
+		tmp_fpath = fpath + ".tmp"
+		with open(tmp_fpath, "wb") as file:
+			file.write(MAGIC)
+			file.write(_HEADER.pack(size, mtime_ns, len(self)))
+			for item in [self.offsets, self.lengths, self.page_ids, self.namespaces, self.sha1s, self.title_offsets, self.by_title, self.by_id, self.titles]:
+				file.write(item)
+		os.replace(tmp_fpath, fpath)
+
+	##
+	# @brief maps the index file into memory
+	# @param dump_fpath - path to the dump of the index (None = the index is not checked against its dump)
+	# @return PageIndex or None if the index does not exist or it does not match the dump
+	@staticmethod
+	def load(fpath, dump_fpath):
+		try:
+			with open(fpath, "rb") as file:
+				mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+		except (OSError, ValueError):
+			return None
+
+		header_size = len(MAGIC) + _HEADER.size
+		if len(mapping) < header_size or mapping[:len(MAGIC)] != MAGIC:
+			mapping.close()
+			return None
+		size, mtime_ns, count = _HEADER.unpack(mapping[len(MAGIC):header_size])
+		if dump_fpath is not None and (size, mtime_ns) != dump_signature(dump_fpath):
+			mapping.close()
+			return None
+
+		view = memoryview(mapping)
+		sections = []
+		position = header_size
+		for section_size, item_format in [(count * 8, "Q"), (count * 8, "Q"), (count * 8, "Q"), (count * 8, "q"), (count * SHA1_SIZE, None), ((count + 1) * 8, "Q"), (count * 8, "Q"), (count * 8, "Q")]:
+			section = view[position:position + section_size]
+			sections.append(section.cast(item_format) if item_format else section)
+			position += section_size
+		sections.append(view[position:])
+		return PageIndex(*sections, mapping=mapping)
+
+	##
+	# @brief releases the mapped index file
+	def close(self):
+		if self._mapping is not None:
+			for name in ["offsets", "lengths", "page_ids", "namespaces", "sha1s", "title_offsets", "by_title", "by_id", "titles"]:
+				getattr(self, name).release()
+			self._mapping.close()
+			self._mapping = None
+
+	def title(self, position):
+		return bytes(self.titles[self.title_offsets[position]:self.title_offsets[position + 1]]).decode("utf-8")
+
+	def record(self, position):
+		return PageRecord(
+			self.page_ids[position],
+			self.title(position),
+			self.namespaces[position],
+			self.offsets[position],
+			self.lengths[position],
+			bytes(self.sha1s[position * SHA1_SIZE:(position + 1) * SHA1_SIZE]).rstrip(b"\0").decode("ascii")
+		)
+
+	##
+	# @brief returns the position of a page with the title (None if there is no such page)
+	def find_title(self, title):
+		key = title.encode("utf-8")
+		low, high = 0, len(self.by_title)
+		while low < high:
+			middle = (low + high) // 2
+			position = self.by_title[middle]
+			if bytes(self.titles[self.title_offsets[position]:self.title_offsets[position + 1]]) < key:
+				low = middle + 1
+			else:
+				high = middle
+		if low < len(self.by_title) and self.title(self.by_title[low]) == title:
+			return self.by_title[low]
+		return None
+
+	##
+	# @brief returns the position of a page with the page id (None if there is no such page)
+	def find_page_id(self, page_id):
+		low, high = 0, len(self.by_id)
+		while low < high:
+			middle = (low + high) // 2
+			if self.page_ids[self.by_id[middle]] < page_id:
+				low = middle + 1
+			else:
+				high = middle
+		if low < len(self.by_id) and self.page_ids[self.by_id[low]] == page_id:
+			return self.by_id[low]
+		return None
+
+	##
+	# @brief generator of parsed pages at positions of the index
+	# @param dump_fpath - path to the pages dump
+	# @param positions - iterable of positions (numbers of pages in the dump)
+	# @return (byte offset of the page, <page> element) tuples
+	def iter_pages(self, dump_fpath, positions):
+		with open(dump_fpath, "rb") as file:
+			for position in positions:
+				offset = self.offsets[position]
+				file.seek(offset)
+				yield offset, CElTree.fromstring(file.read(self.lengths[position]))
+
+##
+# @brief returns possible paths to the index of a dump (next to the dump, in the current directory)
+def index_fpaths(dump_fpath):
+	return [dump_fpath + INDEX_SUFFIX, os.path.basename(dump_fpath) + INDEX_SUFFIX]
+
+##
+# @brief loads the index of a dump or builds (and stores) it
+# @param rebuild - build the index even if a valid one exists
+# @return tuple (PageIndex, True if the index was built)
+def get_page_index(dump_fpath, rebuild=False):
+	if not rebuild:
+		for fpath in index_fpaths(dump_fpath):
+			index = PageIndex.load(fpath, dump_fpath)
+			if index is not None:
+				return index, False
+
+	index = PageIndex.build(dump_fpath)
+	for fpath in index_fpaths(dump_fpath):
+		try:
+			index.save(fpath, dump_fpath)
+			break
+		except OSError:
+			continue
+	return index, True
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Builds the page index of a pages dump and looks up pages in it.")
+	parser.add_argument("dump", help="Path to the pages dump.")
+	parser.add_argument("--rebuild", action="store_true", help="Build the index even if a valid one exists.")
+	parser.add_argument("--title", nargs="+", default=[], help="Print records of pages with the titles.")
+	parser.add_argument("--page-id", nargs="+", type=int, default=[], help="Print records of pages with the page ids.")
+	args = parser.parse_args()
+
+	index, built = get_page_index(args.dump, args.rebuild)
+	print(f"{'built' if built else 'loaded'} page index of {len(index)} pages")
+	for key, position in [(title, index.find_title(title)) for title in args.title] + [(page_id, index.find_page_id(page_id)) for page_id in args.page_id]:
+		print(f"{key}\t{index.record(position) if position is not None else 'not found'}")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file page_pool.py
+# @brief contains PagePool class - process pool for page processing with a per-page time budget
+#
+# @section time_budget time budget
+# - soft limit: worker arms a timer (SIGALRM) before processing a page, PageTimeout is raised inside the page processing
+#   when the page exceeds its budget (interrupts also long backtracking of regular expressions)
+# - hard limit (watchdog): main process waits for each page at most budget + WATCHDOG_GRACE seconds,
+#   a page which is still not finished (e.g. stuck in C code that ignores signals) is abandoned,
+#   the pool is terminated (stuck worker is recycled) and unfinished pages are resubmitted to a new pool
+#
+# pages are submitted one by one in order, so a page is started no later than its predecessor is finished
+# - the watchdog measures the time of a page from the moment the result of the previous page was collected
+#
+# @section recycling worker recycling
+# the pool is persistent (workers are reused by following calls of map) until it is closed, workers are replaced
+# - after maxtasksperchild pages of a worker (replacement is forked by the pool as soon as the worker exits)
+# - all at once by recycle() (e.g. when RSS of a worker passed a threshold), new workers are started before the old ones exit
+#
+# workers are forked from the main process, so state prepared in the main process before (compiled patterns, loaded tables)
+# is inherited by every replacement worker and a recycled worker starts warm
+#
+# @section broadcast broadcast
+# broadcast() runs a function once in every worker of the pool (e.g. to collect state aggregated in workers),
+# every task waits at a barrier of the pool until all workers took one, so no worker takes two of them
+
+import signal
+from contextlib import contextmanager
+from multiprocessing import Barrier, Pool
+from threading import BrokenBarrierError
+from time import monotonic
+
+##
+# @brief seconds given to a page over its budget before the watchdog recycles the worker
+WATCHDOG_GRACE = 30
+
+##
+# @brief seconds a task of broadcast() waits for the other workers
+BROADCAST_TIMEOUT = 60
+
+# barrier of broadcast() in a worker
+_broadcast_barrier = None
+
+##
+# @class PageTimeout
+# @brief raised inside a worker when a page exceeds its time budget
+class PageTimeout(Exception):
+	pass
+
+def _raise_page_timeout(signum, frame):
+	raise PageTimeout()
+
+##
+# @brief limits the time of the enclosed block (main thread of a process only)
+# @param seconds - time budget (None or 0 means no limit)
+#
+# PageTimeout may be raised even when leaving the block, so it has to be caught outside the with statement
+@contextmanager
+def time_budget(seconds):
+	if not seconds:
+		yield
+		return
+
+	previous_handler = signal.signal(signal.SIGALRM, _raise_page_timeout)
+	signal.setitimer(signal.ITIMER_REAL, seconds)
+	try:
+		yield
+	finally:
+		signal.setitimer(signal.ITIMER_REAL, 0)
+		signal.signal(signal.SIGALRM, previous_handler)
+
+def _init_pool_worker(barrier, initializer, initargs):
+	global _broadcast_barrier
+	_broadcast_barrier = barrier
+	if initializer is not None:
+		initializer(*initargs)
+
+def _run_broadcast(func):
+	try:
+		_broadcast_barrier.wait(BROADCAST_TIMEOUT)
+	except BrokenBarrierError:
+		pass
+	return func()
+
+##
+# @class PagePool
+# @brief runs a function over pages in a process pool, a page exceeding the hard limit does not stall the others
+class PagePool:
+	##
+	# @brief initializes the pool parameters
+	# @param processes - number of worker processes
+	# @param initializer - initializer of worker processes
+	# @param initargs - arguments of the initializer
+	# @param page_timeout - time budget of a page in seconds (None or 0 means no limit)
+	# @param maxtasksperchild - number of pages processed by a worker before it is replaced (None means no limit)
+	def __init__(self, processes, initializer=None, initargs=(), page_timeout=None, maxtasksperchild=None):
+		self.processes = processes
+		self.initializer = initializer
+		self.initargs = initargs
+		self.hard_timeout = page_timeout + WATCHDOG_GRACE if page_timeout else None
+		self.maxtasksperchild = maxtasksperchild
+		self.pool = None
+		self.barrier = None
+		# number of workers terminated by the watchdog
+		self.recycled = 0
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def _new_pool(self):
+		self.barrier = Barrier(self.processes)
+		return Pool(self.processes, initializer=_init_pool_worker, initargs=(self.barrier, self.initializer, self.initargs), maxtasksperchild=self.maxtasksperchild)
+
+	##
+	# @brief replaces all workers, new workers are started before the old ones finish (between calls of map)
+	# @param processes - new number of worker processes (None = keep the number)
+	def recycle(self, processes=None):
+		if processes is not None:
+			self.processes = processes
+		old_pool = self.pool
+		self.pool = self._new_pool()
+		if old_pool is not None:
+			old_pool.close()
+			old_pool.join()
+
+	##
+	# @brief changes the number of worker processes (workers are recycled if it differs)
+	def resize(self, processes):
+		if processes != self.processes:
+			self.recycle(processes)
+
+	##
+	# @brief waits for workers to exit (they run their exit handlers)
+	def close(self):
+		if self.pool is not None:
+			self.pool.close()
+			self.pool.join()
+			self.pool = None
+
+	##
+	# @brief runs a function (without arguments) once in every worker, between calls of map
+	# @return array of results of workers (empty if no pool is running)
+	#
+	# a worker stuck over BROADCAST_TIMEOUT breaks the barrier, the function may then run twice in another worker
+	def broadcast(self, func):
+		if self.pool is None:
+			return []
+		if self.barrier.broken:
+			self.barrier.reset()
+		return self.pool.map(_run_broadcast, [func] * self.processes, chunksize=1)
+
+	##
+	# @brief processes pages and returns the results in order of pages
+	# @param func - function processing one page (called in a worker)
+	# @param pages - array of pages
+	# @param on_timeout - function returning the result of a page abandoned by the watchdog
+	def map(self, func, pages, on_timeout):
+		results = [None] * len(pages)
+		pending = list(range(len(pages)))
+
+		while len(pending):
+			if self.pool is None:
+				self.pool = self._new_pool()
+			pool = self.pool
+			submitted = [(i, pool.apply_async(func, (pages[i],))) for i in pending]
+			pending = []
+
+			started = monotonic()
+			for n, (i, result) in enumerate(submitted):
+				if self.hard_timeout is None:
+					result.wait()
+				else:
+					result.wait(max(0, started + self.hard_timeout - monotonic()))
+
+				if result.ready():
+					results[i] = result.get()
+					started = monotonic()
+					continue
+
+				# watchdog - abandon the page, keep finished results and resubmit the rest to a new pool
+				results[i] = on_timeout(pages[i])
+				self.recycled += 1
+				for j, other in submitted[n + 1:]:
+					if other.ready():
+						results[j] = other.get()
+					else:
+						pending.append(j)
+				pool.terminate()
+				pool.join()
+				self.pool = None
+				break
+
+		return results
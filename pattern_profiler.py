@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file pattern_profiler.py
+# @brief per-pattern profiler of regular expressions of patterns_{lang}.json (wiki_extract.py --profile-patterns)
+#
+# code evaluating the patterns gets the search function by get_search() (get_finditer()) once before its loop
+# - re.search (re.finditer) itself when profiling is off, so the disabled profiler costs nothing
+# - a function counting evaluations, matches and time of each pattern when profiling is on
+#
+# @section output output
+# each process writes its counts into patterns-<pid>.json of the profile directory when it exits,
+# the main process merges them into a report ranking the most expensive patterns and listing patterns that never matched
+# (infobox fields of identification are not regular expressions - only their evaluations and matches are counted)
+
+import json
+import os
+import re
+from multiprocessing import util
+from time import perf_counter_ns
+
+from sampling_profiler import PROFILE_DIR
+
+REPORT_FNAME = "patterns.report"
+
+# pattern -> [evaluations, matches, total time in ns], None when profiling is off
+_stats = None
+
+##
+# @brief turns the profiling on in the current process
+# @param directory - profile directory, counts are written into it when a pool worker exits (None = do not write)
+def enable(directory=None):
+	global _stats
+	_stats = dict()
+	if directory is not None:
+		util.Finalize(None, write_counts, args=(os.path.join(directory, f"patterns-{os.getpid()}.json"),), exitpriority=10)
+
+def is_enabled():
+	return _stats is not None
+
+def _add(pattern, matched, time_ns):
+	item = _stats.get(pattern)
+	if item is None:
+		_stats[pattern] = [1, int(matched), time_ns]
+	else:
+		item[0] += 1
+		item[1] += int(matched)
+		item[2] += time_ns
+
+def _profiled_search(pattern, string, flags=0):
+	start = perf_counter_ns()
+	match = re.search(pattern, string, flags)
+	_add(pattern, match is not None, perf_counter_ns() - start)
+	return match
+
+def _profiled_finditer(pattern, string, flags=0):
+	start = perf_counter_ns()
+	matches = list(re.finditer(pattern, string, flags))
+	_add(pattern, len(matches) > 0, perf_counter_ns() - start)
+	return iter(matches)
+
+##
+# @brief returns re.search or its profiled version (when profiling is on)
+def get_search():
+	return re.search if _stats is None else _profiled_search
+
+##
+# @brief returns re.finditer or its profiled version (when profiling is on)
+def get_finditer():
+	return re.finditer if _stats is None else _profiled_finditer
+
+##
+# @brief counts evaluations and matches of infobox fields of identification patterns
+def count_fields(patterns, infobox_data):
+	for entity in patterns.keys():
+		for kind in ["fields", "!fields"]:
+			for field in patterns[entity].get(kind, []):
+				_add(field, field in infobox_data, 0)
+
+##
+# @brief writes counts of the current process into a json file
+def write_counts(fpath):
+	with open(fpath, "w", encoding="utf-8") as file:
+		json.dump(_stats, file, ensure_ascii=False)
+
+##
+# @brief returns locations of patterns in patterns_{lang}.json (pattern -> array of locations)
+#
+# list of keyword patterns is registered also joined by "|" (e.g. keywords "male" and "female" are used so)
+def get_locations(identification, keywords):
+	locations = dict()
+	for entity, kinds in identification.items():
+		for kind, values in kinds.items():
+			for value in values:
+				locations.setdefault(value, []).append(f"{entity}.{kind}")
+	for key, value in keywords.items():
+		if isinstance(value, list):
+			for item in value:
+				locations.setdefault(item, []).append(f"keywords.{key}")
+			locations.setdefault("|".join(value), []).append(f"keywords.{key} (joined)")
+		else:
+			locations.setdefault(value, []).append(f"keywords.{key}")
+	return locations
+
+##
+# @brief prepares the profile directory (counts of a previous run are removed)
+def prepare_profile_dir(directory=PROFILE_DIR):
+	os.makedirs(directory, exist_ok=True)
+	for fname in os.listdir(directory):
+		if fname.startswith("patterns-") and fname.endswith(".json"):
+			os.remove(os.path.join(directory, fname))
+
+##
+# @brief merges counts of all processes of the profile directory (and of the current process) and writes the report
+# @param identification - identification patterns
+# @param keywords - keywords (only regular expressions which are evaluated by the profiled code are counted)
+# @return path to the report
+def write_report(identification, keywords, directory=PROFILE_DIR, top=50):
+	stats = dict()
+	sources = [_stats or dict()]
+	for fname in sorted(os.listdir(directory)):
+		if fname.startswith("patterns-") and fname.endswith(".json"):
+			with open(os.path.join(directory, fname), "r", encoding="utf-8") as file:
+				sources.append(json.load(file))
+	for source in sources:
+		for pattern, (evaluations, matches, time_ns) in source.items():
+			item = stats.setdefault(pattern, [0, 0, 0])
+			item[0] += evaluations
+			item[1] += matches
+			item[2] += time_ns
+
+	locations = get_locations(identification, keywords)
+	fpath = os.path.join(directory, REPORT_FNAME)
+	with open(fpath, "w", encoding="utf-8") as file:
+		file.write("== most expensive patterns ==\n")
+		file.write("- cumulative time of evaluations over all processes\n")
+		file.write("\n")
+		file.write("{:<14}{:<14}{:<14}{:<14}{:<40}{}\n".format("time [ms]", "evaluations", "matches", "avg [us]", "location", "pattern"))
+		file.write("-" * 120 + "\n")
+		ranked = sorted(stats.items(), key=lambda x: x[1][2], reverse=True)
+		for pattern, (evaluations, matches, time_ns) in ranked[:top]:
+			if not time_ns:
+				break
+			file.write("{:<14}{:<14}{:<14}{:<14}{:<40}{}\n".format(
+				round(time_ns / 1e6, 3),
+				evaluations,
+				matches,
+				round(time_ns / evaluations / 1e3, 3),
+				", ".join(locations.get(pattern, ["?"])),
+				pattern
+			))
+
+		file.write("\n")
+		file.write("== dead patterns ==\n")
+		file.write("- identification patterns and keyword patterns that never matched (0 evaluations = never evaluated)\n")
+		file.write("\n")
+		file.write("{:<14}{:<40}{}\n".format("evaluations", "location", "pattern"))
+		file.write("-" * 120 + "\n")
+		for pattern, pattern_locations in sorted(locations.items(), key=lambda x: x[1]):
+			if pattern in stats and stats[pattern][1] > 0:
+				continue
+			# plain keywords (infobox keys, ...) are not evaluated as patterns
+			if pattern not in stats and all(location.startswith("keywords.") for location in pattern_locations):
+				continue
+			evaluations = stats[pattern][0] if pattern in stats else 0
+			file.write("{:<14}{:<40}{}\n".format(evaluations, ", ".join(pattern_locations), pattern))
+
+	return fpath
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file quarantine.py
+# @brief contains Quarantine class - file of pages that could not be turned into a valid KB row
+#
+# workers return a QuarantinedPage instead of the serialized entity, main process writes it to the quarantine file
+# quarantined pages can be processed again (after a fix) from their offsets in the dump (wiki_extract.py --retry-quarantine)
+#
+# @section file_format file format
+# tab separated values, one page per line:
+# - title
+# - byte offset of the page in the pages dump
+# - size of the page content (bytes)
+# - reason (bad_row, timeout or error)
+# - traceback digest (errors only - same digest means the same place of failure)
+# - detail (error message)
+
+import os
+import traceback
+from collections import namedtuple
+from hashlib import sha1
+
+QUARANTINE_FPATH = "kb.quarantine"
+
+##
+# @brief page rejected by a worker
+QuarantinedPage = namedtuple("QuarantinedPage", ["title", "offset", "size", "reason", "digest", "detail"])
+
+##
+# @brief returns a short digest of the traceback of an exception (place of failure, not the message)
+def traceback_digest(exception):
+	frames = traceback.extract_tb(exception.__traceback__)
+	key = "|".join(f"{os.path.basename(frame.filename)}:{frame.name}:{frame.lineno}" for frame in frames)
+	return sha1(f"{type(exception).__name__}|{key}".encode("utf-8")).hexdigest()[:12]
+
+##
+# @brief returns a description of an exception with the place where it was raised
+def describe_error(exception):
+	detail = f"{type(exception).__name__}: {exception}"
+	frames = traceback.extract_tb(exception.__traceback__)
+	if len(frames):
+		frame = frames[-1]
+		detail += f" ({os.path.basename(frame.filename)}:{frame.lineno} in {frame.name})"
+	return detail
+
+##
+# @brief reads quarantined pages from a quarantine file
+# @return array of QuarantinedPage
+def read_quarantine(fpath=QUARANTINE_FPATH):
+	pages = []
+	with open(fpath, "r", encoding="utf-8") as file:
+		for line in file:
+			fields = line.rstrip("\n").split("\t")
+			if len(fields) != len(QuarantinedPage._fields):
+				continue
+			title, offset, size, reason, digest, detail = fields
+			pages.append(QuarantinedPage(title, int(offset), int(size), reason, digest, detail))
+	return pages
+
+##
+# @class Quarantine
+# @brief writer of the quarantine file
+class Quarantine:
+	##
+	# @brief opens (truncates) the quarantine file
+	# @param fpath - path to the quarantine file
+	def __init__(self, fpath=QUARANTINE_FPATH):
+		self.fpath = fpath
+		self.count = 0
+		self.file = open(fpath, "w", encoding="utf-8")
+
+	##
+	# @brief writes a quarantined page into the file
+	def write(self, page):
+		fields = [str(field).replace("\t", " ").replace("\n", " ") for field in page]
+		self.file.write("\t".join(fields) + "\n")
+		self.file.flush()
+		self.count += 1
+
+	def close(self):
+		self.file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
@@ -4,6 +4,18 @@ array[0]="core"
 array[1]="person"
 array[3]="country"
 array[4]="settlement"
+array[5]="metrics"
+array[6]="page_pool"
+array[7]="dump_reader"
+array[8]="autotune"
+array[9]="benchmark"
+array[10]="page_index"
+array[11]="estimate"
+array[12]="incremental"
+array[13]="entity_id"
+array[14]="kb_diff"
+array[15]="kb_reader"
+array[16]="kbwiki2gkb"
 
 for i in "${array[@]}"
 do
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file sampling_profiler.py
+# @brief contains SamplingProfiler class - low overhead profiler sampling Python stacks of the main thread
+#
+# a daemon thread records the stack of the main thread at a fixed rate, the profiled code is not instrumented
+#
+# @section output output
+# collapsed stacks (flamegraph.pl / speedscope compatible), one stack per line:
+# "frame;frame;...;frame count" (outermost frame first, frame is "function (file:first line of function)")
+#
+# each pool worker writes its own file (worker-<pid>.collapsed) when it exits,
+# the main process merges all files of the profile directory into merged.collapsed
+
+import os
+import sys
+import threading
+from collections import Counter
+from multiprocessing import util
+
+# default sampling rate (samples per second)
+PROFILE_RATE = 100
+
+PROFILE_DIR = "profile"
+MERGED_FNAME = "merged.collapsed"
+
+##
+# @brief returns a collapsed stack of a frame (outermost frame first)
+def collapse_stack(frame):
+	frames = []
+	while frame is not None:
+		code = frame.f_code
+		frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+		frame = frame.f_back
+	return ";".join(reversed(frames))
+
+##
+# @class SamplingProfiler
+# @brief samples stacks of the thread that created the profiler
+class SamplingProfiler:
+	##
+	# @param rate - number of samples per second
+	def __init__(self, rate=PROFILE_RATE):
+		self.interval = 1.0 / rate
+		self.thread_id = threading.get_ident()
+		self.samples = Counter()
+		self._stop = threading.Event()
+		self._thread = None
+
+	def start(self):
+		self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+		self._thread.start()
+
+	def stop(self):
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join()
+			self._thread = None
+
+	def _run(self):
+		while not self._stop.wait(self.interval):
+			frame = sys._current_frames().get(self.thread_id)
+			if frame is not None:
+				self.samples[collapse_stack(frame)] += 1
+
+	##
+	# @brief writes the samples as collapsed stacks
+	def write(self, fpath):
+		write_collapsed(self.samples, fpath)
+
+##
+# @brief writes collapsed stacks (Counter stack -> count) into a file
+def write_collapsed(samples, fpath):
+	with open(fpath, "w", encoding="utf-8") as file:
+		for stack, count in sorted(samples.items()):
+			file.write(f"{stack} {count}\n")
+
+##
+# @brief reads collapsed stacks from a file
+# @return Counter stack -> count
+def read_collapsed(fpath):
+	samples = Counter()
+	with open(fpath, "r", encoding="utf-8") as file:
+		for line in file:
+			stack, _, count = line.rstrip("\n").rpartition(" ")
+			if stack:
+				samples[stack] += int(count)
+	return samples
+
+##
+# @brief prepares an empty profile directory (collapsed stacks of a previous run are removed)
+def prepare_profile_dir(directory=PROFILE_DIR):
+	os.makedirs(directory, exist_ok=True)
+	for fname in os.listdir(directory):
+		if fname.endswith(".collapsed"):
+			os.remove(os.path.join(directory, fname))
+
+##
+# @brief merges collapsed stacks of all processes of the profile directory into MERGED_FNAME
+# @return path to the merged file
+def merge_profile_dir(directory=PROFILE_DIR):
+	samples = Counter()
+	for fname in sorted(os.listdir(directory)):
+		if fname.endswith(".collapsed") and fname != MERGED_FNAME:
+			samples.update(read_collapsed(os.path.join(directory, fname)))
+	fpath = os.path.join(directory, MERGED_FNAME)
+	write_collapsed(samples, fpath)
+	return fpath
+
+##
+# @brief starts profiling of a pool worker, samples are written into the profile directory when the worker exits
+def start_worker_profiler(rate=PROFILE_RATE, directory=PROFILE_DIR):
+	profiler = SamplingProfiler(rate)
+	profiler.start()
+
+	def finish():
+		profiler.stop()
+		profiler.write(os.path.join(directory, f"worker-{os.getpid()}.collapsed"))
+
+	# finalizers with exitpriority are run by multiprocessing when the worker process exits
+	util.Finalize(None, finish, exitpriority=10)
+	return profiler
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file slice_dump.py
+# @brief writes a smaller valid pages dump with pages selected from a big dump (inputs for benchmarks and regression tests)
+#
+# the big dump is streamed once, pages are copied as raw bytes (the header of the dump is kept), selection:
+# - --titles - pages with titles listed in a file (one title per line)
+# - --types - pages of the given entity types according to the current patterns ("other" = not an identified entity,
+#   e.g. redirects, disambiguations and unidentified pages)
+# - --quota - at most N pages of each given type, chosen uniformly at random
+# - --sample - N pages chosen uniformly at random (from pages passing the other filters)
+#
+# random selections use reservoir sampling with a fixed seed (the same seed gives the same slice), selected pages are kept
+# in memory until the end of the dump and written in the order of the big dump
+#
+# usage: python3 slice_dump.py -p DUMP -o OUTPUT [--titles FILE] [--types person,...] [--quota person=100,...] [--sample N] [--seed N]
+
+import argparse
+import os
+import random
+import xml.etree.cElementTree as CElTree
+
+import dump_reader
+
+# type of pages which are not identified entities
+OTHER_TYPE = "other"
+
+##
+# @class Reservoir
+# @brief uniform random sample of a stream of items (all items if the size is None)
+class Reservoir:
+	def __init__(self, size, generator):
+		self.size = size
+		self.generator = generator
+		self.seen = 0
+		self.items = []
+
+	def add(self, item):
+		self.seen += 1
+		if self.size is None or len(self.items) < self.size:
+			self.items.append(item)
+		else:
+			i = self.generator.randrange(self.seen)
+			if i < self.size:
+				self.items[i] = item
+
+##
+# @class PageTyper
+# @brief identifies entity types of pages by the current patterns (as wiki_extract.py does)
+class PageTyper:
+	def __init__(self, lang, pages_fpath):
+		from wiki_extract import ENTITY_CLASSES, WikiExtract
+
+		self.entity_classes = ENTITY_CLASSES
+		self.extractor = WikiExtract()
+		self.extractor.parse_args(["-l", lang, "-p", os.path.abspath(pages_fpath)])
+		repo_dir = os.path.dirname(os.path.abspath(__file__))
+		self.patterns, self.keywords = self.extractor.load_patterns(os.path.join(repo_dir, "json", f"patterns_{self.extractor.console_args.lang}.json"))
+
+	##
+	# @brief returns the entity type of a page (OTHER_TYPE if the page is not an identified entity)
+	# @param page - <page> element
+	def page_type(self, page):
+		page_data = self.extractor.get_page_data(page, self.keywords, dict(), dict())
+		if page_data is None:
+			return OTHER_TYPE
+		title, content = page_data[0], page_data[1]
+		extraction = self.extractor.extract_entity_data(content, self.keywords)
+		identification = self.extractor.identify_entity(title, extraction, self.patterns).most_common()
+		if identification[0][1] > 0 and identification[0][0] in self.entity_classes:
+			return identification[0][0]
+		return OTHER_TYPE
+
+##
+# @brief parses quotas ("person=100,settlement=50") into a dictionary type -> number of pages
+def parse_quota(quota):
+	result = dict()
+	for item in quota.split(","):
+		key, _, count = item.partition("=")
+		result[key.strip()] = int(count)
+	return result
+
+##
+# @brief generator of selected raw pages of a dump (in the order of the dump)
+# @param pages_fpath - path to the big dump
+# @param titles - set of titles (None = any title)
+# @param types - set of entity types (None = any type)
+# @param quota - dictionary type -> maximal number of pages (None = no quotas)
+# @param sample - number of randomly chosen pages (None = all pages)
+# @param seed - seed of random selections
+# @param lang - language of the dump (for identification of types)
+# @param limit - maximal number of scanned pages of the dump (None = whole dump)
+def select_pages(pages_fpath, titles=None, types=None, quota=None, sample=None, seed=0, lang="en", limit=None):
+	typer = PageTyper(lang, pages_fpath) if types is not None or quota is not None else None
+	generator = random.Random(seed)
+	reservoirs = dict()
+	buffered = quota is not None or sample is not None
+
+	for n, (offset, raw_page) in enumerate(dump_reader.iter_raw_pages(pages_fpath)):
+		if limit is not None and n >= limit:
+			break
+
+		page = None
+		if titles is not None:
+			page = CElTree.fromstring(raw_page)
+			if page.find("title").text not in titles:
+				continue
+
+		group = None
+		if typer is not None:
+			group = typer.page_type(page if page is not None else CElTree.fromstring(raw_page))
+			if types is not None and group not in types:
+				continue
+			if quota is not None and group not in quota:
+				continue
+
+		if not buffered:
+			yield raw_page
+			continue
+
+		# one reservoir per type with quotas, otherwise one reservoir of the sample for pages of all types
+		key = group if quota is not None else None
+		if key not in reservoirs:
+			reservoirs[key] = Reservoir(quota[group] if quota is not None else sample, generator)
+		reservoirs[key].add((offset, raw_page))
+
+	selected = [item for reservoir in reservoirs.values() for item in reservoir.items]
+	if quota is not None and sample is not None:
+		selected = generator.sample(selected, min(sample, len(selected)))
+	for _, raw_page in sorted(selected):
+		yield raw_page
+
+##
+# @brief writes a slice of a dump
+# @return number of written pages
+def slice_dump(pages_fpath, output_fpath, **kwargs):
+	return dump_reader.write_dump(output_fpath, dump_reader.read_header(pages_fpath), select_pages(pages_fpath, **kwargs))
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Writes a smaller pages dump with pages selected from a big dump.")
+	parser.add_argument("-p", "--pages", required=True, help="Path to the big pages dump.")
+	parser.add_argument("-o", "--output", required=True, help="Path to the new pages dump.")
+	parser.add_argument("-l", "--lang", default="en", help="Language of the dump (default: %(default)s).")
+	parser.add_argument("--titles", help="File with titles of selected pages (one title per line).")
+	parser.add_argument("--types", help=f"Comma separated entity types of selected pages (\"{OTHER_TYPE}\" = not an identified entity).")
+	parser.add_argument("--quota", type=parse_quota, help="Maximal numbers of randomly chosen pages of types, e.g. \"person=100,settlement=50\".")
+	parser.add_argument("--sample", type=int, help="Number of randomly chosen pages.")
+	parser.add_argument("--seed", type=int, default=0, help="Seed of random selections (default: %(default)s).")
+	parser.add_argument("--limit", type=int, help="Maximal number of scanned pages of the big dump.")
+	args = parser.parse_args()
+
+	titles = None
+	if args.titles:
+		with open(args.titles, "r", encoding="utf-8") as file:
+			titles = set(line.rstrip("\n") for line in file if line.strip())
+	types = set(args.types.split(",")) if args.types else None
+
+	count = slice_dump(args.pages, args.output, titles=titles, types=types, quota=args.quota, sample=args.sample, seed=args.seed, lang=args.lang, limit=args.limit)
+	print(f"written {count} pages to {args.output}")
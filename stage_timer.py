@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file stage_timer.py
+# @brief contains StageTimer class - cumulative timers of stages of the extraction
+#
+# each process has its own STAGE_TIMER, workers send its values with the result of each page (pop())
+# and the main process merges them into the report of the run
+#
+# @section stages stages
+# - stage names containing "/" are parts of the stage before "/" (e.g. "extraction/clean" is a part of "extraction")
+# - times of worker stages are summed over all workers (they exceed the wall time of the run with more processes)
+
+from contextlib import contextmanager
+from time import perf_counter_ns
+
+##
+# @class StageTimer
+# @brief number of calls and total time (nanoseconds) of each stage
+class StageTimer:
+	def __init__(self):
+		# stage -> [count, total time in ns]
+		self.stages = dict()
+
+	##
+	# @brief adds a measured time to a stage
+	def add(self, stage, time_ns, count=1):
+		if stage in self.stages:
+			item = self.stages[stage]
+			item[0] += count
+			item[1] += time_ns
+		else:
+			self.stages[stage] = [count, time_ns]
+
+	##
+	# @brief measures time of the enclosed block
+	@contextmanager
+	def measure(self, stage):
+		start = perf_counter_ns()
+		try:
+			yield
+		finally:
+			self.add(stage, perf_counter_ns() - start)
+
+	##
+	# @brief generator measuring time spent in getting the items of an iterable
+	def timed(self, stage, iterable):
+		iterator = iter(iterable)
+		while True:
+			start = perf_counter_ns()
+			try:
+				item = next(iterator)
+			except StopIteration:
+				return
+			self.add(stage, perf_counter_ns() - start)
+			yield item
+
+	##
+	# @brief returns the measured stages and resets the timer
+	# @return dictionary stage -> (count, total time in ns)
+	def pop(self):
+		stages = {stage: tuple(item) for stage, item in self.stages.items()}
+		self.stages.clear()
+		return stages
+
+	##
+	# @brief adds stages of another timer (result of pop())
+	def merge(self, stages):
+		for stage, (count, time_ns) in stages.items():
+			self.add(stage, time_ns, count)
+
+	##
+	# @brief returns lines of the report (stage, count, total seconds, average milliseconds) ordered by stage
+	def report_lines(self):
+		lines = ["{:<36}{:>12}{:>14}{:>14}".format("stage", "count", "total [s]", "avg [ms]")]
+		for stage, (count, time_ns) in sorted(self.stages.items()):
+			name = "  " + stage.split("/", 1)[1] if "/" in stage else stage
+			lines.append("{:<36}{:>12}{:>14.3f}{:>14.3f}".format(name, count, time_ns / 1e9, time_ns / count / 1e6))
+		return lines
+
+STAGE_TIMER = StageTimer()
@@ -44,6 +44,9 @@ usage()
         echo -e "               ${DUMP_PATH:${cut_DUMP_PATH}}"
     fi
     echo -e "  --debug [<int>]  Number of pages to process in debug mode (default: 10.000)"
+    echo -e "  --estimate   choose the number of pool processes by estimate.py (sample of the dump, unless -m is given)"
+    echo -e "  --incremental <kb> <index>  process only pages changed since the previous KB (kb or KBstatsMetrics.all)"
+    echo -e "               and merge them into it (index = page index of the previous dump, see page_index.py)"
     echo -e "  -u [<login>] upload (deploy) KB to webstorage via given login"
     echo -e "               (default current user)"
     echo -e "  --dev        Development mode (upload to separate space to prevent forming a new production/stable version of KB)"
@@ -66,6 +69,10 @@ PAGES_PATH=
 REDIR_PATH=
 SENTENCE_PATH=
 DEPLOY=false
+ESTIMATE=false
+PREVIOUS_KB=
+PREVIOUS_INDEX=
+CUSTOM_NPROC=false
 MULTIPROC_PARAMS="-m ${NPROC}"
 EXTRACTION_ARGS=()
 KB_STABILITY=
@@ -101,9 +108,19 @@ while [ "$1" != "" ]; do
 #            shift
 #            ;;
         -m)
+            CUSTOM_NPROC=true
             MULTIPROC_PARAMS="-m ${2}"
             shift
             ;;
+        --estimate)
+            ESTIMATE=true
+            ;;
+        --incremental)
+            PREVIOUS_KB=`readlink -f "$2"`
+            PREVIOUS_INDEX=`readlink -f "$3"`
+            shift
+            shift
+            ;;
         -u)
             DEPLOY=true
             LOGIN=$2
@@ -209,6 +226,7 @@ while read -r line; do
                     then
                         # echo ${ADDR[i+1]}
                         NPROC=${ADDR[i+1]}
+                        CUSTOM_NPROC=true
                         MULTIPROC_PARAMS="-m ${NPROC}"
                     fi
                     break
@@ -281,6 +299,29 @@ fi
 #    exit 3
 #fi
 
+# number of pool processes estimated from a sample of the dump (instead of the free memory heuristic)
+if $ESTIMATE && ! $CUSTOM_NPROC
+then
+    ESTIMATE_ARGS=()
+    if test "${PAGES_PATH}" != ""
+    then
+        ESTIMATE_ARGS+=("-p ${PAGES_PATH}")
+    fi
+    if [ -n "$SENTENCE_PATH" ]; then
+        ESTIMATE_ARGS+=("-s ${SENTENCE_PATH}")
+    fi
+    CMD="python3 estimate.py --lang ${LANG} --dump ${DUMP_VERSION} --indir \"${DUMP_PATH}\" ${ESTIMATE_ARGS[@]} --print-workers 2>/dev/null | tail -n 1"
+    echo "RUNNING COMMAND: ${CMD}"
+    ESTIMATED_NPROC=`eval $CMD`
+    if [[ "${ESTIMATED_NPROC}" =~ ^[0-9]+$ ]]
+    then
+        NPROC=${ESTIMATED_NPROC}
+        MULTIPROC_PARAMS="-m ${NPROC}"
+    else
+        >&2 echo "WARNING: estimation of the number of pool processes failed - using ${NPROC}"
+    fi
+fi
+
 EXTRACTION_ARGS+=(${KB_STABILITY})
 EXTRACTION_ARGS+=(${MULTIPROC_PARAMS})
 if [ -n "$SENTENCE_PATH" ]; then
@@ -302,6 +343,11 @@ then
      EXTRACTION_ARGS+=("-r \"\"")
 fi
 
+if test -n "${PREVIOUS_KB}"
+then
+    EXTRACTION_ARGS+=("--incremental \"${PREVIOUS_KB}\" --previous-index \"${PREVIOUS_INDEX}\"")
+fi
+
 # Run CS Wikipedia extractor to create new KB
 # old code:
 # CMD="python3 wiki_cs_extract.py --lang ${LANG} --dump ${DUMP_VERSION} --indir \"${DUMP_PATH}\" ${EXTRACTION_ARGS[@]} 2>entities_processing.log"
@@ -339,7 +385,7 @@ if [ $retVal -ne 0 ]; then
 fi
 
 # Convert Wikipedia KB format to Generic KB format
-python3 kbwiki2gkb.py --indir outputs --outdir outputs
+python3 kbwiki2gkb.py --indir outputs --outdir outputs ${MULTIPROC_PARAMS}
 retVal=$?
 if [ $retVal -ne 0 ]; then
     echo ""
@@ -8,16 +8,15 @@
 # @date 02.10.2022
 
 import re
-from datetime import datetime, timedelta
+from datetime import timedelta
+
+from kb_reader import TYPE_COLUMN, KbReader
+from telemetry import TELEMETRY_FNAME, read_telemetry
 
 ##
 # @brief generates statistics after extraction was run
 def gen_stats():
 	entities = {}
-	delta_sum = timedelta()
-	total_pages = 0
-	time_total = ""
-	identification = {}
 	# get entity information from head
 	with open("outputs/HEAD-KB", "r") as f:
 		lines = f.readlines()
@@ -38,11 +37,10 @@ def gen_stats():
 						break
 					entities[entity][key] = [i, 0]
 	# get entity data from kb
-	with open("outputs/KBstatsMetrics.all", "r") as f:
-		lines = f.readlines()
-		for line in lines:
-			split = line.split("\t")
-			entity = split[1]
+	with KbReader("outputs/KBstatsMetrics.all", save_index=False) as reader:
+		for row in reader:
+			split = row.columns
+			entity = split[TYPE_COLUMN]
 			entities[entity]["count"] += 1
 			for key in entities[entity].keys():
 				if key == "count":
@@ -50,34 +48,16 @@ def gen_stats():
 				data = split[entities[entity][key][0]]
 				if data != "":
 					entities[entity][key][1] += 1
-	# get stats from out file
-	with open("outputs/kb.out", "r") as f:
-		lines = f.readlines()
-		for line in lines:
-			split = line.split(";")[0]
-			split = split.split(",")
-			if split[0] == "time_avg":
-				t = datetime.strptime(split[1], "%H:%M:%S.%f")
-				delta_sum += timedelta(hours=t.hour, minutes=t.minute, seconds=t.second)
-				total_pages += int(split[2])
-			elif split[0] == "time_total":
-				t = datetime.strptime(split[1], "%H:%M:%S.%f")
-				delta = timedelta(hours=t.hour, minutes=t.minute, seconds=t.second)
-				time_total = pretty_time_delta(delta.total_seconds())
-			elif split[0] == "id_stats":
-				key = split[1]
-				number = int(split[2])
-				if key not in identification:
-					# count. sum, min, max
-					identification[key] = [0, 0, None, None]
-				identification[key][0] += 1
-				identification[key][1] += number
-				if identification[key][2] is None or identification[key][2] > number:
-					identification[key][2] = number
-				if identification[key][3] is None or identification[key][3] < number:
-					identification[key][3] = number
-			else:
-				continue
+	# get stats from the telemetry file of the extraction
+	telemetry = read_telemetry(f"outputs/{TELEMETRY_FNAME}")
+	delta_sum = timedelta(seconds=telemetry["batch_time"])
+	total_pages = telemetry["pages"]
+	time_total = pretty_time_delta(telemetry["time_total"])
+	# entity -> [count, sum, min, max]
+	identification = telemetry["observations"].get("identification", {})
+	stage_times = telemetry["stages"]
+	quarantined = {key.split(":", 1)[1]: value for key, value in telemetry["counters"].items() if key.startswith("quarantined:")}
+	unclassified = {key.split(":", 1)[1]: value for key, value in telemetry["counters"].items() if key.startswith("unclassified:")}
 	with open("outputs/stats.log", "w") as f:
 
 		# time and general stats
@@ -86,6 +66,10 @@ def gen_stats():
 		f.write("{:<20}{:<15}\n".format("total pages", total_pages))
 		f.write("{:<20}{:<15}\n".format("total time", time_total))
 		f.write("{:<20}{:<15}\n".format("avg. time for page", str(delta_sum/total_pages)))
+		for reason, count in sorted(quarantined.items()):
+			f.write("{:<20}{:<15}\n".format(f"quarantined ({reason})", count))
+		for prefix, count in sorted(unclassified.items()):
+			f.write("{:<20}{:<15}\n".format(f"skipped ({prefix})", count))
 
 		f.write("\n")
 
@@ -116,6 +100,39 @@ def gen_stats():
 
 		f.write("\n")
 
+		# stage times
+		if len(stage_times):
+			f.write("== stage times ==\n")
+			f.write("- time spent in individual stages of the extraction (worker stages are summed over all workers)\n")
+			f.write("\n")
+			f.write("{:<36}{:<15}{:<15}{:<15}\n".format("stage", "count", "total [s]", "avg [ms]"))
+			f.write("----------------------------------------------------------------------------------\n")
+			for key, item in sorted(stage_times.items()):
+				name = "  " + key.split("/", 1)[1] if "/" in key else key
+				f.write("{:<36}{:<15}{:<15}{:<15}\n".format(name, item[0], round(item[1], 3), round(item[1] / item[0] * 1000, 3)))
+			f.write("\n")
+
+		# memory
+		if "memory" in telemetry:
+			memory = telemetry["memory"]
+			f.write("== memory ==\n")
+			f.write("- peak RSS of processes and top allocators of the main process (--mem-profile)\n")
+			f.write("\n")
+			f.write("{:<20}{} MB\n".format("main peak RSS", memory["main_peak_rss_kb"] // 1024))
+			workers = [item[3] for item in telemetry["observations"].get("worker_peak_rss_kb", {}).values()]
+			if len(workers):
+				f.write("{:<20}{} MB\n".format("worker peak RSS", max(workers) // 1024))
+				f.write("{:<20}{} MB\n".format("worker mean RSS", sum(workers) // len(workers) // 1024))
+			f.write("\n")
+			for snapshot in memory["snapshots"]:
+				f.write(f"pages {snapshot['pages']} {snapshot['label']}\n")
+				f.write("--------------------------------\n")
+				f.write("{:<40}{} MB\n".format("RSS", snapshot["rss_kb"] // 1024))
+				f.write("{:<40}{} MB\n".format("traced", snapshot["traced_kb"] // 1024))
+				for location, size_kb, count in snapshot["top"]:
+					f.write("{:<40}{} kB\n".format(location, size_kb))
+				f.write("\n")
+
 		# emptiness
 		f.write("== entity emptiness ==\n")
 		f.write("- shows how much of invidual information was extracted during the extraction\n")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+##
+# @file telemetry.py
+# @brief contains Telemetry class (counters of a worker) and RunTelemetry class (telemetry of the whole run)
+#
+# workers aggregate counters in their TELEMETRY and ship its snapshot (pop()) with the result of a page once
+# per SNAPSHOT_PAGES pages or SNAPSHOT_INTERVAL seconds (see Telemetry.tick) and at the end of each batch,
+# the main process merges snapshots into RunTelemetry, which is written once at the end of the run
+# into a JSON file read by stats.py (instead of parsing lines logged to stderr)
+#
+# @section file_format telemetry file
+# JSON object:
+# - "time_total" - wall time of the run (seconds)
+# - "pages" - number of processed pages, "batch_time" - sum of wall times of processing of batches (seconds)
+# - "counters" - name -> count (e.g. "quarantined:timeout")
+# - "observations" - name -> key -> [count, sum, min, max] (e.g. identification score of each entity type)
+# - "stages" - stage -> [count, seconds] (see stage_timer.py)
+# - "memory" - tracemalloc snapshots of the main process and its peak RSS (only with --mem-profile, see mem_profiler.py),
+#   peak RSS of workers is in "observations" ("worker_peak_rss_kb" -> pid -> [count, sum, min, max])
+# - "autotune" - changes of the number of workers and the batch size [batch number, workers, batch size, reason]
+#   (only with --autotune, see autotune.py)
+#
+# a retry of quarantined pages writes its telemetry into RETRY_TELEMETRY_FNAME
+
+import json
+import os
+from collections import Counter
+from time import monotonic
+
+from stage_timer import STAGE_TIMER, StageTimer
+
+# a worker ships its snapshot after this number of pages or seconds (whichever comes first)
+SNAPSHOT_PAGES = 1000
+SNAPSHOT_INTERVAL = 5.0
+
+TELEMETRY_FNAME = "kb.telemetry.json"
+# telemetry of a retry of quarantined pages (--retry-quarantine), the telemetry of the full run is kept
+RETRY_TELEMETRY_FNAME = "kb.retry.telemetry.json"
+
+##
+# @brief adds observations (name -> key -> [count, sum, min, max]) into other observations
+def merge_observations(observations, other):
+	for name, keys in other.items():
+		target = observations.setdefault(name, dict())
+		for key, (count, total, minimum, maximum) in keys.items():
+			if key in target:
+				item = target[key]
+				item[0] += count
+				item[1] += total
+				item[2] = min(item[2], minimum)
+				item[3] = max(item[3], maximum)
+			else:
+				target[key] = [count, total, minimum, maximum]
+
+##
+# @class Telemetry
+# @brief counters and observations of a process
+class Telemetry:
+	def __init__(self):
+		self.counters = Counter()
+		self.observations = dict()
+		# pages since the last snapshot and its time
+		self.pages = 0
+		self.popped = monotonic()
+
+	def count(self, name, n=1):
+		self.counters[name] += n
+
+	##
+	# @brief adds a value to count, sum, min and max of the observed key
+	def observe(self, name, key, value):
+		merge_observations(self.observations, {name: {key: (1, value, value, value)}})
+
+	##
+	# @brief counts a processed page
+	# @return True if the snapshot is due to be shipped (SNAPSHOT_PAGES pages or SNAPSHOT_INTERVAL seconds since the last one)
+	def tick(self):
+		self.pages += 1
+		return self.pages >= SNAPSHOT_PAGES or monotonic() - self.popped >= SNAPSHOT_INTERVAL
+
+	##
+	# @brief returns the snapshot of counters, observations and stage times and resets them
+	def pop(self):
+		snapshot = {
+			"counters": dict(self.counters),
+			"observations": self.observations,
+			"stages": STAGE_TIMER.pop()
+		}
+		self.counters = Counter()
+		self.observations = dict()
+		self.pages = 0
+		self.popped = monotonic()
+		return snapshot
+
+##
+# @class RunTelemetry
+# @brief telemetry of the whole run merged in the main process
+class RunTelemetry:
+	def __init__(self):
+		self.counters = Counter()
+		self.observations = dict()
+		# stage times of the run (merged from workers)
+		self.stages = StageTimer()
+		self.pages = 0
+		self.batch_time = 0.0
+		# memory report (--mem-profile)
+		self.memory = None
+		# changes of the number of workers and the batch size (--autotune)
+		self.autotune = None
+
+	##
+	# @brief merges a snapshot of a worker (Telemetry.pop())
+	def merge(self, snapshot):
+		self.counters.update(snapshot["counters"])
+		merge_observations(self.observations, snapshot["observations"])
+		self.stages.merge(snapshot["stages"])
+
+	##
+	# @brief adds a processed batch of pages
+	def add_batch(self, pages, seconds):
+		self.pages += pages
+		self.batch_time += seconds
+
+	##
+	# @brief writes the telemetry file
+	# @param time_total - wall time of the run (seconds)
+	def write(self, fpath, time_total):
+		data = {
+			"time_total": time_total,
+			"pages": self.pages,
+			"batch_time": self.batch_time,
+			"counters": dict(self.counters),
+			"observations": self.observations,
+			"stages": {stage: [count, time_ns / 1e9] for stage, (count, time_ns) in self.stages.stages.items()}
+		}
+		if self.memory is not None:
+			data["memory"] = self.memory
+		if self.autotune is not None:
+			data["autotune"] = self.autotune
+		tmp_fpath = fpath + ".tmp"
+		with open(tmp_fpath, "w", encoding="utf-8") as file:
+			json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
+		os.replace(tmp_fpath, fpath)
+
+##
+# @brief reads the telemetry file
+def read_telemetry(fpath):
+	with open(fpath, "r", encoding="utf-8") as file:
+		return json.load(file)
+
+TELEMETRY = Telemetry()
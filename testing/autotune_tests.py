@@ -0,0 +1,61 @@
+import unittest, os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import autotune
+from autotune import AutoTuner, BatchStats
+
+GB = 1024 * 1024
+
+class AutoTunerTests(unittest.TestCase):
+
+	def tuner(self, workers=2, batch_size=4000, max_workers=4):
+		tuner = AutoTuner(workers, batch_size, max_workers)
+		# do not depend on the number of CPUs of the machine
+		tuner.max_workers = max_workers
+		tuner.workers = workers
+		return tuner
+
+	def test_saturated(self):
+		tuner = self.tuner()
+		# 2 workers busy for the whole batch, latency 7.5 ms -> batch of 15 s with 3 workers is 6000 pages
+		reasons = tuner.update(BatchStats(4000, 15, 30, 200 * 1024, 16 * GB))
+		self.assertEqual(tuner.workers, 3)
+		self.assertEqual(tuner.batch_size, 6000)
+		self.assertEqual(len(reasons), 2)
+		self.assertEqual(tuner.history, [[1, 3, 6000, ", ".join(reasons)]])
+
+	def test_starving(self):
+		tuner = self.tuner()
+		# utilization 0.25 (long tail), latency 7.5 ms
+		tuner.update(BatchStats(4000, 60, 30, 0, 16 * GB))
+		self.assertEqual(tuner.workers, 1)
+		self.assertEqual(tuner.batch_size, 2000)
+
+	def test_stable(self):
+		tuner = self.tuner()
+		# utilization 0.75, batch size within tolerance
+		self.assertEqual(tuner.update(BatchStats(4000, 20, 30, 0, 16 * GB)), [])
+		self.assertEqual((tuner.workers, tuner.batch_size), (2, 4000))
+		self.assertEqual(tuner.history, [])
+
+	def test_low_memory(self):
+		tuner = self.tuner()
+		tuner.update(BatchStats(4000, 15, 30, 0, autotune.MEMORY_RESERVE_KB - 1))
+		self.assertEqual((tuner.workers, tuner.batch_size), (1, 2000))
+
+	def test_no_memory_for_worker(self):
+		tuner = self.tuner()
+		tuner.update(BatchStats(4000, 15, 30, 2 * GB, autotune.MEMORY_RESERVE_KB + GB))
+		self.assertEqual(tuner.workers, 2)
+
+	def test_limits(self):
+		tuner = self.tuner(workers=4, batch_size=autotune.MAX_BATCH_SIZE)
+		# very fast pages on saturated workers
+		tuner.update(BatchStats(autotune.MAX_BATCH_SIZE, 1, 4, 0, 16 * GB))
+		self.assertEqual((tuner.workers, tuner.batch_size), (4, autotune.MAX_BATCH_SIZE))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,76 @@
+import unittest, os, sys, inspect, tempfile, filecmp
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import dump_reader
+from benchmark import synthetic_dump
+from benchmark.run import compare
+from benchmark import entity_bench
+
+class SyntheticDumpTests(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def test_generate(self):
+		dump = synthetic_dump.generate(os.path.join(self.tmpdir.name, "a"), 300, seed=1)
+		self.assertEqual(sum(dump.counts.values()), 300)
+
+		pages = [page for _, page in dump_reader.iter_pages(dump.pages_fpath)]
+		self.assertEqual(len(pages), 300)
+		titles = [page.find("title").text for page in pages]
+		self.assertEqual(len(set(titles)), 300)
+		redirects = [page for page in pages if page.find("redirect") is not None]
+		self.assertEqual(len(redirects), dump.counts["redirect"])
+
+		with open(dump.redirects_fpath, "r", encoding="utf-8") as file:
+			self.assertEqual(len(file.readlines()), dump.counts["redirect"])
+		with open(dump.first_sentences_fpath, "r", encoding="utf-8") as file:
+			articles = sum(count for kind, count in dump.counts.items() if kind not in ["redirect", "disambiguation"])
+			self.assertEqual(len(file.readlines()), articles)
+
+	def test_deterministic(self):
+		first = synthetic_dump.generate(os.path.join(self.tmpdir.name, "a"), 100, seed=7)
+		second = synthetic_dump.generate(os.path.join(self.tmpdir.name, "b"), 100, seed=7)
+		self.assertTrue(filecmp.cmp(first.pages_fpath, second.pages_fpath, shallow=False))
+
+	def test_mix(self):
+		dump = synthetic_dump.generate(self.tmpdir.name, 50, mix=synthetic_dump.parse_mix("person=1,redirect=0"))
+		self.assertEqual(dump.counts, {"person": 50})
+		with self.assertRaises(ValueError):
+			synthetic_dump.parse_mix("dragon=1")
+
+class EntityBenchTests(unittest.TestCase):
+
+	def test_record_replay(self):
+		with tempfile.TemporaryDirectory() as tmpdir:
+			dump = synthetic_dump.generate(tmpdir, 200, mix=synthetic_dump.parse_mix("person=1,settlement=1,plain=1"))
+			fixtures_fpath = os.path.join(tmpdir, "fixtures.jsonl")
+			counts = entity_bench.record(dump.pages_fpath, fixtures_fpath, per_type=5, redirects_fpath=dump.redirects_fpath, first_sentences_fpath=dump.first_sentences_fpath)
+			self.assertEqual((counts["person"], counts["settlement"]), (5, 5))
+
+			results = entity_bench.replay(fixtures_fpath, repeat=1)
+		self.assertEqual(results.keys(), counts.keys())
+		self.assertEqual(results["person"]["entities"], 5)
+		self.assertGreater(results["person"]["us_per_entity"], 0)
+		self.assertEqual(entity_bench.compare(results, results), [])
+
+class CompareTests(unittest.TestCase):
+
+	def results(self, pages_per_s, peak_rss_kb, page_per_s):
+		return {"pages_per_s": pages_per_s, "peak_rss_kb": peak_rss_kb, "stages": {"page": {"count": 100, "seconds": 100 / page_per_s, "per_s": page_per_s}}}
+
+	def test_compare(self):
+		baseline = self.results(100, 1000, 10)
+		self.assertEqual(compare(self.results(95, 1100, 9), baseline), [])
+		self.assertEqual(len(compare(self.results(80, 1100, 9), baseline)), 1)
+		self.assertEqual(len(compare(self.results(100, 1300, 9), baseline)), 1)
+		self.assertEqual(len(compare(self.results(80, 1300, 5), baseline)), 3)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -7,6 +7,9 @@ sys.path.insert(0, parentdir)
 
 from ent_country import EntCountry
 from debugger import Debugger
+from kb_schema import KB_SCHEMA, KbRowError
+from telemetry import TELEMETRY
+from wiki_extract import WikiExtract
 
 def load_json(lang):
 	d = dict()
@@ -134,5 +137,33 @@ class CoreTests(unittest.TestCase):
 			self.assertEqual(result[0], wanted[0])
 			self.assertEqual(result[1], wanted[1])
 
+	def test_serialize(self):
+		self.entity.prefix = "country"
+		self.entity.population = "100"
+		row = repr(self.entity).split("\t")
+		self.assertEqual(len(row), len(KB_SCHEMA.columns("country")))
+		self.assertEqual(row[1], "country")
+		self.assertEqual(row[12], "100")
+		self.assertEqual(row[-6:], [""] * 6)
+
+		# wrong number of values, tab inside a value and unknown entity type
+		self.assertRaises(KbRowError, self.entity.serialize, ["1", "2"])
+		self.entity.population = "1\t2"
+		self.assertRaises(KbRowError, repr, self.entity)
+		self.entity.population = ""
+		self.entity.prefix = "geo:unknown"
+		self.assertRaises(KbRowError, repr, self.entity)
+
+	def test_unclassified(self):
+		extractor = WikiExtract()
+		extractor.parse_args(["-l", "en", "-p", os.devnull])
+		langmap = extractor.load_langmap("json/langmap_en.json")
+		patterns, keywords = extractor.load_patterns("json/patterns_en.json")
+		TELEMETRY.pop()
+		# identified as geo by the category, but not classified as any geo type
+		content = "'''Foo''' is an atoll.\n\n[[Category:Atolls of Kiribati]]"
+		self.assertIsNone(extractor.process_entity(("Foo", content, [], ""), langmap, patterns, keywords))
+		self.assertEqual(TELEMETRY.pop()["counters"], {"unclassified:geo:unknown": 1})
+
 if __name__ == "__main__":
 	unittest.main()
\ No newline at end of file
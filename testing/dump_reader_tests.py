@@ -0,0 +1,115 @@
+import unittest, os, sys, inspect, tempfile
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import dump_reader
+import slice_dump
+
+DUMP = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/" xml:lang="en">
+  <siteinfo><sitename>Wikipedia</sitename></siteinfo>
+  <page>
+    <title>Karel Čapek</title>
+    <revision><text>&lt;page&gt; is escaped</text></revision>
+  </page>
+  <page>
+    <title>Praha</title>
+    <revision><text>text</text></revision>
+  </page>
+</mediawiki>
+"""
+
+class DumpReaderTests(unittest.TestCase):
+
+	def setUp(self):
+		self.file = tempfile.NamedTemporaryFile(suffix=".xml", delete=False)
+		self.file.write(DUMP.encode("utf-8"))
+		self.file.close()
+		self.block_size = dump_reader.BLOCK_SIZE
+
+	def tearDown(self):
+		dump_reader.BLOCK_SIZE = self.block_size
+		os.unlink(self.file.name)
+
+	def test_pages(self):
+		data = DUMP.encode("utf-8")
+		wanted = [(data.find(b"<page>"), "Karel Čapek"), (data.rfind(b"<page>"), "Praha")]
+		# block boundaries inside of pages and tags
+		for block_size in [1, 3, 7, 64, 1 << 20]:
+			dump_reader.BLOCK_SIZE = block_size
+			pages = [(offset, page.find("title").text) for offset, page in dump_reader.iter_pages(self.file.name)]
+			self.assertEqual(pages, wanted)
+
+		for offset, title in wanted:
+			self.assertEqual(dump_reader.read_page(self.file.name, offset).find("title").text, title)
+		self.assertRaises(ValueError, dump_reader.read_page, self.file.name, wanted[0][0] + 1)
+
+	def test_write_dump(self):
+		header = dump_reader.read_header(self.file.name)
+		self.assertTrue(header.endswith(b"</siteinfo>\n"))
+		raw_pages = [raw_page for _, raw_page in dump_reader.iter_raw_pages(self.file.name)]
+		with tempfile.TemporaryDirectory() as tmpdir:
+			fpath = os.path.join(tmpdir, "dump.xml")
+			self.assertEqual(dump_reader.write_dump(fpath, header, raw_pages[::-1]), 2)
+			pages = [page.find("title").text for _, page in dump_reader.iter_pages(fpath)]
+			self.assertEqual(pages, ["Praha", "Karel Čapek"])
+			self.assertEqual(dump_reader.read_header(fpath), header)
+
+class SliceDumpTests(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.fpath = os.path.join(self.tmpdir.name, "dump.xml")
+		pages = "".join(f"  <page>\n    <title>Page {i}</title>\n  </page>\n" for i in range(100))
+		with open(self.fpath, "w", encoding="utf-8") as file:
+			file.write(DUMP.split("  <page>")[0] + pages + "</mediawiki>\n")
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def titles(self, **kwargs):
+		fpath = os.path.join(self.tmpdir.name, "slice.xml")
+		slice_dump.slice_dump(self.fpath, fpath, **kwargs)
+		return [page.find("title").text for _, page in dump_reader.iter_pages(fpath)]
+
+	def test_titles(self):
+		self.assertEqual(self.titles(titles={"Page 7", "Page 3", "Missing"}), ["Page 3", "Page 7"])
+
+	def test_sample(self):
+		sample = self.titles(sample=10, seed=1)
+		self.assertEqual(len(sample), 10)
+		# order of the dump, the same seed gives the same sample
+		self.assertEqual(sample, sorted(sample, key=lambda title: int(title.split()[1])))
+		self.assertEqual(sample, self.titles(sample=10, seed=1))
+		self.assertNotEqual(sample, self.titles(sample=10, seed=2))
+		self.assertEqual(len(self.titles(sample=1000)), 100)
+
+	def test_types_sample(self):
+		# pages with even numbers are persons, odd ones settlements
+		page_type = slice_dump.PageTyper.page_type
+		slice_dump.PageTyper.page_type = lambda typer, page: ("settlement", "person")[int(page.find("title").text.split()[1]) % 2 == 0]
+		try:
+			sample = self.titles(types={"person", "settlement"}, sample=10, seed=1)
+			self.assertEqual(len(sample), 10)
+			self.assertEqual(len(self.titles(types={"person"}, sample=10, seed=1)), 10)
+			quota = self.titles(types={"person", "settlement"}, quota={"person": 3, "settlement": 4})
+			self.assertEqual(len(quota), 7)
+		finally:
+			slice_dump.PageTyper.page_type = page_type
+
+	def test_reservoir(self):
+		import random
+		counts = [0] * 10
+		for seed in range(2000):
+			reservoir = slice_dump.Reservoir(2, random.Random(seed))
+			for i in range(10):
+				reservoir.add(i)
+			for i in reservoir.items:
+				counts[i] += 1
+		# each item is chosen with probability 2/10
+		for count in counts:
+			self.assertAlmostEqual(count / 2000, 0.2, delta=0.04)
+
+if __name__ == "__main__":
+	unittest.main()
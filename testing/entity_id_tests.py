@@ -0,0 +1,48 @@
+import unittest, os, sys, inspect, tempfile
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import entity_id
+from entity_id import EntityIds
+
+LINK = "https://en.wikipedia.org/wiki/Brno"
+
+def row(eid, link=LINK):
+	return f"{eid}\tsettlement\tBrno\t\t\t\tBrno\t\t{link}\tCzech Republic\t\t\t\t\t\t\t\t\t\t"
+
+class EntityIdTests(unittest.TestCase):
+
+	def test_entity_id(self):
+		eid = entity_id.entity_id(LINK)
+		self.assertEqual(len(eid), entity_id.ID_LENGTH)
+		self.assertEqual(eid, entity_id.entity_id(LINK))
+		self.assertNotEqual(eid, entity_id.entity_id("https://cs.wikipedia.org/wiki/Brno"))
+		self.assertNotEqual(eid, entity_id.entity_id(LINK, 1))
+
+	def test_collision(self):
+		ids = EntityIds()
+		eid = entity_id.entity_id(LINK)
+		self.assertEqual(ids.assign(row(eid)), row(eid))
+		self.assertEqual(ids.collisions, 0)
+
+		# another page with the same ID gets the first unused salted ID
+		other = "https://en.wikipedia.org/wiki/Other"
+		ids.ids.add(int(entity_id.entity_id(other, 1), 16))
+		self.assertEqual(ids.assign(row(eid, other)), row(entity_id.entity_id(other, 2), other))
+		self.assertEqual(ids.collisions, 1)
+
+	def test_read(self):
+		with tempfile.TemporaryDirectory() as tmpdir:
+			fpath = os.path.join(tmpdir, "kb")
+			eid = entity_id.entity_id(LINK)
+			with open(fpath, "w", encoding="utf-8") as file:
+				file.write(row(eid) + "\n")
+			ids = EntityIds()
+			ids.read(fpath)
+			self.assertNotEqual(ids.assign(row(eid)), row(eid))
+			self.assertEqual(ids.collisions, 1)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,51 @@
+import unittest, os, sys, inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import estimate
+from estimate import Estimator
+
+class EstimatorTests(unittest.TestCase):
+
+	def estimator(self):
+		estimator = Estimator(None)
+		estimator.pages = 100000
+		estimator.sample_pages = 1000
+		estimator.entity_pages = 500
+		estimator.main_seconds = 1.0
+		estimator.worker_seconds = 8.0
+		estimator.page_bytes = 500 * 1024
+		estimator.tables_seconds = 30.0
+		estimator.tables_kb = 1000000
+		estimator.main_kb = 50000
+		estimator.worker_kb = 40000
+		estimator.worker_growth_kb = 10000
+		estimator.worker_copy_ratio = 0.1
+		return estimator
+
+	def test_estimate(self):
+		estimator = self.estimator()
+		cpu_count = os.cpu_count
+		os.cpu_count = lambda: 4
+		try:
+			# tables + main + workers / min(workers, CPUs)
+			self.assertEqual(estimator.estimate(1)[0], 30 + 100 + 800)
+			self.assertEqual(estimator.estimate(4)[0], 30 + 100 + 200)
+			self.assertEqual(estimator.estimate(8)[0], 30 + 100 + 200)
+		finally:
+			os.cpu_count = cpu_count
+
+		# main process (modules, tables, 2 x batch of 1 kB pages) + workers (base, growth, copied tables)
+		main_kb = 50000 + 1000000 + 2 * estimate.BATCH_SIZE
+		self.assertEqual(estimator.estimate(1)[1], main_kb + 150000)
+		self.assertEqual(estimator.estimate(4)[1], main_kb + 4 * 150000)
+
+	def test_default_workers(self):
+		workers = estimate.default_workers()
+		self.assertEqual(workers[0], 1)
+		self.assertEqual(workers[-1], os.cpu_count())
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,102 @@
+import unittest, os, sys, inspect, tempfile
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import incremental
+from entity_id import entity_id
+from kb_schema import KB_SCHEMA, METRICS_COLUMNS, KbRowError
+from page_index import PageIndex
+
+def write_dump(fpath, pages):
+	with open(fpath, "w", encoding="utf-8") as file:
+		file.write("<mediawiki>\n  <siteinfo></siteinfo>\n")
+		for page_id, title, sha1 in pages:
+			file.write(
+				f"  <page>\n    <title>{title}</title>\n    <ns>0</ns>\n    <id>{page_id}</id>\n"
+				f"    <revision><id>1</id><text>text</text><sha1>{sha1}</sha1></revision>\n  </page>\n"
+			)
+		file.write("</mediawiki>\n")
+
+def kb_row(eid, title, redirects=""):
+	link = "https://en.wikipedia.org/wiki/" + title.replace(" ", "_")
+	eid = eid or entity_id(link)
+	return KB_SCHEMA.serialize("event", [eid, "event", title, "", redirects, "", title, "", link, "", "", "", ""]) + "\n"
+
+class IncrementalTests(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.previous = self.index("previous.xml", [(1, "A", "a"), (2, "B", "b"), (3, "C", "c"), (4, "D", "d"), (5, "E", "e")])
+		# B changed, C removed, D renamed to D2, F added
+		self.current = self.index("current.xml", [(1, "A", "a"), (2, "B", "b2"), (4, "D2", "d"), (5, "E", "e"), (6, "F", "f")])
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def index(self, fname, pages):
+		fpath = os.path.join(self.tmpdir.name, fname)
+		write_dump(fpath, pages)
+		return PageIndex.build(fpath)
+
+	def write_kb(self, fname, rows):
+		fpath = os.path.join(self.tmpdir.name, fname)
+		with open(fpath, "w", encoding="utf-8") as file:
+			file.writelines(rows)
+		return fpath
+
+	def test_diff_indexes(self):
+		changes = incremental.diff_indexes(self.previous, self.current)
+		self.assertEqual(changes.counters(), {"added": 1, "changed": 2, "removed": 1, "redirected": 0})
+		self.assertEqual(changes.positions, {1, 2, 4})
+		self.assertEqual(changes.stale, {"B", "C", "D"})
+
+	def test_diff_redirects(self):
+		kb_fpath = self.write_kb("kb", [kb_row("1", "A", "A1|A2"), kb_row("5", "E", "E1")])
+		changes = incremental.diff_indexes(self.previous, self.current)
+		redirects = {"https://en.wikipedia.org/wiki/A": ["A2", "A1"], "https://en.wikipedia.org/wiki/E": ["E1", "E2"]}
+		incremental.diff_redirects(kb_fpath, self.current, changes, redirects)
+		self.assertEqual(changes.redirected, 1)
+		self.assertIn(3, changes.positions)
+		self.assertIn("E", changes.stale)
+		self.assertNotIn("A", changes.stale)
+
+	def test_merge(self):
+		# previous KB with filled metrics columns (KBstatsMetrics.all) and IDs of an older release
+		previous = [kb_row(str(i), title)[:-len(METRICS_COLUMNS) - 1] + "\t1" * len(METRICS_COLUMNS) + "\n" for i, title in enumerate(["A", "B", "C", "D", "E"])]
+		previous_fpath = self.write_kb("KBstatsMetrics.all", previous)
+		delta_fpath = self.write_kb("kb.delta", [kb_row("x", "B"), kb_row("y", "D2"), kb_row("z", "F")])
+		output_fpath = os.path.join(self.tmpdir.name, "kb")
+
+		changes = incremental.diff_indexes(self.previous, self.current)
+		self.assertEqual(incremental.merge_kb(previous_fpath, delta_fpath, output_fpath, self.current, changes.stale), (2, 3))
+		with open(output_fpath, "r", encoding="utf-8") as file:
+			rows = file.readlines()
+		self.assertEqual(rows, [kb_row(None, title) for title in ["A", "B", "D2", "E", "F"]])
+
+	def test_merge_old_kb(self):
+		# "kb" of an older release - without metrics columns and with rows of unclassified pages
+		previous = [kb_row(str(i), title)[:-len(METRICS_COLUMNS) - 1] + "\n" for i, title in enumerate(["A", "B", "C", "D", "E"])]
+		previous.insert(1, "u\tgeo:unknown\tU\t\t\t\tU\t\thttps://en.wikipedia.org/wiki/U\t\t\t\t\t\t\t\t\t\n")
+		previous_fpath = self.write_kb("kb.previous", previous)
+		delta_fpath = self.write_kb("kb.delta", [kb_row("x", "B"), kb_row("y", "D2"), kb_row("z", "F")])
+		output_fpath = os.path.join(self.tmpdir.name, "kb")
+
+		changes = incremental.diff_indexes(self.previous, self.current)
+		self.assertEqual(incremental.merge_kb(previous_fpath, delta_fpath, output_fpath, self.current, changes.stale), (2, 3))
+		with open(output_fpath, "r", encoding="utf-8") as file:
+			self.assertEqual(file.readlines(), [kb_row(None, title) for title in ["A", "B", "D2", "E", "F"]])
+
+	def test_malformed_row(self):
+		# a row with a missing entity column
+		previous_fpath = self.write_kb("kb.previous", [kb_row("a", "A")[:-len(METRICS_COLUMNS) - 2] + "\n"])
+		delta_fpath = self.write_kb("kb.delta", [])
+		output_fpath = os.path.join(self.tmpdir.name, "kb")
+		with self.assertRaises(KbRowError):
+			incremental.merge_kb(previous_fpath, delta_fpath, output_fpath, self.current, set())
+		self.assertFalse(os.path.exists(output_fpath))
+		self.assertFalse(os.path.exists(output_fpath + ".tmp"))
+
+if __name__ == "__main__":
+	unittest.main()
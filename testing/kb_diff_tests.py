@@ -0,0 +1,85 @@
+import unittest, os, sys, inspect, tempfile
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import kb_diff
+from kb_schema import KB_SCHEMA
+
+def kb_row(title, aliases="", location=""):
+	link = "https://en.wikipedia.org/wiki/" + title.replace(" ", "_")
+	return KB_SCHEMA.serialize("event", [title.lower(), "event", title, aliases, "", "", title, "", link, "", "", location, ""]) + "\n"
+
+class KbDiffTests(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.head_fpath = self.write("HEAD-KB", KB_SCHEMA.head_lines())
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def write(self, fname, lines):
+		fpath = os.path.join(self.tmpdir.name, fname)
+		with open(fpath, "w", encoding="utf-8") as file:
+			file.writelines(lines)
+		return fpath
+
+	def diff(self, old_lines, new_lines, buffer_size=1024, ignore=()):
+		old_rows = kb_diff.open_kb(self.write("old", old_lines), self.head_fpath)
+		new_rows = kb_diff.open_kb(self.write("new", new_lines), self.head_fpath)
+		diff = kb_diff.KbDiff(old_rows, new_rows, ignore)
+		return list(diff.changes(self.tmpdir.name, buffer_size)), diff
+
+	def test_head(self):
+		head, start = kb_diff.read_head("", self.head_fpath)
+		self.assertEqual(start, 0)
+		self.assertEqual(head.type_column, 1)
+		self.assertEqual(len(head.names("event")), len(KB_SCHEMA.columns("event")))
+		self.assertEqual(head.names("event")[3], "ALIASES")
+		self.assertTrue(head.is_multi("event", "ALIASES"))
+		self.assertFalse(head.is_multi("event", "NAME"))
+		self.assertEqual(head.find_column(kb_diff.KEY_COLUMNS), "WIKIPEDIA LINK")
+
+	def test_generic_head(self):
+		fpath = self.write("KB.tsv", [
+			"VERSION=en_20240101-1\n",
+			"<__generic__>ID\tTYPE\t{m}ALIASES\t{u}WIKIPEDIA URL\n",
+			"<person>GENDER\n",
+			"<artist>{m}ART FORMS\n",
+			"<__stats__>WIKI HITS\n",
+			"\n",
+			"1\tperson+artist\ta|b\thttps://en.wikipedia.org/wiki/A\tM\tpainting\t10\n"
+		])
+		rows = kb_diff.open_kb(fpath)
+		self.assertEqual(rows.key, "WIKIPEDIA URL")
+		line = next(rows.lines())
+		self.assertEqual(rows.row_key(line), "https://en.wikipedia.org/wiki/A")
+		self.assertEqual(rows.values(line)[1]["ART FORMS"], "painting")
+		self.assertTrue(rows.head.is_multi("person+artist", "ART FORMS"))
+
+	def test_changes(self):
+		old = [kb_row("C"), kb_row("A", "x|y"), kb_row("B", location="Brno"), kb_row("D")]
+		new = [kb_row("E"), kb_row("B", location="Praha"), kb_row("A", "y|x|z"), kb_row("D")]
+		changes, diff = self.diff(old, new)
+		self.assertEqual([(change["change"], change["key"][-1]) for change in changes], [("changed", "A"), ("changed", "B"), ("removed", "C"), ("added", "E")])
+		self.assertEqual(changes[0]["columns"], {"ALIASES": {"added": ["z"], "removed": []}})
+		self.assertEqual(changes[1]["columns"], {"LOCATION": ["Brno", "Praha"]})
+		self.assertEqual(changes[3]["columns"]["NAME"], "E")
+		self.assertEqual(diff.counts["unchanged"], 1)
+
+		changes, _ = self.diff(old, new, ignore=["LOCATION"])
+		self.assertNotIn("B", [change["key"][-1] for change in changes])
+
+	def test_external_sort(self):
+		old = [kb_row(f"Page {i}") for i in range(100, 0, -1)]
+		new = [kb_row(f"Page {i}", location="X" if i % 10 == 0 else "") for i in range(1, 101)]
+		# every few rows are a sorted run
+		changes, diff = self.diff(old, new, buffer_size=500)
+		self.assertEqual(len(changes), 10)
+		self.assertEqual(diff.counts["unchanged"], 90)
+		self.assertEqual([change["key"] for change in changes], sorted(change["key"] for change in changes))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,97 @@
+import unittest, os, sys, inspect, tempfile
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import kb_reader
+from kb_reader import KbReader
+
+LINES = [
+	"a1\tperson\tAda\tŽena\n",
+	"b2\tcountry\tBrazil\t\n",
+	"c3\tperson\tCarl\tMuž\n",
+	"d4\tevent\tDay\t\n",
+	"e5\tperson\tEve"
+]
+
+class KbReaderTests(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.kb_fpath = os.path.join(self.tmpdir.name, "kb")
+		with open(self.kb_fpath, "w", encoding="utf-8") as file:
+			file.writelines(LINES)
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def test_rows(self):
+		with KbReader(self.kb_fpath) as reader:
+			self.assertTrue(reader.index_built)
+			self.assertEqual(len(reader), 5)
+			self.assertEqual(reader.line(0), "a1\tperson\tAda\tŽena")
+			self.assertEqual(reader[-1].line, "e5\tperson\tEve")
+			self.assertRaises(IndexError, reader.__getitem__, 5)
+			self.assertEqual([row[0] for row in reader], ["a1", "b2", "c3", "d4", "e5"])
+			self.assertEqual(reader.type_counts(), {"person": 3, "country": 1, "event": 1})
+
+	def test_row(self):
+		row = kb_reader.KbRow("a1\tperson\tAda\tŽena")
+		self.assertEqual(row.type, "person")
+		self.assertEqual(row.column(7), "")
+		self.assertIsNone(row._columns)
+		self.assertEqual(row[-1], "Žena")
+		self.assertEqual(len(row), 4)
+		self.assertEqual(row[2], "Ada")
+
+	def test_types(self):
+		with KbReader(self.kb_fpath) as reader:
+			self.assertEqual([row for row, _ in reader.rows(["person"])], [0, 2, 4])
+			self.assertEqual([columns[2] for _, columns in reader.rows(["event", "country", "unknown"])], ["Brazil", "Day"])
+			self.assertEqual(len(list(reader.rows())), 5)
+
+	def test_index(self):
+		KbReader(self.kb_fpath).close()
+		self.assertTrue(os.path.exists(self.kb_fpath + kb_reader.INDEX_SUFFIX))
+		with KbReader(self.kb_fpath) as reader:
+			self.assertFalse(reader.index_built)
+			self.assertEqual(reader.line(3), "d4\tevent\tDay\t")
+			self.assertEqual(reader.type_counts()["person"], 3)
+
+		# an index kept in memory only
+		os.remove(self.kb_fpath + kb_reader.INDEX_SUFFIX)
+		with KbReader(self.kb_fpath, save_index=False) as reader:
+			self.assertTrue(reader.index_built)
+			self.assertEqual(len(reader), 5)
+		self.assertFalse(os.path.exists(self.kb_fpath + kb_reader.INDEX_SUFFIX))
+
+		# a changed KB invalidates the index
+		with open(self.kb_fpath, "a", encoding="utf-8") as file:
+			file.write("\tf6\tevent\n")
+		with KbReader(self.kb_fpath) as reader:
+			self.assertTrue(reader.index_built)
+			self.assertEqual(len(reader), 5)
+			self.assertEqual(reader.line(4), "e5\tperson\tEve\tf6\tevent")
+
+	def test_chunks(self):
+		with KbReader(self.kb_fpath) as reader:
+			size = os.path.getsize(self.kb_fpath)
+			for chunk_size in (1, 10, 30, size + 1):
+				chunks = reader.chunks(chunk_size)
+				self.assertEqual(chunks[0][0], 0)
+				self.assertEqual(chunks[-1][1], size)
+				for (_, end), (start, _) in zip(chunks, chunks[1:]):
+					self.assertEqual(end, start)
+					self.assertIn(end, list(reader.offsets))
+			self.assertEqual(len(reader.chunks(1)), 5)
+
+	def test_empty(self):
+		open(self.kb_fpath, "w").close()
+		with KbReader(self.kb_fpath) as reader:
+			self.assertEqual(len(reader), 0)
+			self.assertEqual(list(reader), [])
+			self.assertEqual(reader.chunks(10), [])
+
+if __name__ == "__main__":
+	unittest.main()
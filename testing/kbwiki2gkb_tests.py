@@ -0,0 +1,84 @@
+import unittest, io, os, sys, inspect, tempfile
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import kbwiki2gkb
+from kb_schema import KB_SCHEMA
+
+METRICS = ["12", "340", "1", "0.50", "98.15", "16.36"]
+
+def kb_row(prefix, eid, name, values):
+	link = "https://en.wikipedia.org/wiki/" + name.replace(" ", "_")
+	row = KB_SCHEMA.serialize(prefix, [eid, prefix, name, name[0], name + " redirect", name + " description", name + " (x)", eid + ".jpg", link] + values)
+	return row[:-len(KB_SCHEMA.metrics_suffix)] + "\t" + "\t".join(METRICS)
+
+def generic_row(eid, types, name, roles, fictional, values):
+	link = "https://en.wikipedia.org/wiki/" + name.replace(" ", "_")
+	return "\t".join([eid, types, name, name + " (x)", name[0], name + " description", roles, fictional, link, "", "", eid + ".jpg"] + values + METRICS) + "\n"
+
+KB = [
+	kb_row("person", "p1", "Karel Capek", ["M", "1890-01-09", "Svatonovice", "1938-12-25", "Prague", "writer|journalist", "Czech"]),
+	kb_row("person:artist", "a1", "Alfons Mucha", ["M", "1860-07-24", "Ivancice", "1939-07-14", "Prague", "painter", "Czech", "painting|poster", "Boldini", "", "500024372", "http://mucha.org"]),
+	kb_row("person:fictional", "f1", "Josef Svejk", ["M", "", "Prague", "", "", "soldier", "Czech"]),
+	kb_row("person:group", "g1", "Brothers Capek", ["M|M", "1887|1890", "", "1945|1938", "", "writers", "Czech"]),
+	kb_row("geo:relief", "r1", "Snezka", ["Europe", "50.73", "15.74"]),
+	kb_row("organisation", "o1", "Skoda Auto", ["1895", "", "company", "Mlada Boleslav"]),
+]
+
+GENERIC_KB = [
+	generic_row("p1", "person", "Karel Capek", "writer|journalist", "0", ["M", "1890-01-09", "Svatonovice", "1938-12-25", "Prague", "Czech"]),
+	# roles are taken from JOBS of persons only, not of artists
+	generic_row("a1", "person+artist", "Alfons Mucha", "", "0", ["M", "1860-07-24", "Ivancice", "1939-07-14", "Prague", "Czech", "", "", "", "", ""]),
+	generic_row("f1", "person", "Josef Svejk", "soldier", "1", ["M", "", "Prague", "", "", "Czech"]),
+	# group has no roles and no fictional flag, its NATIONALITY column is not converted
+	generic_row("g1", "group", "Brothers Capek", "", "", ["", "M|M", "1887|1890", "", "1945|1938", "", ""]),
+	generic_row("r1", "geographical", "Snezka", "", "", ["50.73", "15.74", "relief", "", "", "", "", "", "", ""]),
+	# organisation columns have no mapping to columns of the wikipedia format
+	generic_row("o1", "organisation", "Skoda Auto", "", "", ["", "", "", ""]),
+]
+
+class KbWiki2GkbTests(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.head_fpath = os.path.join(self.tmpdir.name, "HEAD-KB")
+		KB_SCHEMA.write_head(self.head_fpath)
+		self.kb_fpath = os.path.join(self.tmpdir.name, "KBstatsMetrics.all")
+		# the last line without a trailing newline
+		with open(self.kb_fpath, "w", encoding="utf-8") as file:
+			file.write("\n".join(KB))
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def transform(self, **kwargs):
+		fout = io.StringIO()
+		kbwiki2gkb.transform_data(self.head_fpath, self.kb_fpath, fout, **kwargs)
+		return fout.getvalue()
+
+	def test_conversion(self):
+		in_columns, col_type = kbwiki2gkb.load_head(self.head_fpath)
+		self.assertEqual(col_type, 1)
+		converter = kbwiki2gkb.Converter(in_columns, col_type)
+		for row, wanted in zip(KB, GENERIC_KB):
+			self.assertEqual(converter.convert_lines([row]), wanted)
+			# the row has all columns of the generic head of its types
+			types = [kbwiki2gkb.COLTYPE_GENERIC] + wanted.split("\t")[1].split("+") + [kbwiki2gkb.COLTYPE_STATS]
+			self.assertEqual(wanted.count("\t") + 1, sum(len(kbwiki2gkb.MAP_TYPES_COLUMNS[t]) for t in types))
+		self.assertRaises(KeyError, converter.convert_lines, ["x1\tunknown"])
+
+	def test_transform(self):
+		self.assertEqual(self.transform(), "".join(GENERIC_KB))
+
+	def test_transform_pool(self):
+		size = os.path.getsize(self.kb_fpath)
+		for chunk_size in (1, 50, size):
+			chunks = kbwiki2gkb.split_chunks(self.kb_fpath, chunk_size)
+			self.assertEqual(chunks[-1][1], size)
+			self.assertEqual(self.transform(processes=2, chunk_size=chunk_size), "".join(GENERIC_KB))
+		self.assertEqual(len(kbwiki2gkb.split_chunks(self.kb_fpath, 1)), len(KB))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,105 @@
+import unittest, os, sys, inspect, tempfile, shutil, numpy
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, os.path.join(parentdir, "metrics"))
+
+import metrics_knowledge_base
+import wiki_stats_join
+
+HEAD_KB = [
+	"<person>ID\tTYPE\tNAME\tDESCRIPTION\t{ui}WIKIPEDIA LINK\tGENDER\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE",
+	"<country>ID\tTYPE\tNAME\tDESCRIPTION\t{ui}WIKIPEDIA LINK\tPOPULATION\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE"
+]
+
+KB = [
+	"p1\tperson\tA\tshort\thttps://cs.wikipedia.org/wiki/A\tM\t10\t100\t1\t\t\t",
+	"p2\tperson\tB\ta longer description\thttps://cs.wikipedia.org/wiki/B\t\t3\t7000\t0\t\t\t",
+	"p3\tperson\tC\t\thttps://cs.wikipedia.org/wiki/C\tF\t\t\t\t\t\t",
+	"c1\tcountry\tD\tdescription\thttps://cs.wikipedia.org/wiki/D\t1000\t0\t0\t0\t\t\t",
+	"c2\tcountry\tE\t\t\t\t\t\t\t\t\t"
+]
+
+class MetricsTests(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpdir = tempfile.mkdtemp()
+		self.head_kb = os.path.join(self.tmpdir, "HEAD-KB")
+		self.kb = os.path.join(self.tmpdir, "kb")
+		with open(self.head_kb, "w") as f:
+			f.write("\n".join(HEAD_KB) + "\n")
+		with open(self.kb, "w") as f:
+			f.write("\n".join(KB) + "\n")
+
+	def tearDown(self):
+		shutil.rmtree(self.tmpdir)
+
+	# reference computation of scores with percentile indexes (one line at a time)
+	def reference_scores(self, kb, columns):
+		score_wiki = 0
+		if kb.get_wiki_value(columns, "backlinks"):
+			score_wiki = 100 * numpy.average([
+				kb.metric_percentile(columns, "wiki_backlinks"),
+				kb.metric_percentile(columns, "wiki_hits"),
+				kb.metric_percentile(columns, "wiki_ps")
+			], weights=[5, 5, 1])
+		score_metrics = 100 * numpy.average([
+			kb.metric_percentile(columns, "description_length"),
+			kb.metric_percentile(columns, "columns_number")
+		])
+		confidence = numpy.average([score_wiki, score_metrics], weights=[5, 1])
+		return ["%.2f" % score_wiki, "%.2f" % score_metrics, "%.2f" % confidence]
+
+	def test_insert_metrics(self):
+		kb = metrics_knowledge_base.KnowledgeBase(path_to_headkb=self.head_kb, path_to_kb=self.kb)
+		kb.insert_metrics()
+
+		self.assertEqual(list(kb.metrics["person"]["wiki_hits"]), [100, 7000])
+		self.assertEqual(kb.metric_index["person"]["wiki_hits"][100], 100 / (0.25 * 7000))
+		self.assertEqual(kb.metric_index["country"]["wiki_backlinks"][0], 1.0)
+
+		for columns in kb.lines:
+			self.assertEqual(columns[-3:], self.reference_scores(kb, columns))
+
+		self.assertEqual(kb.lines[2][-3:], ["0.00", "41.67", "6.94"])
+
+	def test_column_plan(self):
+		kb = metrics_knowledge_base.KnowledgeBase(path_to_headkb=self.head_kb, path_to_kb=self.kb)
+		columns = KB[3].split("\t")
+		plan = kb.get_plan(columns)
+
+		self.assertIs(plan, kb.get_type_plan("country"))
+		self.assertEqual(plan.width, 12)
+		self.assertTrue(plan.has_metrics)
+		self.assertEqual(plan.stats_cols, (6, 7, 8))
+		self.assertEqual(plan.score_cols, (9, 10, 11))
+		self.assertEqual(plan.get(columns, "POPULATION"), "1000")
+		self.assertEqual(plan.col("POPULATION"), kb.get_col_for(columns, "POPULATION"))
+		self.assertEqual(list(plan.head), kb.get_ent_head(columns))
+		self.assertEqual(plan.nonempty_columns(columns), 6)
+		self.assertRaises(RuntimeError, plan.col, "GENDER")
+
+	def test_wiki_stats_join(self):
+		stats_path = os.path.join(self.tmpdir, "wiki_stats")
+		with open(stats_path, "w") as f:
+			f.write("A\t10\t100\t1\nB\t3\t7000\t0\nČapek\t1\t2\t1\n")
+		version_path = os.path.join(self.tmpdir, "VERSION")
+		with open(version_path, "w") as f:
+			f.write("en_20221001-1664600000")
+
+		self.assertEqual(wiki_stats_join.get_wiki_url_prefix(version_path), "https://en.wikipedia.org/wiki/")
+
+		with wiki_stats_join.IndexedWikiStats(stats_path) as wiki_stats:
+			self.assertEqual(len(wiki_stats), 3)
+			self.assertEqual(wiki_stats.get("Čapek"), ["1", "2", "1"])
+			self.assertEqual(wiki_stats.get("B"), ["3", "7000", "0"])
+			self.assertIsNone(wiki_stats.get("C"))
+
+		joined = wiki_stats_join.merge_join([("A", 1), ("", 2), ("C", 3), ("Čapek", 4)], stats_path)
+		self.assertEqual(list(joined), [(1, ["10", "100", "1"]), (2, None), (3, None), (4, ["1", "2", "1"])])
+
+		joined = wiki_stats_join.merge_join([("B", 1), ("A", 2)], stats_path)
+		self.assertRaises(ValueError, list, joined)
+
+if __name__ == "__main__":
+	unittest.main()
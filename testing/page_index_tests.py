@@ -0,0 +1,72 @@
+import unittest, os, sys, inspect, tempfile, time
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import dump_reader
+import page_index
+from page_index import PageIndex
+
+def write_dump(fpath, count):
+	with open(fpath, "w", encoding="utf-8") as file:
+		file.write("<mediawiki>\n  <siteinfo></siteinfo>\n")
+		for i in range(count):
+			file.write(
+				f"  <page>\n    <title>Page {i} &amp; &quot;{chr(0x10c)}&quot;</title>\n    <ns>{i % 2}</ns>\n    <id>{1000 - i}</id>\n"
+				f"    <revision><id>{i}</id><text>{'x' * i}</text><sha1>sha{i}</sha1></revision>\n  </page>\n"
+			)
+		file.write("</mediawiki>\n")
+
+class PageIndexTests(unittest.TestCase):
+
+	def setUp(self):
+		self.tmpdir = tempfile.TemporaryDirectory()
+		self.fpath = os.path.join(self.tmpdir.name, "dump.xml")
+		write_dump(self.fpath, 50)
+
+	def tearDown(self):
+		self.tmpdir.cleanup()
+
+	def test_build(self):
+		index = PageIndex.build(self.fpath)
+		self.assertEqual(len(index), 50)
+		self.assertEqual(list(index.offsets), [offset for offset, _ in dump_reader.iter_raw_pages(self.fpath)])
+		pages = [page.find("title").text for _, page in index.iter_pages(self.fpath, [3, 17, 49])]
+		self.assertEqual(pages, ["Page 3 & \"Č\"", "Page 17 & \"Č\"", "Page 49 & \"Č\""])
+
+	def test_records(self):
+		page_index.get_page_index(self.fpath)
+		for index in [PageIndex.build(self.fpath), page_index.get_page_index(self.fpath)[0]]:
+			offsets = [offset for offset, _ in dump_reader.iter_raw_pages(self.fpath)]
+			record = index.record(17)
+			self.assertEqual(record, (983, "Page 17 & \"Č\"", 1, offsets[17], offsets[18] - offsets[17] - 3, "sha17"))
+			self.assertEqual(index.find_title("Page 17 & \"Č\""), 17)
+			self.assertEqual(index.find_page_id(983), 17)
+			for position in range(50):
+				self.assertEqual(index.find_title(index.title(position)), position)
+				self.assertEqual(index.find_page_id(1000 - position), position)
+			self.assertIsNone(index.find_title("Page 17"))
+			self.assertIsNone(index.find_title("Z"))
+			self.assertIsNone(index.find_page_id(5))
+			index.close()
+
+	def test_reuse(self):
+		index, built = page_index.get_page_index(self.fpath)
+		self.assertTrue(built)
+		self.assertTrue(os.path.exists(self.fpath + page_index.INDEX_SUFFIX))
+		loaded, built = page_index.get_page_index(self.fpath)
+		self.assertFalse(built)
+		self.assertEqual(loaded.offsets, index.offsets)
+		self.assertEqual(loaded.lengths, index.lengths)
+
+	def test_stale(self):
+		page_index.get_page_index(self.fpath)
+		time.sleep(0.01)
+		write_dump(self.fpath, 10)
+		index, built = page_index.get_page_index(self.fpath)
+		self.assertTrue(built)
+		self.assertEqual(len(index), 10)
+
+if __name__ == "__main__":
+	unittest.main()
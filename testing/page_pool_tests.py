@@ -0,0 +1,81 @@
+import unittest, os, sys, inspect, signal, time
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+import page_pool
+from page_pool import PagePool, PageTimeout, time_budget
+
+# page is a number of seconds to sleep, negative number blocks the timer signal (page stuck in C code)
+def process(page):
+	try:
+		with time_budget(0.5):
+			if page < 0:
+				signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGALRM])
+			time.sleep(abs(page))
+			return f"done {page}"
+	except PageTimeout:
+		return f"timeout {page}"
+
+def pid(page):
+	return os.getpid()
+
+class PagePoolTests(unittest.TestCase):
+
+	def setUp(self):
+		self.grace = page_pool.WATCHDOG_GRACE
+		page_pool.WATCHDOG_GRACE = 0.5
+
+	def tearDown(self):
+		page_pool.WATCHDOG_GRACE = self.grace
+
+	def test_soft_timeout(self):
+		with PagePool(2, page_timeout=0.5) as pool:
+			results = pool.map(process, [0, 2, 0.1, 0], on_timeout=lambda page: f"abandoned {page}")
+		self.assertEqual(results, ["done 0", "timeout 2", "done 0.1", "done 0"])
+		self.assertEqual(pool.recycled, 0)
+
+	def test_watchdog(self):
+		with PagePool(2, page_timeout=0.5) as pool:
+			results = pool.map(process, [0, -30, 0.1, 0, 2, 0], on_timeout=lambda page: f"abandoned {page}")
+		self.assertEqual(results, ["done 0", "abandoned -30", "done 0.1", "done 0", "timeout 2", "done 0"])
+		self.assertEqual(pool.recycled, 1)
+
+	def test_persistent(self):
+		with PagePool(1) as pool:
+			first = pool.map(pid, [0, 0], on_timeout=None)
+			second = pool.map(pid, [0], on_timeout=None)
+		self.assertEqual(len(set(first + second)), 1)
+
+	def test_maxtasksperchild(self):
+		with PagePool(1, maxtasksperchild=2) as pool:
+			pids = pool.map(pid, [0, 0, 0, 0, 0], on_timeout=None)
+		self.assertEqual([len(set(pids[i:i + 2])) for i in range(0, 5, 2)], [1, 1, 1])
+		self.assertEqual(len(set(pids)), 3)
+
+	def test_broadcast(self):
+		with PagePool(3) as pool:
+			self.assertEqual(pool.broadcast(os.getpid), [])
+			pids = pool.map(pid, [0, 0, 0, 0, 0, 0], on_timeout=None)
+			broadcast = pool.broadcast(os.getpid)
+		self.assertEqual(len(set(broadcast)), 3)
+		self.assertLessEqual(set(pids), set(broadcast))
+
+		with PagePool(2, maxtasksperchild=1) as pool:
+			pool.map(pid, [0], on_timeout=None)
+			self.assertEqual(len(set(pool.broadcast(os.getpid))), 2)
+
+	def test_recycle(self):
+		with PagePool(1) as pool:
+			first = pool.map(pid, [0], on_timeout=None)
+			pool.recycle()
+			second = pool.map(pid, [0], on_timeout=None)
+			pool.resize(2)
+			third = pool.map(pid, [0], on_timeout=None)
+		self.assertNotEqual(first, second)
+		self.assertNotIn(third[0], first + second)
+		self.assertEqual(pool.processes, 2)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -26,12 +26,9 @@
 # @author created by Jan Kapsa (xkapsa00)
 # @date 26.07.2022
 
-import os, re, argparse, time, json, sys
-from debugger import Debugger as debug
-import xml.etree.cElementTree as CElTree
+import os, re, argparse, time, json, sys, random
+from debugger import Debugger as debug, ProgressReporter
 from datetime import datetime
-from multiprocessing import Pool
-from itertools import repeat
 from collections import Counter
 import mwparserfromhell as parser
 from ent_person import EntPerson
@@ -44,6 +41,20 @@ from ent_organisation import EntOrganisation
 from ent_event import EntEvent
 from lang_modules.en.core_utils import CoreUtils as EnCoreUtils
 from lang_modules.cs.core_utils import CoreUtils as CsCoreUtils
+from kb_schema import KB_SCHEMA, UNCLASSIFIED_PREFIXES, KbRowError
+from entity_id import EntityIds
+from quarantine import QUARANTINE_FPATH, Quarantine, QuarantinedPage, read_quarantine, traceback_digest, describe_error
+import dump_reader
+import page_index
+import incremental
+from page_pool import PagePool, PageTimeout, time_budget
+from stage_timer import STAGE_TIMER
+from telemetry import RETRY_TELEMETRY_FNAME, TELEMETRY, TELEMETRY_FNAME, RunTelemetry
+import sampling_profiler
+import pattern_profiler
+import mem_profiler
+from autotune import AutoTuner, BatchStats, available_memory_kb
+import tracemalloc
 
 LANG_MAP = {"cz": "cs"}
 
@@ -54,6 +65,107 @@ utils = {
 
 PAGES_DUMP_FPATH = '{}wiki-{}-pages-articles.xml'
 
+# rows of reprocessed pages of an incremental build (merged into "kb" at the end of the run)
+INCREMENTAL_DELTA_FPATH = "kb.delta"
+
+# default time budget of a page (seconds)
+PAGE_TIMEOUT = 60
+
+# entity type -> entity class
+ENTITY_CLASSES = {
+	"person":       EntPerson,
+	"country":      EntCountry,
+	"settlement":   EntSettlement,
+	"waterarea":    EntWaterArea,
+	"watercourse":  EntWaterCourse,
+	"geo":          EntGeo,
+	"organisation": EntOrganisation,
+	"event":        EntEvent
+}
+
+# default number of pages processed by a worker before it is replaced by a new one (caps growth of its memory)
+RECYCLE_PAGES = 10000
+
+# state of a pool worker (set by init_worker)
+_worker_extractor = None
+_worker_args = None
+_worker_page_timeout = None
+_worker_report_rss = False
+_worker_check_rss = False
+# tasks of the worker and the number of tasks after which it is replaced (--recycle-pages)
+_worker_tasks = 0
+_worker_max_tasks = None
+
+##
+# @brief initializes a pool worker (WikiExtract instance and loaded data are shared by all pages)
+def init_worker(extractor, langmap, patterns, keywords):
+	global _worker_extractor, _worker_args, _worker_page_timeout, _worker_report_rss, _worker_check_rss, _worker_max_tasks
+	_worker_extractor = extractor
+	_worker_args = (langmap, patterns, keywords)
+	_worker_page_timeout = extractor.console_args.page_timeout
+	_worker_report_rss = bool(extractor.console_args.mem_profile or extractor.console_args.autotune)
+	_worker_check_rss = bool(extractor.console_args.recycle_rss)
+	_worker_max_tasks = extractor.console_args.recycle_pages or None
+
+	# tracing of allocations of the main process is inherited by forked workers
+	if tracemalloc.is_tracing():
+		tracemalloc.stop()
+
+	if extractor.console_args.profile_sample:
+		sampling_profiler.start_worker_profiler(extractor.console_args.profile_sample)
+	if extractor.console_args.profile_patterns:
+		pattern_profiler.enable(sampling_profiler.PROFILE_DIR)
+
+##
+# @brief processes a page in a pool worker within the time budget
+# @param page - tuple (byte offset of the page in the dump, tuple with entity data (title, page content, ...))
+# @return tuple (result of WikiExtract.process_entity or QuarantinedPage if processing of the page failed,
+# telemetry snapshot of the worker or None if it is not due, see worker_snapshot)
+#
+# failure of a page (time budget exceeded, invalid KB row or an exception) does not affect other pages
+def process_page(page):
+	offset, ent_data = page
+	title, content = ent_data[0], ent_data[1]
+	with STAGE_TIMER.measure("page"):
+		try:
+			with time_budget(_worker_page_timeout):
+				result = _worker_extractor.process_entity(ent_data, *_worker_args)
+		except PageTimeout:
+			result = timed_out_page(page, _worker_page_timeout)
+		except KbRowError as e:
+			result = QuarantinedPage(title, offset, len(content.encode("utf-8")), "bad_row", "", str(e))
+		except Exception as e:
+			result = QuarantinedPage(title, offset, len(content.encode("utf-8")), "error", traceback_digest(e), describe_error(e))
+	if _worker_report_rss:
+		TELEMETRY.observe("worker_peak_rss_kb", str(os.getpid()), mem_profiler.peak_rss_kb())
+	if _worker_check_rss:
+		TELEMETRY.observe("worker_rss_kb", str(os.getpid()), mem_profiler.current_rss_kb())
+	return result, worker_snapshot(TELEMETRY.tick())
+
+##
+# @brief returns the telemetry snapshot of the worker if it is due, None otherwise
+# @param due - snapshot is due (Telemetry.tick)
+#
+# the snapshot is always shipped with the last task of a worker before it is replaced (--recycle-pages)
+def worker_snapshot(due):
+	global _worker_tasks
+	_worker_tasks += 1
+	if due or (_worker_max_tasks and _worker_tasks % _worker_max_tasks == 0):
+		return TELEMETRY.pop()
+	return None
+
+##
+# @brief returns the telemetry snapshot of the worker (run in every worker by PagePool.broadcast at the end of a batch)
+def flush_telemetry():
+	return worker_snapshot(True)
+
+##
+# @brief returns QuarantinedPage of a page that exceeded the time budget
+def timed_out_page(page, page_timeout):
+	offset, ent_data = page
+	title, content = ent_data[0], ent_data[1]
+	return QuarantinedPage(title, offset, len(content.encode("utf-8")), "timeout", "", f"exceeded time budget of {page_timeout} s")
+
 ##
 # @class WikiExtract
 # @brief main class of the project, one istance is created to execute the main functions
@@ -64,10 +176,20 @@ class WikiExtract(object):
 		self.console_args = None
 		self.dump = None
 		self.tracker = debug()
+		# counters and stage times of the run (merged from workers)
+		self.telemetry = RunTelemetry()
+		# controller of the number of workers and the batch size (--autotune)
+		self.autotuner = None
+		# profilers of the main process (see start_profiler)
+		self.profiler = None
+		self.mem_profiler = None
+		# IDs of written entities (collision detection, see entity_id.py)
+		self.entity_ids = EntityIds()
 
 	##
 	# @brief parses the console arguments
-	def parse_args(self):
+	# @param args - array of arguments (None = arguments of the command line)
+	def parse_args(self, args=None):
 		parser = argparse.ArgumentParser()
 		parser.add_argument(
 			"-I",
@@ -96,6 +218,54 @@ class WikiExtract(object):
 			type=int,
 			help="Number of processors of multiprocessing.Pool() for entity processing.",
 		)
+		parser.add_argument(
+			"--page-timeout",
+			default=PAGE_TIMEOUT,
+			type=float,
+			help="Time budget of a page in seconds, pages exceeding it are quarantined (0 = no limit; default: %(default)s).",
+		)
+		parser.add_argument(
+			"--recycle-pages",
+			default=RECYCLE_PAGES,
+			type=int,
+			help="Number of pages processed by a worker before it is replaced by a new one (0 = never; default: %(default)s).",
+		)
+		parser.add_argument(
+			"--recycle-rss",
+			type=int,
+			help="Replace all workers after a batch in which RSS of a worker passed the given number of MB.",
+		)
+		parser.add_argument(
+			"--profile-sample",
+			nargs="?",
+			type=int,
+			const=sampling_profiler.PROFILE_RATE,
+			default=None,
+			help=f"Sample Python stacks of all processes at the given rate (samples per second; default %(const)s) and write collapsed stacks for flame graphs into the \"{sampling_profiler.PROFILE_DIR}\" directory.",
+		)
+		parser.add_argument(
+			"--profile-patterns",
+			action="store_true",
+			help=f"Count evaluations, matches and time of each pattern of patterns_{{lang}}.json and write a report of the most expensive and never matched patterns into the \"{sampling_profiler.PROFILE_DIR}\" directory.",
+		)
+		parser.add_argument(
+			"--mem-profile",
+			nargs="?",
+			type=int,
+			const=mem_profiler.MEM_PROFILE_PAGES,
+			default=None,
+			help="Record top allocators of the main process (tracemalloc) every N pages (default %(const)s) and peak RSS of workers into the run report.",
+		)
+		parser.add_argument(
+			"--autotune",
+			action="store_true",
+			help="Adapt the number of workers (up to -m) and the batch size during the run by utilization of workers, latency of pages and available memory.",
+		)
+		parser.add_argument(
+			"--retry-quarantine",
+			action="store_true",
+			help=f"Process again only the pages of the quarantine file ({QUARANTINE_FPATH}) of a previous run over the same pages dump and append them to the KB.",
+		)
 		parser.add_argument(
 			"-g",
 			"--geotags",
@@ -143,7 +313,40 @@ class WikiExtract(object):
 			default=None,
 			help="Number of pages to process in debug mode (default %(const)s).",
 		)
-		self.console_args = parser.parse_args()
+		parser.add_argument(
+			"--sample",
+			type=int,
+			help="Process N pages chosen uniformly at random from the whole dump (random access by the page index of the dump, which is built on the first use).",
+		)
+		parser.add_argument(
+			"--titles",
+			nargs="+",
+			help="Process only pages with the given titles (random access by the page index of the dump).",
+		)
+		parser.add_argument(
+			"--page-ids",
+			nargs="+",
+			type=int,
+			help="Process only pages with the given page ids (random access by the page index of the dump).",
+		)
+		parser.add_argument(
+			"--seed",
+			type=int,
+			default=0,
+			help="Seed of the --sample selection (default: %(default)s).",
+		)
+		parser.add_argument(
+			"--incremental",
+			metavar="PREVIOUS_KB",
+			help="Incremental build - process only pages added, changed or with changed redirects since the previous KB (\"kb\" or KBstatsMetrics.all) and merge them into it (see incremental.py, requires --previous-index).",
+		)
+		parser.add_argument(
+			"--previous-index",
+			help="Page index of the dump of the previous KB (see page_index.py).",
+		)
+		self.console_args = parser.parse_args(args)
+		if self.console_args.incremental and not self.console_args.previous_index:
+			parser.error("--incremental requires --previous-index")
 
 		if self.console_args.m < 1:
 			self.console_args.m = 1
@@ -212,28 +415,7 @@ class WikiExtract(object):
 	# HEAD-KB file contains individual fields of each entity
 	@staticmethod
 	def create_head_kb():
-		entities = [
-			"<person>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\tGENDER\t{e}DATE OF BIRTH\tPLACE OF BIRTH\t{e}DATE OF DEATH\tPLACE OF DEATH\t{m}JOBS\t{m}NATIONALITY\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<person:artist>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\tGENDER\t{e}DATE OF BIRTH\tPLACE OF BIRTH\t{e}DATE OF DEATH\tPLACE OF DEATH\t{m}JOBS\t{m}NATIONALITY\t{m}ART_FORMS\t{m}INFLUENCERS\t{m}INFLUENCEES\tULAN_ID\t{m}OTHER_URLS\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<person:fictional>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\tGENDER\t{e}DATE OF BIRTH\tPLACE OF BIRTH\t{e}DATE OF DEATH\tPLACE OF DEATH\t{m}JOBS\t{m}NATIONALITY\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<person:group>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\tGENDER\t{e}DATE OF BIRTH\tPLACE OF BIRTH\t{e}DATE OF DEATH\tPLACE OF DEATH\t{m}JOBS\t{m}NATIONALITY\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<country>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\tLATITUDE\tLONGITUDE\tAREA\tPOPULATION\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<country:former>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\tLATITUDE\tLONGITUDE\tAREA\tPOPULATION\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<settlement>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\tCOUNTRY\tLATITUDE\tLONGITUDE\tAREA\tPOPULATION\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<watercourse>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\t{m}CONTINENT\tLATITUDE\tLONGITUDE\tLENGTH\tAREA\tSTREAMFLOW\tSOURCE_LOC\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<waterarea>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\t{m}CONTINENT\tLATITUDE\tLONGITUDE\tAREA\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<geo:relief>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\t{m}CONTINENT\tLATITUDE\tLONGITUDE\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<geo:waterfall>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\t{m}CONTINENT\tLATITUDE\tLONGITUDE\tTOTAL HEIGHT\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<geo:island>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\t{m}CONTINENT\tLATITUDE\tLONGITUDE\tAREA\tPOPULATION\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<geo:peninsula>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\tLATITUDE\tLONGITUDE\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<geo:continent>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\tLATITUDE\tLONGITUDE\tAREA\tPOPULATION\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<organisation>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\tFOUNDED\tCANCELLED\tORGANISATION_TYPE\tLOCATION\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n",
-			"<event>ID\tTYPE\tNAME\t{m}ALIASES\t{m}REDIRECTS\tDESCRIPTION\tORIGINAL_WIKINAME\t{gm[http://athena3.fit.vutbr.cz/kb/images/]}IMAGE\t{ui}WIKIPEDIA LINK\tSTART\tEND\tLOCATION\tEVENT_TYPE\tWIKI BACKLINKS\tWIKI HITS\tWIKI PRIMARY SENSE\tSCORE WIKI\tSCORE METRICS\tCONFIDENCE\n"
-		]
-
-		with open("HEAD-KB", "w", encoding="utf-8") as file:
-			for entity in entities:
-				file.write(entity)
+		KB_SCHEMA.write_head("HEAD-KB")
 
 	##
 	# @brief creates the VERSION file
@@ -265,8 +447,9 @@ class WikiExtract(object):
 	##
 	# @brief loads redirects
 	# @param redirects_fpath path to the file with extracted redirects
+	# @param max_lines maximal number of loaded lines (None = all lines)
 	# @return dictionary with redirects
-	def load_redirects(self, redirects_fpath):
+	def load_redirects(self, redirects_fpath, max_lines=None):
 		redirects = dict()
 		try:
 			with open(redirects_fpath, "r") as f:
@@ -274,6 +457,8 @@ class WikiExtract(object):
 				i = 0
 				debug.update(f"loading redirects: {i}")
 				for line in f:
+					if i == max_lines:
+						break
 					i += 1
 					debug.update(f'loading redirects: {i}')
 					redirect_from, redirect_to = line.strip().split("\t")
@@ -311,8 +496,9 @@ class WikiExtract(object):
 	##
 	# @brief loads first sentences
 	# @param senteces_fpath path to the file with extracted first sentences
+	# @param max_lines maximal number of loaded lines (None = all lines)
 	# @return dictionary with first sentences
-	def load_first_sentences(self, sentences_fpath):
+	def load_first_sentences(self, sentences_fpath, max_lines=None):
 		first_sentences = dict()
 
 		try:
@@ -321,8 +507,10 @@ class WikiExtract(object):
 				debug.update("loading first sentences")
 				i = 0
 				for line in f:
+					if i == max_lines:
+						break
 					i += 1
-					debug.update(i)
+					debug.update(f"loading first sentences: {i}")
 					split = line.strip().split("\t")
 					link = split[0]
 					sentence = split[1] if len(split) > 1 else ""
@@ -360,118 +548,391 @@ class WikiExtract(object):
 	def get_path(fpath):
 		return os.path.join(os.path.dirname(sys.argv[0]), fpath)
 
+	##
+	# @brief gets entity data of a page of the dump
+	# @param page - <page> element
+	# @return tuple with entity data (title, page content, redirects, first sentence) or None if the page is not an entity
+	def get_page_data(self, page, keywords, redirects, first_sentences):
+		# xml -> <page> -> <title>
+		# xml -> <page> -> <revision>
+		is_entity = False
+		title = ""
+
+		for child in page:
+			# získá title stránky
+			if "title" in child.tag:
+				is_entity = utils[self.console_args.lang].is_entity(child.text.lower())
+				if is_entity:
+					title = child.text
+			# získá text stránky
+			elif "revision" in child.tag:
+				for grandchild in child:
+					if "text" in grandchild.tag and is_entity and grandchild.text:
+						if pattern_profiler.get_search()(keywords["disambig_pattern"], grandchild.text, re.I):
+							return None
+
+						# nalezení nové entity
+						link = self.get_link(title)
+						return (
+							title,
+							grandchild.text,
+							redirects[link] if link in redirects else [],
+							first_sentences[link] if link in first_sentences else ""
+						)
+			elif "redirect" in child.tag:
+				return None
+
+		return None
+
 	##
 	# @brief loads redirects, first sentences, langmap and patterns, then parses xml dump
 	def parse_xml_dump(self):
-		redirects =self.load_redirects(self.redirects_dump_fpath)
+		redirects = self.load_redirects(self.redirects_dump_fpath)
 		langmap = self.load_langmap(self.get_path(f"json/langmap_{self.console_args.lang}.json"))
 		first_sentences = self.load_first_sentences(self.fs_dump_path)
 		patterns, keywords = self.load_patterns(self.get_path(f"json/patterns_{self.console_args.lang}.json"))
+		if self.mem_profiler is not None:
+			self.mem_profiler.snapshot(0, "loaded redirects, langmap, first sentences and patterns")
 
-		# xml parser
-		context = CElTree.iterparse(self.pages_dump_fpath, events=("start", "end"))
-
+		# (byte offset of the page in the dump, entity data) tuples
 		ent_data = []
 
 		curr_page_cnt = 0
 		all_page_cnt = 0
+		read_page_cnt = 0
 		ent_count = 0
 
 		# LOOP_CYCLE = skript bude číst a extrahovat data po blocích o velikosti [LOOP_CYCLE]
 		LOOP_CYCLE = 4000
-		debug_limit_hit = False
+		if self.console_args.autotune:
+			self.autotuner = AutoTuner(self.console_args.m, LOOP_CYCLE, max_workers=self.console_args.m)
 
-		with open("kb", "a+", encoding="utf-8") as file:
-			file.truncate(0)
-			event, root = next(context)
-			for event, elem in context:
+		progress = ProgressReporter(os.path.getsize(self.pages_dump_fpath))
+
+		current_index = None
+		changes = None
+		if self.console_args.incremental:
+			current_index = self.load_page_index()
+			changes = self.incremental_changes(current_index, redirects)
 
-				if debug_limit_hit:
+		with open(INCREMENTAL_DELTA_FPATH if changes is not None else "kb", "a+", encoding="utf-8") as file, Quarantine() as quarantine, self.new_page_pool(langmap, patterns, keywords) as page_pool:
+			file.truncate(0)
+			if changes is not None:
+				pages = current_index.iter_pages(self.pages_dump_fpath, sorted(changes.positions))
+			elif self.console_args.sample:
+				pages = self.sample_pages(self.console_args.sample, self.console_args.seed)
+			elif self.console_args.titles or self.console_args.page_ids:
+				pages = self.selected_pages(self.console_args.titles or [], self.console_args.page_ids or [])
+			else:
+				pages = dump_reader.iter_pages(self.pages_dump_fpath)
+			for offset, page in self.telemetry.stages.timed("xml_decode", pages):
+				read_page_cnt += 1
+				progress.update(read_page_cnt, all_page_cnt, offset)
+
+				with self.telemetry.stages.measure("page_filter"):
+					page_data = self.get_page_data(page, keywords, redirects, first_sentences)
+				if page_data is None:
+					continue
+
+				ent_data.append((offset, page_data))
+				curr_page_cnt += 1
+				all_page_cnt += 1
+
+				if self.tracker.debug_limit is not None and all_page_cnt >= self.tracker.debug_limit:
+					debug.print(f"debug limit hit (number of pages: {all_page_cnt})")
 					break
 
-				# hledá <page> element
-				if event == "end" and "page" in elem.tag:
-					# xml -> <page> -> <title>
-					# xml -> <page> -> <revision>
-					is_entity = False
-					title = ""
-
-					for child in elem:
-						# získá title stránky
-						if "title" in child.tag:
-							is_entity = utils[self.console_args.lang].is_entity(child.text.lower())
-							if is_entity:
-								title = child.text
-						# získá text stránky
-						elif "revision" in child.tag:
-							for grandchild in child:
-								if "text" in grandchild.tag and is_entity and grandchild.text:
-									if re.search(keywords["disambig_pattern"], grandchild.text, re.I):
-										debug.update("found disambiguation")
-										break
-
-									# nalezení nové entity
-									link = self.get_link(title)
-									ent_data.append((
-										title,
-										grandchild.text,
-										redirects[link] if link in redirects else [],
-										first_sentences[link] if link in first_sentences else ""
-									))
-
-									curr_page_cnt += 1
-									all_page_cnt += 1
-
-									debug.update(f"found new page ({all_page_cnt})")
-
-									if self.tracker.debug_limit is not None and all_page_cnt >= self.tracker.debug_limit:
-										debug.print(f"debug limit hit (number of pages: {all_page_cnt})")
-										debug_limit_hit = True
-										break
-
-									if curr_page_cnt == LOOP_CYCLE:
-										ent_count += self.output(file, ent_data, langmap, patterns, keywords)
-										ent_data.clear()
-										curr_page_cnt = 0
-						elif "redirect" in child.tag:
-							debug.update(f"found redirect ({all_page_cnt})")
-							break
+				if self.mem_profiler is not None:
+					self.mem_profiler.check(all_page_cnt)
 
-					root.clear()
+				if curr_page_cnt >= (self.autotuner.batch_size if self.autotuner is not None else LOOP_CYCLE):
+					ent_count += self.output(file, quarantine, page_pool, ent_data)
+					ent_data.clear()
+					curr_page_cnt = 0
 
 			if len(ent_data):
-				ent_count += self.output(file, ent_data, langmap, patterns, keywords)
+				ent_count += self.output(file, quarantine, page_pool, ent_data)
+
+		if self.mem_profiler is not None:
+			self.mem_profiler.snapshot(all_page_cnt, "end of the dump")
 
 		debug.print("----------------------------", print_time=False)
 		debug.print(f"parsed xml dump (number of pages: {all_page_cnt})", print_time=False)
 		debug.print(f"processed {ent_count} entities", print_time=False)
+		if quarantine.count:
+			debug.print(f"quarantined {quarantine.count} pages (see {quarantine.fpath})", print_time=False)
+		if self.autotuner is not None:
+			self.telemetry.autotune = self.autotuner.history
+			debug.print(f"autotune: {self.autotuner.workers} workers, batch size {self.autotuner.batch_size} ({len(self.autotuner.history)} changes)", print_time=False)
+		if changes is not None:
+			self.merge_incremental(current_index, changes)
+		self.log_id_collisions()
+		self.log_stage_report()
 
 	##
-	# @brief extracts the entities with multiprocessing and outputs the data to a file
-	# @param file - output file ("kb" file)
-	# @param ent_data - ordered array of tuples with entity data
+	# @brief logs the number of resolved collisions of entity IDs and adds it to the telemetry
+	def log_id_collisions(self):
+		if self.entity_ids.collisions:
+			self.telemetry.counters["id_collisions"] += self.entity_ids.collisions
+			debug.print(f"resolved {self.entity_ids.collisions} collisions of entity IDs", print_time=False)
+
+	##
+	# @brief finds pages changed since the previous KB (--incremental)
+	# @param current_index - PageIndex of the current dump
+	# @param redirects - current redirects
+	# @return incremental.PageChanges
+	def incremental_changes(self, current_index, redirects):
+		previous_index = page_index.PageIndex.load(self.console_args.previous_index, None)
+		if previous_index is None:
+			debug.print(f"page index of the previous dump ({self.console_args.previous_index}) was not found or it is not valid - exiting...")
+			exit(1)
+
+		start_time = datetime.now()
+		with self.telemetry.stages.measure("incremental_diff"):
+			changes = incremental.diff_indexes(previous_index, current_index)
+			incremental.diff_redirects(self.console_args.incremental, current_index, changes, redirects)
+		previous_index.close()
+		tdelta = datetime.now() - start_time
+
+		for name, count in changes.counters().items():
+			self.telemetry.counters[f"incremental:{name}"] += count
+		debug.print("incremental build: {} pages to process ({}, in {})".format(
+			len(changes.positions),
+			", ".join(f"{count} {name}" for name, count in changes.counters().items()),
+			debug.pretty_time_delta(tdelta.total_seconds())
+		))
+		return changes
+
+	##
+	# @brief merges rows of reprocessed pages into the previous KB (--incremental), the result is the "kb" file
+	def merge_incremental(self, current_index, changes):
+		# IDs are assigned again in the order of the merged KB
+		self.entity_ids = EntityIds()
+		with self.telemetry.stages.measure("incremental_merge"):
+			kept, processed = incremental.merge_kb(self.console_args.incremental, INCREMENTAL_DELTA_FPATH, "kb", current_index, changes.stale, self.entity_ids)
+		os.remove(INCREMENTAL_DELTA_FPATH)
+		current_index.close()
+		debug.print(f"merged {kept} rows of the previous KB and {processed} rows of processed pages", print_time=False)
+
+	##
+	# @brief loads (or builds) the page index of the pages dump
+	def load_page_index(self):
+		start_time = datetime.now()
+		index, built = page_index.get_page_index(self.pages_dump_fpath)
+		tdelta = datetime.now() - start_time
+		debug.print(f"{'built' if built else 'loaded'} page index ({len(index)} pages in {debug.pretty_time_delta(tdelta.total_seconds())})")
+		return index
+
+	##
+	# @brief returns a generator of pages with the given titles and page ids (in the order of the dump)
+	def selected_pages(self, titles, page_ids):
+		index = self.load_page_index()
+		positions = set()
+		for key, position in [(title, index.find_title(title)) for title in titles] + [(page_id, index.find_page_id(page_id)) for page_id in page_ids]:
+			if position is None:
+				debug.print(f"page {key} was not found in the dump - skipping...")
+			else:
+				positions.add(position)
+		return index.iter_pages(self.pages_dump_fpath, sorted(positions))
+
+	##
+	# @brief returns a generator of pages chosen uniformly at random from the dump (in the order of the dump)
+	# @param count - number of pages
+	# @param seed - seed of the selection
+	def sample_pages(self, count, seed):
+		index = self.load_page_index()
+		positions = sorted(random.Random(seed).sample(range(len(index)), min(count, len(index))))
+		return index.iter_pages(self.pages_dump_fpath, positions)
+
+	##
+	# @brief processes again the pages of the quarantine file and appends extracted entities to the "kb" file
+	#
+	# pages are read from their offsets in the pages dump, pages which fail again stay in the quarantine file
+	def retry_quarantine(self):
+		try:
+			quarantined = read_quarantine(QUARANTINE_FPATH)
+		except OSError:
+			debug.print(f"quarantine file ({QUARANTINE_FPATH}) was not found - exiting...")
+			exit(1)
+
+		redirects = self.load_redirects(self.redirects_dump_fpath)
+		langmap = self.load_langmap(self.get_path(f"json/langmap_{self.console_args.lang}.json"))
+		first_sentences = self.load_first_sentences(self.fs_dump_path)
+		patterns, keywords = self.load_patterns(self.get_path(f"json/patterns_{self.console_args.lang}.json"))
+
+		ent_data = []
+		for quarantined_page in quarantined:
+			page = dump_reader.read_page(self.pages_dump_fpath, quarantined_page.offset)
+			page_data = self.get_page_data(page, keywords, redirects, first_sentences)
+			if page_data is None or page_data[0] != quarantined_page.title:
+				raise ValueError(f"page at offset {quarantined_page.offset} is not \"{quarantined_page.title}\" - quarantine file does not match the pages dump")
+			ent_data.append((quarantined_page.offset, page_data))
+
+		if os.path.exists("kb"):
+			self.entity_ids.read("kb")
+		with open("kb", "a", encoding="utf-8") as file, Quarantine() as quarantine, self.new_page_pool(langmap, patterns, keywords) as page_pool:
+			ent_count = self.output(file, quarantine, page_pool, ent_data) if len(ent_data) else 0
+
+		debug.print("----------------------------", print_time=False)
+		debug.print(f"retried {len(ent_data)} quarantined pages", print_time=False)
+		debug.print(f"processed {ent_count} entities", print_time=False)
+		debug.print(f"quarantined {quarantine.count} pages (see {quarantine.fpath})", print_time=False)
+		self.log_id_collisions()
+		self.log_stage_report()
+
+	##
+	# @brief starts the sampling profiler (--profile-sample), the pattern profiler (--profile-patterns)
+	# and the memory profiler (--mem-profile) of the main process
+	def start_profiler(self):
+		self.mem_profiler = None
+		if self.console_args.mem_profile:
+			self.mem_profiler = mem_profiler.MemProfiler(self.console_args.mem_profile)
+			self.mem_profiler.start()
+
+		if self.console_args.profile_patterns:
+			pattern_profiler.prepare_profile_dir()
+			pattern_profiler.enable()
+
+		self.profiler = None
+		if self.console_args.profile_sample:
+			sampling_profiler.prepare_profile_dir()
+			self.profiler = sampling_profiler.SamplingProfiler(self.console_args.profile_sample)
+			self.profiler.start()
+
+	##
+	# @brief writes collapsed stacks of the main process and merges them with stacks of the workers, writes the pattern report
+	# and adds the memory report to the telemetry
+	def finish_profiler(self):
+		if self.mem_profiler is not None:
+			self.mem_profiler.stop()
+			self.telemetry.memory = {
+				"main_peak_rss_kb": mem_profiler.peak_rss_kb(),
+				"snapshots": self.mem_profiler.snapshots
+			}
+			debug.print("----------------------------", print_time=False)
+			debug.print("memory of the main process:", print_time=False)
+			for line in self.mem_profiler.report_lines():
+				debug.print(line, print_time=False)
+			workers = self.telemetry.observations.get("worker_peak_rss_kb", {})
+			if len(workers):
+				peaks = [item[3] for item in workers.values()]
+				debug.print(f"peak RSS of workers: max {max(peaks) // 1024} MB, mean {sum(peaks) // len(peaks) // 1024} MB ({len(peaks)} workers)", print_time=False)
+			self.mem_profiler = None
+
+		if self.console_args.profile_patterns:
+			patterns, keywords = self.load_patterns(self.get_path(f"json/patterns_{self.console_args.lang}.json"))
+			report_fpath = pattern_profiler.write_report(patterns, keywords)
+			debug.print(f"pattern report written to {report_fpath}", print_time=False)
+
+		if self.profiler is not None:
+			self.profiler.stop()
+			self.profiler.write(os.path.join(sampling_profiler.PROFILE_DIR, "main.collapsed"))
+			merged_fpath = sampling_profiler.merge_profile_dir()
+			debug.print(f"collapsed stacks written to {merged_fpath}", print_time=False)
+			self.profiler = None
+
+	##
+	# @brief prints the stage times of the run
+	def log_stage_report(self):
+		debug.print("----------------------------", print_time=False)
+		debug.print("stage times (worker stages are summed over all workers):", print_time=False)
+		for line in self.telemetry.stages.report_lines():
+			debug.print(line, print_time=False)
+
+	##
+	# @brief writes the telemetry of the run (outputs/kb.telemetry.json, outputs/kb.retry.telemetry.json for --retry-quarantine)
+	def write_telemetry(self):
+		time_total = (datetime.now() - self.tracker.start_time).total_seconds()
+		fname = RETRY_TELEMETRY_FNAME if self.console_args.retry_quarantine else TELEMETRY_FNAME
+		self.telemetry.write(self.get_path(os.path.join("outputs", fname)), time_total)
+
+	##
+	# @brief returns the persistent PagePool of the run (to be used in a with statement)
 	# @param langmap - dictionary of language abbreviations
 	# @param patterns - dictionary containing identification patterns
+	#
+	# identification patterns are compiled in the main process first, so every worker (also a replacement
+	# of a recycled worker) inherits them compiled in the cache of the re module
+	def new_page_pool(self, langmap, patterns, keywords):
+		for kinds in patterns.values():
+			for kind, values in kinds.items():
+				if not kind.endswith("fields"):
+					for value in values:
+						re.compile(value, re.I)
+
+		workers = self.autotuner.workers if self.autotuner is not None else self.console_args.m
+		return PagePool(
+			workers,
+			initializer=init_worker,
+			initargs=(self, langmap, patterns, keywords),
+			page_timeout=self.console_args.page_timeout,
+			maxtasksperchild=self.console_args.recycle_pages or None
+		)
+
+	##
+	# @brief extracts the entities with multiprocessing and outputs the data to a file
+	# @param file - output file ("kb" file)
+	# @param quarantine - Quarantine instance for pages rejected by workers
+	# @param page_pool - PagePool of the run (see new_page_pool)
+	# @param ent_data - ordered array of (byte offset of the page, tuple with entity data) tuples
 	# @return number of pages that were identified as entities (count of extracted entities)
-	def output(self, file, ent_data, langmap, patterns, keywords):
+	#
+	# workers are recycled after the batch when RSS of a worker passed the --recycle-rss threshold
+	def output(self, file, quarantine, page_pool, ent_data):
 		if len(ent_data):
 			start_time = datetime.now()
 
-			pool = Pool(processes=self.console_args.m)
-			serialized_entities = pool.starmap(
-				self.process_entity,
-				zip(ent_data, repeat(langmap), repeat(patterns), repeat(keywords))
+			page_timeout = self.console_args.page_timeout
+			stuck_workers = page_pool.recycled
+			serialized_entities = page_pool.map(
+				process_page,
+				ent_data,
+				on_timeout=lambda page: (timed_out_page(page, page_timeout), None)
 			)
-			l = list(filter(None, serialized_entities))
-			file.write("\n".join(l) + "\n")
-			pool.close()
-			pool.join()
+			# snapshots shipped with pages and the rest of the telemetry of workers aggregated in this batch
+			snapshots = [snapshot for _, snapshot in serialized_entities if snapshot is not None]
+			snapshots.extend(page_pool.broadcast(flush_telemetry))
+			busy_ns = 0
+			worker_rss_kb = 0
+			worker_current_rss_kb = 0
+			for snapshot in snapshots:
+				self.telemetry.merge(snapshot)
+				if "page" in snapshot["stages"]:
+					busy_ns += snapshot["stages"]["page"][1]
+				for peak in snapshot["observations"].get("worker_peak_rss_kb", {}).values():
+					worker_rss_kb = max(worker_rss_kb, peak[3])
+				for rss in snapshot["observations"].get("worker_rss_kb", {}).values():
+					worker_current_rss_kb = max(worker_current_rss_kb, rss[3])
+			l = []
+			for result, _ in serialized_entities:
+				if isinstance(result, QuarantinedPage):
+					quarantine.write(result)
+					self.telemetry.counters[f"quarantined:{result.reason}"] += 1
+				elif result:
+					l.append(self.entity_ids.assign(result))
+			if len(l):
+				file.write("\n".join(l) + "\n")
+			if page_pool.recycled > stuck_workers:
+				debug.print(f"recycled {page_pool.recycled - stuck_workers} stuck workers")
 			count = len(l)
 
 			end_time = datetime.now()
 			tdelta = end_time - start_time
 			debug.print(f"processed {count} entities (in {debug.pretty_time_delta(tdelta.total_seconds())})")
-			debug.log_message(f"time_avg,{tdelta},{len(ent_data)};")
+			self.telemetry.add_batch(len(ent_data), tdelta.total_seconds())
+			self.telemetry.counters["entities"] += count
+
+			if self.autotuner is not None:
+				stats = BatchStats(len(ent_data), tdelta.total_seconds(), busy_ns / 1e9, worker_rss_kb, available_memory_kb())
+				reasons = self.autotuner.update(stats)
+				if len(reasons):
+					debug.print(f"autotune: {self.autotuner.workers} workers, batch size {self.autotuner.batch_size} ({', '.join(reasons)})")
+					page_pool.resize(self.autotuner.workers)
+
+			if self.console_args.recycle_rss and worker_current_rss_kb > self.console_args.recycle_rss * 1024:
+				page_pool.recycle()
+				self.telemetry.counters["recycled:rss"] += 1
+				debug.print(f"recycled workers (RSS of a worker {worker_current_rss_kb // 1024} MB)")
 			return count
 
 	##
@@ -479,42 +940,41 @@ class WikiExtract(object):
 	# @param ent_data - dictionary with entity data (title, page content, ...)
 	# @param langmap - dictionary of language abbreviations
 	# @param patterns - dictionary containing identification patterns
-	# @return tab separated string with entity data or None if entity is unidentified
+	# @return tab separated string with entity data or None if entity is unidentified (or unclassified, see UNCLASSIFIED_PREFIXES)
+	#
+	# raises KbRowError if the entity row does not match the HEAD-KB schema
 	def process_entity(self, ent_data, langmap, patterns, keywords):
 		title, content, redirects, sentence = ent_data
 
-		debug.update(f"INFO: processing {title}")
-
-		extraction = self.extract_entity_data(content, keywords)
-		identification = self.identify_entity(title, extraction, patterns).most_common()
+		with STAGE_TIMER.measure("extraction"):
+			extraction = self.extract_entity_data(content, keywords)
+		with STAGE_TIMER.measure("identification"):
+			identification = self.identify_entity(title, extraction, patterns).most_common()
+		if pattern_profiler.is_enabled():
+			pattern_profiler.count_fields(patterns, extraction["data"])
 
 		count = 0
 		for _, value in identification:
 			count += value
 
 		if count > 0:
-			debug.log_message(f"id_stats,{identification[0][0]},{count};")
+			TELEMETRY.observe("identification", identification[0][0], count)
 
 		# if count != 0:
 		# 	debug.log_identification(identification, title=title)
 
-		entities = {
-			"person":       EntPerson,
-			"country":      EntCountry,
-			"settlement":   EntSettlement,
-			"waterarea":    EntWaterArea,
-			"watercourse":  EntWaterCourse,
-			"geo":          EntGeo,
-			"organisation": EntOrganisation,
-			"event":        EntEvent
-		}
-
 		if identification[0][1] > 0:
 			key = identification[0][0]
-			if key in entities:
-				entity = entities[key](title, key, self.get_link(title), extraction, langmap, redirects, sentence, keywords)
-				entity.assign_values(self.console_args.lang)
-				return repr(entity)
+			if key in ENTITY_CLASSES:
+				with STAGE_TIMER.measure("construction"):
+					entity = ENTITY_CLASSES[key](title, key, self.get_link(title), extraction, langmap, redirects, sentence, keywords)
+				with STAGE_TIMER.measure(f"assign_values:{key}"):
+					entity.assign_values(self.console_args.lang)
+				if entity.prefix in UNCLASSIFIED_PREFIXES:
+					TELEMETRY.count(f"unclassified:{entity.prefix}")
+					return None
+				with STAGE_TIMER.measure("serialization"):
+					return repr(entity)
 
 		# debug.log_message(f"Error: unidentified page: {title}")
 		return None
@@ -527,7 +987,8 @@ class WikiExtract(object):
 	# uses the mwparserfromhell library
 	def extract_entity_data(self, content, keywords):
 
-		content = self.remove_not_important(content)
+		with STAGE_TIMER.measure("extraction/clean"):
+			content = self.remove_not_important(content)
 
 		result = {
 			"found": False,
@@ -539,7 +1000,8 @@ class WikiExtract(object):
 			"images": []
 		}
 
-		wikicode = parser.parse(content)
+		with STAGE_TIMER.measure("extraction/ast_parse"):
+			wikicode = parser.parse(content)
 		templates = wikicode.filter_templates()
 
 		infobox = None
@@ -594,11 +1056,12 @@ class WikiExtract(object):
 			debug.log_message("Error: no first section found")
 
 		# extract categories
+		search = pattern_profiler.get_search()
 		lines = content.splitlines()
 		for line in lines:
 			# categories
 			pattern = keywords["category_pattern"]
-			match = re.search(pattern, line, re.I)
+			match = search(pattern, line, re.I)
 			if match:
 				result["categories"].append(
 					self.remove_breaks(
@@ -631,17 +1094,18 @@ class WikiExtract(object):
 	# @todo score weight system
 	@staticmethod
 	def identify_entity(title, extracted, patterns):
+		search = pattern_profiler.get_search()
 		counter = Counter({key: 0 for key in patterns.keys()})
 
 		# categories
 		for c in extracted["categories"]:
 			for entity in patterns.keys():
 				for p in patterns[entity]["categories"]:
-					if re.search(p, c, re.I):
+					if search(p, c, re.I):
 						counter[entity] += 1 if counter[entity] >= 0 else 0
 				if "!categories" in patterns[entity]:
 					for p in patterns[entity]["!categories"]:
-						if re.search(p, c, re.I):
+						if search(p, c, re.I):
 							if counter[entity] > 0:
 								counter[entity] *= -1
 							elif counter[entity] == 0:
@@ -651,11 +1115,11 @@ class WikiExtract(object):
 		# infobox names
 		for entity in patterns.keys():
 			for p in patterns[entity]["names"]:
-				if re.search(p, extracted["name"], re.I):
+				if search(p, extracted["name"], re.I):
 					counter[entity] += 1 if counter[entity] >= 0 else 0
 			if "!names" in patterns[entity]:
 				for p in patterns[entity]["!names"]:
-					if re.search(p, extracted["name"], re.I):
+					if search(p, extracted["name"], re.I):
 						if counter[entity] > 0:
 							counter[entity] *= -1
 						elif counter[entity] == 0:
@@ -665,11 +1129,11 @@ class WikiExtract(object):
 		# titles
 		for entity in patterns.keys():
 			for p in patterns[entity]["titles"]:
-				if re.search(p, title, re.I):
+				if search(p, title, re.I):
 					counter[entity] += 1 if counter[entity] >= 0 else 0
 			if "!titles" in patterns[entity]:
 				for p in patterns[entity]["!titles"]:
-					if re.search(p, title, re.I):
+					if search(p, title, re.I):
 						if counter[entity] > 0:
 							counter[entity] *= -1
 						elif counter[entity] == 0:
@@ -785,7 +1249,13 @@ if __name__ == "__main__":
 	wiki_extract = WikiExtract()
 
 	wiki_extract.parse_args()
+	wiki_extract.start_profiler()
 	wiki_extract.create_head_kb()
-	wiki_extract.assign_version()
-	wiki_extract.parse_xml_dump()
+	if wiki_extract.console_args.retry_quarantine:
+		wiki_extract.retry_quarantine()
+	else:
+		wiki_extract.assign_version()
+		wiki_extract.parse_xml_dump()
+	wiki_extract.finish_profiler()
+	wiki_extract.write_telemetry()
 	wiki_extract.tracker.log()